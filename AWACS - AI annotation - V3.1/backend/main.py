@@ -4,12 +4,13 @@ import sys
 import glob
 import uuid
 import asyncio
+import functools
 import time
 import threading
 from datetime import datetime
 from typing import Dict
 from pathlib import Path
-from multiprocessing import Process, Manager, freeze_support
+from multiprocessing import Process, Queue, Manager, freeze_support
 import queue
 # import random
 # from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -37,7 +38,7 @@ from ai_tool.config_loader import config, load_config
 from ai_tool.rate_limiter import Yoda
 from ai_tool.main_processor import save_checkpoint, merge_all_session_reports
 from ai_tool.data_processing import load_rules, normalize_text
-from ai_tool import web_utils, classification
+from ai_tool import web_utils, classification, data_processing, utils
 import ai_module
 
 # Initialize config
@@ -69,6 +70,26 @@ class JobStatus:
     FAILED = "failed"
 
 
+SCRAPED_COLUMNS = ("Breadcrumb_Top1", "Breadcrumb_Top2", "Breadcrumb_Top3", "Image_URLs")
+
+
+def apply_scraped_results(df: pd.DataFrame, results: dict):
+    """
+    Writes {row label: {column: value}} scrape results into df with one batched write
+    per scraped column instead of per-cell df.at calls. Columns a result doesn't
+    carry keep their current value.
+    """
+    for col in SCRAPED_COLUMNS:
+        labels = [idx for idx, result in results.items() if col in result]
+        if not labels:
+            continue
+        # object first, so strings can land in a column pandas read as all-NaN float
+        column = df[col].astype(object)
+        column.loc[labels] = [results[idx][col] for idx in labels]
+        df[col] = column
+    return df
+
+
 def scrape_ads_sync(df: pd.DataFrame, job_id: str):
     """
     Synchronous scraping function for backend frontend-triggered jobs.
@@ -82,11 +103,14 @@ def scrape_ads_sync(df: pd.DataFrame, job_id: str):
     from selenium.webdriver.support import expected_conditions as EC
     from selenium.common.exceptions import TimeoutException
     from selenium.webdriver.common.action_chains import ActionChains
+    from scraper_module import BREADCRUMB_LINKS_JS, count_gallery_urls, filter_breadcrumbs, get_gallery_images
     
     total = len(df)
     processed = 0
     scraping_start = time.time()
     
+    # Scraped values per row label, written into df in one batch after the loop
+    results = {}
     driver = None
     try:
         driver = setup_driver(headless=True)
@@ -101,6 +125,7 @@ def scrape_ads_sync(df: pd.DataFrame, job_id: str):
             
             # Start timing for this listing
             listing_start = time.time()
+            result = results[idx] = {}
             url = f"https://www.commercialtrucktrader.com/listing/{ad_id}"
             
             try:
@@ -111,19 +136,20 @@ def scrape_ads_sync(df: pd.DataFrame, job_id: str):
                     driver.execute_script("window.stop();")
                 
                 current_url = driver.current_url
-                page_title = driver.title.strip()
                 
                 # Check if inactive
                 if f"/listing/{ad_id}" not in current_url:
-                    df.at[idx, "Breadcrumb_Top1"] = "Inactive ad"
+                    result["Breadcrumb_Top1"] = "Inactive ad"
                     processed += 1
                     listing_time = time.time() - listing_start
                     print(f"[{processed}/{total}] ⚠️ {ad_id}: Inactive | ⏱️ {listing_time:.2f}s")
                     continue
                 
+                # Only read the title once the URL says the listing is still there
+                page_title = driver.title.strip()
                 lower_title = page_title.lower()
                 if "no longer available" in lower_title or "listing not found" in lower_title:
-                    df.at[idx, "Breadcrumb_Top1"] = "Inactive ad"
+                    result["Breadcrumb_Top1"] = "Inactive ad"
                     processed += 1
                     listing_time = time.time() - listing_start
                     print(f"[{processed}/{total}] ⚠️ {ad_id}: Inactive | ⏱️ {listing_time:.2f}s")
@@ -134,32 +160,20 @@ def scrape_ads_sync(df: pd.DataFrame, job_id: str):
                     nav = WebDriverWait(driver, 5).until(  # ULTRA-OPTIMIZED: Reduced from 6s to 5s
                         EC.presence_of_element_located((By.CSS_SELECTOR, "nav.breadcrumbs"))
                     )
-                    links = nav.find_elements(By.TAG_NAME, "a")
-                    clean_texts = []
-                    
-                    for link in links:
-                        text = link.text.strip().rstrip(',')
-                        href = link.get_attribute("href") or ""
-                        t_lower = text.lower()
-                        h_lower = href.lower()
-                        
-                        # Preserve all filtering rules
-                        if not text or any(n in t_lower for n in ["home", "browse", "commercial trucks", "for sale"]):
-                            continue
-                        if any(param in h_lower for param in ["make=", "model=", "state=", "city=", "zip=", "year="]):
-                            continue
-                        clean_texts.append(text)
+                    # Every link's text + href in one script call, then the shared filtering rules
+                    links = driver.execute_script(BREADCRUMB_LINKS_JS, nav) or []
+                    clean_texts = filter_breadcrumbs(links)
                     
                     breadcrumbs = clean_texts[:3]
                     if breadcrumbs:
-                        df.at[idx, "Breadcrumb_Top1"] = breadcrumbs[0] if len(breadcrumbs) > 0 else ""
-                        df.at[idx, "Breadcrumb_Top2"] = breadcrumbs[1] if len(breadcrumbs) > 1 else ""
-                        df.at[idx, "Breadcrumb_Top3"] = breadcrumbs[2] if len(breadcrumbs) > 2 else ""
+                        result["Breadcrumb_Top1"] = breadcrumbs[0] if len(breadcrumbs) > 0 else ""
+                        result["Breadcrumb_Top2"] = breadcrumbs[1] if len(breadcrumbs) > 1 else ""
+                        result["Breadcrumb_Top3"] = breadcrumbs[2] if len(breadcrumbs) > 2 else ""
                     else:
-                        df.at[idx, "Breadcrumb_Top1"] = "Inactive ad"
+                        result["Breadcrumb_Top1"] = "Inactive ad"
                         
                 except Exception:
-                    df.at[idx, "Breadcrumb_Top1"] = "Inactive ad"
+                    result["Breadcrumb_Top1"] = "Inactive ad"
                 
                 # Extract images (ULTRA-OPTIMIZED - Maximum speed with same accuracy)
                 try:
@@ -178,15 +192,8 @@ def scrape_ads_sync(df: pd.DataFrame, job_id: str):
                             try:
                                 action.click(arrow).perform()
                                 time.sleep(0.1)  # ULTRA-OPTIMIZED: Reduced from 0.15s to 0.1s
-                                # Check how many images we have now
-                                current_imgs = driver.find_elements(By.CSS_SELECTOR, "img.rsImg")
-                                current_urls = []
-                                for img in current_imgs:
-                                    src = img.get_attribute("src") or img.get_attribute("data-src") or img.get_attribute("data-lazy-src")
-                                    if src and "placeholder" not in src.lower() and src not in current_urls:
-                                        if src.startswith("http") or src.startswith("//"):
-                                            current_urls.append(src)
-                                if len(current_urls) >= 3:
+                                # Check how many images we have now (one script call)
+                                if count_gallery_urls(driver) >= config.max_images:
                                     break
                             except:
                                 break
@@ -196,55 +203,54 @@ def scrape_ads_sync(df: pd.DataFrame, job_id: str):
                     # ULTRA-OPTIMIZED: Reduced final wait from 0.2s to 0.1s
                     time.sleep(0.1)
                     
-                    imgs = driver.find_elements(By.CSS_SELECTOR, "img.rsImg")
                     image_urls = []
+                    seen_urls = set()  # O(1) duplicate check alongside the ordered list
                     
-                    for im in imgs:
-                        # Try multiple attributes for lazy-loaded images
-                        src = im.get_attribute("src") or im.get_attribute("data-src") or im.get_attribute("data-lazy-src")
+                    # src already falls back to the lazy-load attributes
+                    for src, elem_adid in get_gallery_images(driver):
                         if not src:
                             continue
                         
                         # Check data-adid: only skip if it exists AND doesn't match
                         # If data-adid doesn't exist, include the image (less strict)
-                        elem_adid = im.get_attribute("data-adid")
                         if elem_adid and str(elem_adid).strip() != ad_id:
                             continue
                         
                         # Filter placeholders and duplicates
-                        if "placeholder" not in src.lower() and src not in image_urls:
+                        if "placeholder" not in src.lower() and src not in seen_urls:
                             # Make sure it's a valid image URL
                             if src.startswith("http") or src.startswith("//"):
+                                seen_urls.add(src)
                                 image_urls.append(src)
                     
-                    df.at[idx, "Image_URLs"] = ",".join(image_urls[:config.max_images])
+                    result["Image_URLs"] = ",".join(image_urls[:config.max_images])
                     processed += 1
                     listing_time = time.time() - listing_start
-                    print(f"[{processed}/{total}] ✅ {ad_id}: {df.at[idx, 'Breadcrumb_Top1']} | {len(image_urls)} imgs | ⏱️ {listing_time:.2f}s")
+                    print(f"[{processed}/{total}] ✅ {ad_id}: {result['Breadcrumb_Top1']} | {len(image_urls)} imgs | ⏱️ {listing_time:.2f}s")
                 except Exception as e:
                     # Fallback: try to get at least one image
                     try:
-                        imgs = driver.find_elements(By.CSS_SELECTOR, "img.rsImg")
                         image_urls = []
-                        for im in imgs[:10]:  # Check first 10 images
-                            src = im.get_attribute("src") or im.get_attribute("data-src") or im.get_attribute("data-lazy-src")
-                            if src and "placeholder" not in src.lower() and src not in image_urls:
+                        seen_urls = set()  # O(1) duplicate check alongside the ordered list
+                        for src, _ in get_gallery_images(driver)[:10]:  # Check first 10 images
+                            if src and "placeholder" not in src.lower() and src not in seen_urls:
                                 if src.startswith("http") or src.startswith("//"):
+                                    seen_urls.add(src)
                                     image_urls.append(src)
                                     if len(image_urls) >= config.max_images:
                                         break
-                        df.at[idx, "Image_URLs"] = ",".join(image_urls[:config.max_images])
+                        result["Image_URLs"] = ",".join(image_urls[:config.max_images])
                         processed += 1
                         listing_time = time.time() - listing_start
-                        print(f"[{processed}/{total}] ✅ {ad_id}: {df.at[idx, 'Breadcrumb_Top1']} | {len(image_urls)} imgs (fallback) | ⏱️ {listing_time:.2f}s")
+                        print(f"[{processed}/{total}] ✅ {ad_id}: {result['Breadcrumb_Top1']} | {len(image_urls)} imgs (fallback) | ⏱️ {listing_time:.2f}s")
                     except:
-                        df.at[idx, "Image_URLs"] = ""
+                        result["Image_URLs"] = ""
                         processed += 1
                         listing_time = time.time() - listing_start
-                        print(f"[{processed}/{total}] ✅ {ad_id}: {df.at[idx, 'Breadcrumb_Top1']} | 0 imgs | ⏱️ {listing_time:.2f}s")
+                        print(f"[{processed}/{total}] ✅ {ad_id}: {result['Breadcrumb_Top1']} | 0 imgs | ⏱️ {listing_time:.2f}s")
                     
             except Exception as e:
-                df.at[idx, "Breadcrumb_Top1"] = "Inactive ad"
+                result["Breadcrumb_Top1"] = "Inactive ad"
                 processed += 1
                 listing_time = time.time() - listing_start
                 print(f"[{processed}/{total}] ❌ {ad_id}: Error | ⏱️ {listing_time:.2f}s")
@@ -259,6 +265,8 @@ def scrape_ads_sync(df: pd.DataFrame, job_id: str):
                 driver.quit()
             except:
                 pass
+
+    apply_scraped_results(df, results)
     
     scraping_elapsed = time.time() - scraping_start
     print(f"\n{'='*80}")
@@ -380,11 +388,7 @@ def scrape_ads_parallel(df: pd.DataFrame, job_id: str, num_workers: int = 3):
             print(f"   ⚠️ Terminated Worker (PID: {p.pid})")
     
     # Apply results to dataframe
-    for idx, result in results.items():
-        df.at[idx, "Breadcrumb_Top1"] = result.get("Breadcrumb_Top1", "")
-        df.at[idx, "Breadcrumb_Top2"] = result.get("Breadcrumb_Top2", "")
-        df.at[idx, "Breadcrumb_Top3"] = result.get("Breadcrumb_Top3", "")
-        df.at[idx, "Image_URLs"] = result.get("Image_URLs", "")
+    apply_scraped_results(df, results)
     
     scraping_elapsed = time.time() - scraping_start
     processed = len(results)
@@ -450,7 +454,7 @@ def run_parallel_ai(df: pd.DataFrame, run_ts: str, job_id: str, num_workers: int
     print(f"   Workers: {num_workers}")
     print(f"   Model: {config.gemini_model}")
     print(f"   API Keys: {len(config.gemini_api_keys)}")
-    print(f"   📋 [Rules.json] Will be loaded by each worker from: {config.rules_json}")
+    print(f"   📋 [Rules.json] Loaded once here and handed to the workers: {config.rules_json}")
     print(f"\n   🔧 DUALLY DETECTION SETTINGS:")
     print(f"      🌑 Darth CV2 (OpenCV) Detection: {'✅ ENABLED' if config.enable_darth_cv2_dually else '❌ DISABLED'}")
     if config.enable_darth_cv2_dually:
@@ -468,10 +472,14 @@ def run_parallel_ai(df: pd.DataFrame, run_ts: str, job_id: str, num_workers: int
     
     # Create manager for shared resources
     m = Manager()
+    # Results and status updates (several per ad) use plain pipe-backed queues - no round trip
+    # through the Manager process. Both are drained until the last worker exits. Jobs and keys
+    # stay on the Manager: workers re-queue jobs (on retry_q) on exit and grab keys with get_nowait().
     job_q = m.Queue()
-    res_q = m.Queue()
-    stat_q = m.Queue()
     key_q = m.Queue()
+    retry_q = m.Queue()
+    res_q = Queue()
+    stat_q = Queue()
     
     # Load Keys
     for k in config.gemini_api_keys_info:
@@ -480,11 +488,20 @@ def run_parallel_ai(df: pd.DataFrame, run_ts: str, job_id: str, num_workers: int
     # Load Jobs
     for _, row in df.iterrows():
         job_q.put(row.to_dict())
+    for _ in range(num_workers):
+        job_q.put(None)  # One end-of-jobs sentinel per worker
     
     # Initialize Yoda rate limiter
     print("🧙 Initializing Yoda (Rate Limiter)...")
     yoda = Yoda(config.gemini_api_keys_info, config.rate_limit_rpm, m)
     
+    # Parse categories/rules once here instead of once per worker
+    category_data = data_processing.load_category_data(config.category_json)
+    rules = data_processing.load_rules(config.rules_json)
+    
+    # Keep the image cache within its disk budget before the workers start filling it
+    utils.prune_image_cache()
+    
     start_time = time.time()
     
     # Start status queue drainer thread (CRITICAL FIX!)
@@ -502,7 +519,7 @@ def run_parallel_ai(df: pd.DataFrame, run_ts: str, job_id: str, num_workers: int
     for i in range(1, num_workers + 1):
         p = Process(
             target=ai_module.start_worker,
-            args=(i, run_ts, job_q, res_q, stat_q, key_q, True, False, yoda)
+            args=(i, run_ts, job_q, res_q, stat_q, key_q, True, False, yoda, category_data, rules, retry_q)
             # high_accuracy=True, use_vision_v2=False
         )
         p.start()
@@ -519,7 +536,8 @@ def run_parallel_ai(df: pd.DataFrame, run_ts: str, job_id: str, num_workers: int
     listing_times = {}  # Track timing for each listing
     
     # Result Collector (with per-listing timing)
-    while any(p.is_alive() for p in procs) or not res_q.empty():
+    # Worker liveness is only polled once the queue goes quiet, not per result
+    while True:
         try:
             r = res_q.get(timeout=2)
             if r and r.get("Ad ID"):
@@ -548,6 +566,8 @@ def run_parallel_ai(df: pd.DataFrame, run_ts: str, job_id: str, num_workers: int
                 rate = len(results) / elapsed if elapsed > 0 else 0
                 eta = (total - len(results)) / rate if rate > 0 else 0
                 print(f"   ⏳ Progress: {len(results)}/{total} done | {alive} workers active | ⏱️ {elapsed}s elapsed | ETA: {eta:.0f}s")
+            if not any(p.is_alive() for p in procs):
+                break
             continue
     
     # Stop the drain thread
@@ -591,7 +611,7 @@ def run_parallel_ai(df: pd.DataFrame, run_ts: str, job_id: str, num_workers: int
         return pd.DataFrame()
     
     result_df = pd.DataFrame(results)
-    result_df["Ad ID"] = result_df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+    result_df["Ad ID"] = result_df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
     
     # Ensure all columns exist
     final_columns = [
@@ -606,7 +626,7 @@ def run_parallel_ai(df: pd.DataFrame, run_ts: str, job_id: str, num_workers: int
     
     # Preserve original input order by merging from input DataFrame
     clean_input_df = df[["Ad ID"]].copy()
-    clean_input_df["Ad ID"] = clean_input_df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+    clean_input_df["Ad ID"] = clean_input_df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
     result_df = pd.merge(clean_input_df, result_df, on="Ad ID", how="inner") 
     
     return result_df[final_columns]
@@ -843,6 +863,7 @@ def verify_dually_listings(result_df: pd.DataFrame, job_id: str, yoda_instance):
     from ai_tool.data_processing import load_rules, normalize_text
     rules = load_rules(config.rules_json)
     norm_map = rules.get('normalize_map', {})
+    norm_index = rules['_normalize_index']  # Built once by load_rules, not per normalize_text call
     
     status_updated_count = 0
     for idx, row in result_df.iterrows():
@@ -864,8 +885,8 @@ def verify_dually_listings(result_df: pd.DataFrame, job_id: str, yoda_instance):
         ]
         
         # Normalize each value using the normalization map (same as annotation phase)
-        bc_normalized = {normalize_text(b, norm_map).lower() for b in breadcrumbs if b}
-        ann_normalized = {normalize_text(a, norm_map).lower() for a in annotations if a}
+        bc_normalized = {normalize_text(b, norm_map, index=norm_index).lower() for b in breadcrumbs if b}
+        ann_normalized = {normalize_text(a, norm_map, index=norm_index).lower() for a in annotations if a}
         
         # Calculate new status
         new_status = "No change" if bc_normalized == ann_normalized else "Require Update"
@@ -888,7 +909,7 @@ def run_job_pipeline_sync(job_id: str, file_path: str):
     try:
         # Load input file
         df = pd.read_excel(file_path, dtype={"Ad ID": str})
-        df["Ad ID"] = df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+        df["Ad ID"] = df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
         
         # Add required columns
         for col in ["Breadcrumb_Top1", "Breadcrumb_Top2", "Breadcrumb_Top3", "Image_URLs"]:
@@ -913,7 +934,7 @@ def run_job_pipeline_sync(job_id: str, file_path: str):
         # Save scraped data
         scraper_output_path = os.path.join(config.scrapper_output_dir, f"Scrapper_{run_ts}.xlsx")
         os.makedirs(config.scrapper_output_dir, exist_ok=True)
-        df.to_excel(scraper_output_path, index=False)
+        utils.write_xlsx_fast(scraper_output_path, {"Sheet1": [df]})
         
         job['status'] = JobStatus.PROCESSING
         
@@ -948,7 +969,7 @@ def run_job_pipeline_sync(job_id: str, file_path: str):
         output_filename = f"output_annotated_{run_ts}.xlsx"
         output_path = os.path.join(config.output_dir, output_filename)
         os.makedirs(config.output_dir, exist_ok=True)
-        result_df.to_excel(output_path, index=False)
+        utils.write_xlsx_fast(output_path, {"Sheet1": [result_df]})
         
         job['status'] = JobStatus.COMPLETED
         job['output_file'] = output_path
@@ -994,7 +1015,7 @@ def run_reannotation_pipeline_sync(job_id: str, file_path: str):
     try:
         # Load already-scraped file
         df = pd.read_excel(file_path, dtype={"Ad ID": str})
-        df["Ad ID"] = df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+        df["Ad ID"] = df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
         
         # Validate required columns exist
         required_cols = ["Ad ID", "Breadcrumb_Top1", "Image_URLs"]
@@ -1042,7 +1063,7 @@ def run_reannotation_pipeline_sync(job_id: str, file_path: str):
         output_filename = f"output_reannotated_{run_ts}.xlsx"
         output_path = os.path.join(config.output_dir, output_filename)
         os.makedirs(config.output_dir, exist_ok=True)
-        result_df.to_excel(output_path, index=False)
+        utils.write_xlsx_fast(output_path, {"Sheet1": [result_df]})
         
         job['status'] = JobStatus.COMPLETED
         job['output_file'] = output_path
@@ -1342,17 +1363,17 @@ async def get_config():
 
 # ==================== AUDIT FEATURE ====================
 
-def get_normalized_set(row, cols, norm_map):
-    """Helper to extract columns, normalize them, and return a set."""
+def get_normalized_set(row, cols, norm):
+    """Helper to extract columns, normalize them (via the memoized `norm`), and return a set."""
     res_set = set()
     for c in cols:
         val = row.get(c)
         if pd.notna(val):
             val_str = str(val).strip()
             if val_str and val_str.lower() not in ['nan', 'none', '']:
-                norm_val = normalize_text(val_str, norm_map)
+                norm_val = norm(val_str)
                 if norm_val:
-                    res_set.add(str(norm_val).lower())
+                    res_set.add(norm_val)
     return res_set
 
 
@@ -1370,6 +1391,13 @@ def run_audit_comparison(ai_df: pd.DataFrame, manual_df: pd.DataFrame, audit_id:
     except Exception as e:
         return {"error": f"Could not load Rules.json: {str(e)}"}
     
+    # Category labels repeat across thousands of rows - normalize each distinct one once.
+    # Built per audit, so a reloaded normalize_map is always picked up.
+    @functools.lru_cache(maxsize=None)
+    def norm(val_str):
+        norm_val = normalize_text(val_str, norm_map, index=rules['_normalize_index'])
+        return str(norm_val).lower() if norm_val else None
+    
     # Standardize Ad ID column in AI data
     # Convert column names to strings to handle integer column names from Excel
     ai_df.columns = [str(c) for c in ai_df.columns]
@@ -1382,7 +1410,7 @@ def run_audit_comparison(ai_df: pd.DataFrame, manual_df: pd.DataFrame, audit_id:
     if "Ad ID" not in ai_df.columns:
         return {"error": "AI annotated file must have an 'Ad ID' column"}
     
-    ai_df["Ad ID"] = ai_df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+    ai_df["Ad ID"] = ai_df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
     
     # Standardize Ad ID column in Manual data
     # Convert column names to strings to handle integer column names from Excel
@@ -1396,7 +1424,7 @@ def run_audit_comparison(ai_df: pd.DataFrame, manual_df: pd.DataFrame, audit_id:
     if "Ad ID" not in manual_df.columns:
         return {"error": "Manual feedback file must have an 'Ad ID' column"}
     
-    manual_df["Ad ID"] = manual_df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+    manual_df["Ad ID"] = manual_df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
     
     # Merge data
     merged = pd.merge(ai_df, manual_df, on="Ad ID", how="inner", suffixes=('', '_manual'))
@@ -1421,10 +1449,10 @@ def run_audit_comparison(ai_df: pd.DataFrame, manual_df: pd.DataFrame, audit_id:
     audit_results = []
     
     for idx, row in merged.iterrows():
-        ai_set = get_normalized_set(row, ai_cols, norm_map)
+        ai_set = get_normalized_set(row, ai_cols, norm)
         ai_status = str(row.get("Status", "")).lower()
         
-        human_set = get_normalized_set(row, found_human_cols, norm_map)
+        human_set = get_normalized_set(row, found_human_cols, norm)
         
         status = "Rejected"  # Default
         
@@ -1446,7 +1474,8 @@ def run_audit_comparison(ai_df: pd.DataFrame, manual_df: pd.DataFrame, audit_id:
         })
     
     audit_df = pd.DataFrame(audit_results)
-    final_output = pd.merge(merged, audit_df[["Ad ID", "Feedback Status"]], on="Ad ID", how="left")
+    # audit_df is row-aligned with merged, so the status is attached positionally (no re-join)
+    final_output = merged.assign(**{"Feedback Status": audit_df["Feedback Status"].to_numpy()})
     
     # Generate Summary
     total = len(final_output)
@@ -1460,10 +1489,10 @@ def run_audit_comparison(ai_df: pd.DataFrame, manual_df: pd.DataFrame, audit_id:
     accepted_mask = (final_output["Feedback Status"] == "Accepted")
     rejected_mask = (final_output["Feedback Status"] == "Rejected")
     
-    total_accepted = len(final_output[accepted_mask])
-    total_rejected = len(final_output[rejected_mask])
+    total_accepted = int(accepted_mask.sum())
+    total_rejected = int(rejected_mask.sum())
     
-    active_accepted = len(final_output[accepted_mask & (~is_inactive)])
+    active_accepted = int((accepted_mask & ~is_inactive).sum())
     
     global_acc_pct = (total_accepted / total) * 100 if total > 0 else 0
     active_acc_pct = (active_accepted / active_total) * 100 if active_total > 0 else 0
@@ -1499,10 +1528,11 @@ def run_audit_comparison(ai_df: pd.DataFrame, manual_df: pd.DataFrame, audit_id:
     report_path = os.path.join(audit_dir, report_filename)
     
     try:
-        with pd.ExcelWriter(report_path) as writer:
-            final_output.to_excel(writer, sheet_name="Detailed Audit", index=False)
-            summary_df.to_excel(writer, sheet_name="Summary", index=False, startrow=0, startcol=0)
-            hall_of_shame.to_excel(writer, sheet_name="Summary", index=False, startrow=len(summary_df)+3, startcol=0)
+        # Hall of shame goes under the summary, two blank rows apart (as the old startrow did)
+        utils.write_xlsx_fast(report_path, {
+            "Detailed Audit": [final_output],
+            "Summary": [summary_df, hall_of_shame]
+        })
         
         print(f"\n✅ Audit Complete!")
         print(f"   Global Accuracy: {global_acc_pct:.2f}%")
@@ -33,6 +33,8 @@ def scrape_process_worker(worker_id: int, job_queue, result_queue, max_images: i
     from selenium.webdriver.support import expected_conditions as EC
     from selenium.common.exceptions import TimeoutException, WebDriverException
     from selenium.webdriver.common.action_chains import ActionChains
+    # Batched DOM reads: one execute_script per link/image pass instead of a WebDriver call per attribute
+    from scraper_module import BREADCRUMB_LINKS_JS, filter_breadcrumbs, get_gallery_images, wait_for_gallery
     
     driver = None
     processed = 0
@@ -100,7 +102,6 @@ def scrape_process_worker(worker_id: int, job_queue, result_queue, max_images: i
                             raise
                 
                 current_url = driver.current_url
-                page_title = driver.title.strip()
                 
                 # FIX 3: Detect data: URL (page never loaded)
                 if current_url.startswith("data:") or current_url == "" or not page_loaded:
@@ -119,6 +120,8 @@ def scrape_process_worker(worker_id: int, job_queue, result_queue, max_images: i
                     processed += 1
                     continue
                 
+                # Only read the title once the URL says the listing is still there
+                page_title = driver.title.strip()
                 lower_title = page_title.lower()
                 if "no longer available" in lower_title or "listing not found" in lower_title:
                     result["Breadcrumb_Top1"] = "Inactive ad"
@@ -133,21 +136,9 @@ def scrape_process_worker(worker_id: int, job_queue, result_queue, max_images: i
                     nav = WebDriverWait(driver, 5).until(
                         EC.presence_of_element_located((By.CSS_SELECTOR, "nav.breadcrumbs"))
                     )
-                    links = nav.find_elements(By.TAG_NAME, "a")
-                    clean_texts = []
-                    
-                    for link in links:
-                        text = link.text.strip().rstrip(',')
-                        href = link.get_attribute("href") or ""
-                        t_lower = text.lower()
-                        h_lower = href.lower()
-                        
-                        # Preserve all filtering rules
-                        if not text or any(n in t_lower for n in ["home", "browse", "commercial trucks", "for sale"]):
-                            continue
-                        if any(param in h_lower for param in ["make=", "model=", "state=", "city=", "zip=", "year="]):
-                            continue
-                        clean_texts.append(text)
+                    links = driver.execute_script(BREADCRUMB_LINKS_JS, nav) or []
+                    # Preserve all filtering rules (shared with the standalone scraper)
+                    clean_texts = filter_breadcrumbs(links)
                     
                     breadcrumbs = clean_texts[:3]
                     if breadcrumbs:
@@ -167,50 +158,43 @@ def scrape_process_worker(worker_id: int, job_queue, result_queue, max_images: i
                     WebDriverWait(driver, 8).until(
                         EC.presence_of_element_located((By.CSS_SELECTOR, "img.rsImg"))
                     )
-                    # Increased from 0.4s to 0.6s for lazy-loaded images
-                    time.sleep(0.6)
+                    # Up to 0.6s for lazy-loaded images, polled instead of a fixed sleep
+                    has_enough = wait_for_gallery(driver, 0.6, min_urls=max_images)
                     
-                    # Try to interact with gallery to load more images (increased clicks)
+                    # Try to interact with gallery to load more images (increased clicks),
+                    # unless the DOM already holds max_images slides
                     try:
-                        arrow = driver.find_element(By.CSS_SELECTOR, ".rsArrowRight .rsArrowIcn")
-                        action = ActionChains(driver)
-                        # Increased from 3 to 5 clicks to ensure all images appear
-                        for click_count in range(5):
-                            try:
-                                action.click(arrow).perform()
-                                # Increased from 0.2s to 0.3s to ensure images load after each click
-                                time.sleep(0.3)
-                                current_imgs = driver.find_elements(By.CSS_SELECTOR, "img.rsImg")
-                                current_urls = []
-                                for img in current_imgs:
-                                    src = img.get_attribute("src") or img.get_attribute("data-src") or img.get_attribute("data-lazy-src")
-                                    if src and "placeholder" not in src.lower() and src not in current_urls:
-                                        if src.startswith("http") or src.startswith("//"):
-                                            current_urls.append(src)
-                                if len(current_urls) >= 3:
+                        if not has_enough:
+                            arrow = driver.find_element(By.CSS_SELECTOR, ".rsArrowRight .rsArrowIcn")
+                            action = ActionChains(driver)
+                            # Increased from 3 to 5 clicks to ensure all images appear
+                            for click_count in range(5):
+                                try:
+                                    action.click(arrow).perform()
+                                    # Up to 0.3s per click for the images to load; wakes once max_images are there
+                                    if wait_for_gallery(driver, 0.3, min_urls=max_images):
+                                        break
+                                except:
                                     break
-                            except:
-                                break
                     except:
                         pass
                     
-                    # Increased from 0.3s to 0.5s to ensure final images are fully loaded
-                    time.sleep(0.5)
+                    # Up to 0.5s for the final images, skipped once max_images are there
+                    wait_for_gallery(driver, 0.5, min_urls=max_images)
                     
-                    imgs = driver.find_elements(By.CSS_SELECTOR, "img.rsImg")
                     image_urls = []
+                    seen_urls = set()  # O(1) duplicate check alongside the ordered list
                     
-                    for im in imgs:
-                        src = im.get_attribute("src") or im.get_attribute("data-src") or im.get_attribute("data-lazy-src")
+                    for src, elem_adid in get_gallery_images(driver):
                         if not src:
                             continue
                         
-                        elem_adid = im.get_attribute("data-adid")
                         if elem_adid and str(elem_adid).strip() != ad_id:
                             continue
                         
-                        if "placeholder" not in src.lower() and src not in image_urls:
+                        if "placeholder" not in src.lower() and src not in seen_urls:
                             if src.startswith("http") or src.startswith("//"):
+                                seen_urls.add(src)
                                 image_urls.append(src)
                     
                     result["Image_URLs"] = ",".join(image_urls[:max_images])
@@ -218,12 +202,12 @@ def scrape_process_worker(worker_id: int, job_queue, result_queue, max_images: i
                 except Exception:
                     # Fallback
                     try:
-                        imgs = driver.find_elements(By.CSS_SELECTOR, "img.rsImg")
                         image_urls = []
-                        for im in imgs[:10]:
-                            src = im.get_attribute("src") or im.get_attribute("data-src") or im.get_attribute("data-lazy-src")
-                            if src and "placeholder" not in src.lower() and src not in image_urls:
+                        seen_urls = set()  # O(1) duplicate check alongside the ordered list
+                        for src, _ in get_gallery_images(driver)[:10]:
+                            if src and "placeholder" not in src.lower() and src not in seen_urls:
                                 if src.startswith("http") or src.startswith("//"):
+                                    seen_urls.add(src)
                                     image_urls.append(src)
                                     if len(image_urls) >= max_images:
                                         break
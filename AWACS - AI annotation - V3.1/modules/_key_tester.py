@@ -3,6 +3,8 @@ import os
 
 # This helper script is called by the main quota checker.
 # It tests a single key and prints a single-word result.
+# The key comes from the AWACS_PROBE_KEY environment variable (kept off the command line),
+# the model name from the single command-line argument.
 
 # --- DEFINITIVE FIX: Use a simpler, more robust silencing method ---
 # Keep the original stdout/stderr streams safe.
@@ -59,5 +61,6 @@ def test_single_key(api_key: str, model_name: str):
         devnull.close()
 
 if __name__ == "__main__":
-    if len(sys.argv) == 3:
-        test_single_key(api_key=sys.argv[1], model_name=sys.argv[2])
\ No newline at end of file
+    api_key = os.environ.get("AWACS_PROBE_KEY")
+    if api_key and len(sys.argv) == 2:
+        test_single_key(api_key=api_key, model_name=sys.argv[1])
\ No newline at end of file
@@ -9,8 +9,15 @@ def run_ai(fast_mode=False):
     run_single_process(latest, fast_mode=fast_mode)
 
 def start_worker(worker_id, run_ts, job_queue, results_queue, status_queue, key_queue,
-                 high_accuracy=False, use_vision_v2=False, yoda_instance=None):
+                 high_accuracy=False, use_vision_v2=False, yoda_instance=None,
+                 category_data=None, rules=None, retry_queue=None):
     try:
+        # Parallelism comes from the worker processes; keep OpenCV/OpenMP from each
+        # spinning up a full thread pool per worker and oversubscribing the cores
+        os.environ.setdefault("OMP_NUM_THREADS", "1")
+        import cv2
+        cv2.setNumThreads(1)
+
         load_config()
         from ai_tool.main_processor import run_worker_process
         from ai_tool import utils
@@ -23,7 +30,8 @@ def start_worker(worker_id, run_ts, job_queue, results_queue, status_queue, key_
         run_worker_process(
             worker_id, run_ts, job_queue, results_queue, status_queue,
             key_queue, high_accuracy=high_accuracy, 
-            use_vision_v2=use_vision_v2, yoda_instance=yoda_instance
+            use_vision_v2=use_vision_v2, yoda_instance=yoda_instance,
+            category_data=category_data, rules=rules, retry_queue=retry_queue
         )
         
     except Exception as e:
@@ -1,9 +1,9 @@
 import os
-import base64
 import re
 import json
 import time
 import random
+import logging
 import contextlib
 from multiprocessing import Queue
 import queue
@@ -16,10 +16,18 @@ try:
 except ImportError:
     OPENCV_AVAILABLE = False
 
+# This must be set before the import to silence gRPC warnings
+os.environ['GRPC_VERBOSITY'] = 'ERROR'
+
 # This silences the initial import.
 with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
     import google.generativeai as genai
 
+# Silence SDK chatter once here instead of redirecting stdout/stderr around every call
+# (redirection is process-global and not safe when calls overlap).
+logging.getLogger('google.generativeai').setLevel(logging.ERROR)
+logging.getLogger('google.api_core').setLevel(logging.ERROR)
+
 from .config_loader import config
 from .utils import log_msg
 
@@ -31,6 +39,33 @@ _current_key_info = None
 # Tracks how many times we have resurrected the key pool
 _phoenix_cycle_count = 0
 
+# Model built for the key currently passed to genai.configure (reused until the key changes)
+_model_cache = {'key': None, 'model': None}
+
+# original_index -> key info, so a Yoda swap is a dict lookup instead of a scan of the key list
+_key_info_by_index = {}
+
+def _key_info_for(key_idx):
+    if not _key_info_by_index:
+        _key_info_by_index.update((k['original_index'], k) for k in config.gemini_api_keys_info)
+    return _key_info_by_index.get(key_idx)
+
+# --- RETRY BACKOFF ---
+# Exponential backoff with jitter. Quota/429 errors take longer to clear than 5xx/timeouts,
+# so they get a larger base delay. Jitter keeps waking workers from re-synchronizing.
+RETRY_BASE_DELAY_SERVER = 1.0
+RETRY_BASE_DELAY_QUOTA = 4.0
+RETRY_MAX_DELAY = 60.0
+RETRY_WALL_BUDGET = 30.0  # Pre-checks with a safe fallback give up after this many seconds
+
+def _backoff_delay(attempt: int, error_msg: str) -> float:
+    is_quota = any(x in error_msg for x in ["quota", "resource", "429"])
+    base = RETRY_BASE_DELAY_QUOTA if is_quota else RETRY_BASE_DELAY_SERVER
+    return min(RETRY_MAX_DELAY, base * (2 ** (attempt - 1))) + random.uniform(0, 0.5 * base)
+
+def _jittered_wait(wait_time: float) -> float:
+    return wait_time + random.uniform(0, min(5.0, 0.25 * wait_time))
+
 class AllKeysExhaustedError(Exception):
     pass
 
@@ -45,6 +80,7 @@ def initialize_all_trackers(worker_key_pool: list = None):
     _token_usage_stats = {'total_tokens': 0, 'api_calls': 0}
     _current_key_info = None
     _phoenix_cycle_count = 0
+    _key_info_by_index.clear()  # Rebuilt from the (re)loaded config on first swap
 
 def get_new_key(key_queue: Queue):
     """
@@ -87,27 +123,63 @@ def get_new_key(key_queue: Queue):
             _current_key_info = None
             return False
 
+def _image_part(img_bytes: bytes) -> dict:
+    """Raw JPEG bytes as a blob part; the SDK serialises it, so we skip our own base64 pass."""
+    return {"mime_type": "image/jpeg", "data": img_bytes}
+
+def _is_yes_answer(text: str) -> bool:
+    """Checks for a leading "YES" without upper-casing the whole (possibly long) response."""
+    return text.lstrip()[:3].upper() == "YES"
+
 def setup_genai_client():
     if not _current_key_info:
         raise NoKeysAvailableError("Worker has no API key to use.")
-    genai.configure(api_key=_current_key_info['key'])
-    return genai.GenerativeModel(config.gemini_model)
+    key = _current_key_info['key']
+    if _model_cache['key'] != key or _model_cache['model'] is None:
+        genai.configure(api_key=key)
+        _model_cache['model'] = genai.GenerativeModel(config.gemini_model)
+        _model_cache['key'] = key
+    return _model_cache['model']
+
+# --- MOSAIC HELPER FUNCTIONS ---
+MOSAIC_DUPLICATE_MAX_BITS = 5  # aHash hamming distance at or below which two images count as the same shot
+
+def _decode_color(img_bytes: bytes):
+    """JPEG/PNG bytes -> BGR ndarray (None if undecodable)."""
+    return cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+def _average_hash(img):
+    """64-bit aHash (8x8 grayscale > mean) of a decoded BGR image."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (8, 8), interpolation=cv2.INTER_AREA)
+    bits = (small > small.mean()).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def _is_near_duplicate(img1, img2) -> bool:
+    """True when both decoded images hash within MOSAIC_DUPLICATE_MAX_BITS of each other."""
+    if not OPENCV_AVAILABLE or img1 is None or img2 is None:
+        return False
+    try:
+        h1, h2 = _average_hash(img1), _average_hash(img2)
+    except Exception:
+        return False
+    return bin(h1 ^ h2).count('1') <= MOSAIC_DUPLICATE_MAX_BITS
 
-# --- MOSAIC HELPER FUNCTION ---
-def create_image_mosaic(img_bytes1: bytes, img_bytes2: bytes) -> bytes:
+def create_image_mosaic(img_bytes1: bytes, img_bytes2: bytes, img1=None, img2=None) -> bytes:
     """
     Stitches two images side-by-side using OpenCV.
+    Pass already decoded BGR `img1`/`img2` to skip decoding.
     Returns: Bytes of the single combined image.
     """
     if not OPENCV_AVAILABLE:
         return img_bytes1 # Fallback if no CV2
 
     try:
-        # Decode
-        nparr1 = np.frombuffer(img_bytes1, np.uint8)
-        img1 = cv2.imdecode(nparr1, cv2.IMREAD_COLOR)
-        nparr2 = np.frombuffer(img_bytes2, np.uint8)
-        img2 = cv2.imdecode(nparr2, cv2.IMREAD_COLOR)
+        # Decode (unless the caller already did)
+        if img1 is None:
+            img1 = _decode_color(img_bytes1)
+        if img2 is None:
+            img2 = _decode_color(img_bytes2)
 
         if img1 is None or img2 is None: return img_bytes1
 
@@ -156,23 +228,8 @@ def parse_gemini_response(raw_text: str) -> list:
             break
     return results
 
-def check_promotional_image(ad_img_bytes: bytes, yoda_instance=None, key_queue: Queue = None, 
-                           worker_id: int = 0, status_queue: Queue = None, ad_id: str = "") -> tuple:
-    """
-    Pre-check function to detect promotional/coming soon images BEFORE classification.
-    Returns: (is_promotional: bool, input_tokens: int, output_tokens: int)
-    """
-    global _key_usage_stats, _token_usage_stats, _current_key_info
-    
-    if not ad_img_bytes:
-        return False, 0, 0
-    
-    # Ensure we have at least one key to start
-    if not _current_key_info:
-        if not get_new_key(key_queue):
-            raise AllKeysExhaustedError("No more API keys available.")
-    
-    prompt_text = """You are an image validator for truck listings. Your ONLY task is to determine if this image shows a REAL truck available for sale, or if it's a promotional/placeholder image.
+# Promotional/placeholder pre-check prompt (static, shared by every call)
+PROMO_CHECK_PROMPT = """You are an image validator for truck listings. Your ONLY task is to determine if this image shows a REAL truck available for sale, or if it's a promotional/placeholder image.
 
 CRITICAL: Your DEFAULT answer should be "NO" (real listing). ONLY answer "YES" if you are ABSOLUTELY CERTAIN it's a placeholder.
 
@@ -209,17 +266,28 @@ IMPORTANT:
 
 Format your response as: "YES - [reason]" or "NO - [reason]"
 """
+
+def check_promotional_image(ad_img_bytes: bytes, yoda_instance=None, key_queue: Queue = None, 
+                           worker_id: int = 0, status_queue: Queue = None, ad_id: str = "") -> tuple:
+    """
+    Pre-check function to detect promotional/coming soon images BEFORE classification.
+    Returns: (is_promotional: bool, input_tokens: int, output_tokens: int)
+    """
+    global _key_usage_stats, _token_usage_stats, _current_key_info
     
-    parts = [prompt_text]
-    parts.append({
-        "inline_data": {
-            "mime_type": "image/jpeg", 
-            "data": base64.b64encode(ad_img_bytes).decode("utf-8")
-        }
-    })
+    if not ad_img_bytes:
+        return False, 0, 0
+    
+    # Ensure we have at least one key to start
+    if not _current_key_info:
+        if not get_new_key(key_queue):
+            raise AllKeysExhaustedError("No more API keys available.")
+    
+    parts = (PROMO_CHECK_PROMPT, _image_part(ad_img_bytes))
     
     max_retries = 3
     attempt = 0
+    t_start0 = time.monotonic()
     
     while attempt < max_retries:
         try:
@@ -232,12 +300,13 @@ Format your response as: "YES - [reason]" or "NO - [reason]"
             valid_key_idx, wait_time = yoda_instance.get_usable_key(current_idx)
             
             if valid_key_idx is None:
+                wait_time = _jittered_wait(wait_time)
                 log_msg(f"🧘 Yoda says: All keys busy. Meditating for {wait_time:.1f}s...", worker_id)
                 time.sleep(wait_time)
                 continue 
             
             if valid_key_idx != current_idx:
-                new_key_info = next((k for k in config.gemini_api_keys_info if k['original_index'] == valid_key_idx), None)
+                new_key_info = _key_info_for(valid_key_idx)
                 if new_key_info:
                     _current_key_info = new_key_info
                     log_msg(f"🔄 Yoda Swapped: Key #{current_idx} -> Key #{valid_key_idx}", worker_id)
@@ -253,8 +322,7 @@ Format your response as: "YES - [reason]" or "NO - [reason]"
             model = setup_genai_client()
             
             t_start = time.time()
-            with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
-                response = model.generate_content(parts, request_options={'timeout': 30})  # OPTIMIZED: 60s -> 30s
+            response = model.generate_content(parts, request_options={'timeout': 30})  # OPTIMIZED: 60s -> 30s
             duration = time.time() - t_start
 
             key_idx = _current_key_info['original_index']
@@ -266,8 +334,7 @@ Format your response as: "YES - [reason]" or "NO - [reason]"
             _token_usage_stats['api_calls'] += 1
             
             # Parse response
-            response_text = response.text.strip().upper()
-            is_promotional = response_text.startswith("YES")
+            is_promotional = _is_yes_answer(response.text)
             
             log_msg(f"📥 Promotional check: {'🚫 PROMOTIONAL/PLACEHOLDER' if is_promotional else '✅ REAL LISTING'} ({duration:.1f}s)", worker_id)
             
@@ -287,10 +354,15 @@ Format your response as: "YES - [reason]" or "NO - [reason]"
             elif any(x in error_msg for x in ["quota", "resource", "429", "500", "502", "503", "504", "deadline", "timeout"]):
                 attempt += 1
                 
+                if time.monotonic() - t_start0 > RETRY_WALL_BUDGET:
+                    log_msg(f"⏱️ Promotional check over {RETRY_WALL_BUDGET:.0f}s budget. Assuming real listing.", worker_id)
+                    return False, 0, 0
+                
                 if attempt == 1:
                     if status_queue and "429" in error_msg: status_queue.put({"type": "rate_limit"})
-                    log_msg(f"⚠️ Promotional check hiccup (Strike 1). Waiting 3s. Error: {e}", worker_id)
-                    time.sleep(3)  # OPTIMIZED: 5s -> 3s
+                    delay = _backoff_delay(attempt, error_msg)
+                    log_msg(f"⚠️ Promotional check hiccup (Strike 1). Waiting {delay:.1f}s. Error: {e}", worker_id)
+                    time.sleep(delay)
                 
                 elif attempt == 2:
                     if status_queue and "429" in error_msg: status_queue.put({"type": "rate_limit"})
@@ -430,7 +502,7 @@ OUTPUT FORMAT INSTRUCTIONS:
 """
     parts = [prompt_text]
     if ad_img_bytes:
-        parts.append({"inline_data": {"mime_type": "image/jpeg", "data": base64.b64encode(ad_img_bytes).decode("utf-8")}})
+        parts.append(_image_part(ad_img_bytes))
     else:
         return ([("Image Not Clear", 100.0)], 0, 0)
     
@@ -440,7 +512,7 @@ OUTPUT FORMAT INSTRUCTIONS:
         if config.include_example_images:
             parts.append("Example Image:")
             if data.get("image_bytes"):
-                parts.append({"inline_data": {"mime_type": "image/jpeg", "data": base64.b64encode(data['image_bytes']).decode("utf-8")}})
+                parts.append(_image_part(data['image_bytes']))
             else:
                 parts.append("(No example image)")
     
@@ -457,12 +529,13 @@ OUTPUT FORMAT INSTRUCTIONS:
             valid_key_idx, wait_time = yoda_instance.get_usable_key(current_idx)
             
             if valid_key_idx is None:
+                wait_time = _jittered_wait(wait_time)
                 log_msg(f"🧘 Yoda says: All keys busy. Meditating for {wait_time:.1f}s...", worker_id)
                 time.sleep(wait_time)
                 continue 
             
             if valid_key_idx != current_idx:
-                new_key_info = next((k for k in config.gemini_api_keys_info if k['original_index'] == valid_key_idx), None)
+                new_key_info = _key_info_for(valid_key_idx)
                 if new_key_info:
                     _current_key_info = new_key_info
                     log_msg(f"🔄 Yoda Swapped: Key #{current_idx} -> Key #{valid_key_idx}", worker_id)
@@ -478,8 +551,7 @@ OUTPUT FORMAT INSTRUCTIONS:
             model = setup_genai_client()
             
             t_start = time.time()
-            with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
-                response = model.generate_content(parts, request_options={'timeout': 45})  # OPTIMIZED: 90s -> 45s
+            response = model.generate_content(parts, request_options={'timeout': 45})  # OPTIMIZED: 90s -> 45s
             duration = time.time() - t_start
 
             key_idx = _current_key_info['original_index']
@@ -513,14 +585,16 @@ OUTPUT FORMAT INSTRUCTIONS:
                 
                 if attempt == 1:
                     if status_queue and "429" in error_msg: status_queue.put({"type": "rate_limit"})
-                    log_msg(f"⚠️ API Hiccup (Strike 1). Waiting 5s. Error: {e}", worker_id)
-                    time.sleep(5)  # OPTIMIZED: 30s -> 5s
+                    delay = _backoff_delay(attempt, error_msg)
+                    log_msg(f"⚠️ API Hiccup (Strike 1). Waiting {delay:.1f}s. Error: {e}", worker_id)
+                    time.sleep(delay)
                 
                 elif attempt == 2:
                     if status_queue and "429" in error_msg: status_queue.put({"type": "rate_limit"})
                     if status_queue: status_queue.put({"worker_id": worker_id, "state": "🥶 Cooling", "ad_id": ad_id})
-                    log_msg(f"🧊 API Freeze (Strike 2). Cooling 15s. Error: {e}", worker_id)
-                    time.sleep(15)  # OPTIMIZED: 180s -> 15s (Yoda handles rate limiting) 
+                    delay = _backoff_delay(attempt, error_msg)
+                    log_msg(f"🧊 API Freeze (Strike 2). Cooling {delay:.1f}s. Error: {e}", worker_id)
+                    time.sleep(delay)
                 
                 elif attempt >= max_retries:
                     log_msg(f"💀 Key #{_current_key_info['original_index']} DEAD (Strike 3). Switching.", worker_id)
@@ -564,6 +638,8 @@ def classify_with_refinement(categories: list, rule: dict, ad_img_bytes: bytes,
     else:
         return None, 0, 0
 
+    parts = [prompt, _image_part(ad_img_bytes)]
+
     max_retries = 3
     attempt = 0
     
@@ -577,12 +653,13 @@ def classify_with_refinement(categories: list, rule: dict, ad_img_bytes: bytes,
             valid_key_idx, wait_time = yoda_instance.get_usable_key(current_idx)
             
             if valid_key_idx is None:
+                wait_time = _jittered_wait(wait_time)
                 log_msg(f"🧘 Yoda says: All keys busy. Meditating {wait_time:.1f}s...", worker_id)
                 time.sleep(wait_time)
                 continue 
             
             if valid_key_idx != current_idx:
-                new_key_info = next((k for k in config.gemini_api_keys_info if k['original_index'] == valid_key_idx), None)
+                new_key_info = _key_info_for(valid_key_idx)
                 if new_key_info:
                     _current_key_info = new_key_info
                     log_msg(f"🔄 Yoda Swapped: Key #{current_idx} -> Key #{valid_key_idx}", worker_id)
@@ -596,8 +673,7 @@ def classify_with_refinement(categories: list, rule: dict, ad_img_bytes: bytes,
 
             log_msg(f"📤 Sending Refinement Request...", worker_id)
             model = setup_genai_client()
-            with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
-                 response = model.generate_content([prompt, {"inline_data": {"mime_type": "image/jpeg", "data": base64.b64encode(ad_img_bytes).decode("utf-8")}}], request_options={'timeout': 45})  # OPTIMIZED: 90s -> 45s
+            response = model.generate_content(parts, request_options={'timeout': 45})  # OPTIMIZED: 90s -> 45s
             
             key_idx = _current_key_info['original_index']
             _key_usage_stats.setdefault(key_idx, {'success': 0, 'quota_failure': 0})['success'] += 1
@@ -640,13 +716,15 @@ def classify_with_refinement(categories: list, rule: dict, ad_img_bytes: bytes,
                 attempt += 1
                 if attempt == 1:
                     if status_queue and "429" in error_msg: status_queue.put({"type": "rate_limit"})
-                    log_msg(f"⚠️ Refinement Hiccup (Strike 1). Waiting 5s. Error: {e}", worker_id)
-                    time.sleep(5)  # OPTIMIZED: 30s -> 5s
+                    delay = _backoff_delay(attempt, error_msg)
+                    log_msg(f"⚠️ Refinement Hiccup (Strike 1). Waiting {delay:.1f}s. Error: {e}", worker_id)
+                    time.sleep(delay)
                 elif attempt == 2:
                     if status_queue and "429" in error_msg: status_queue.put({"type": "rate_limit"})
                     if status_queue: status_queue.put({"worker_id": worker_id, "state": "🥶 Cooling", "ad_id": ad_id})
-                    log_msg(f"🧊 Refinement Freeze (Strike 2). Cooling 15s...", worker_id)
-                    time.sleep(15)  # OPTIMIZED: 180s -> 15s
+                    delay = _backoff_delay(attempt, error_msg)
+                    log_msg(f"🧊 Refinement Freeze (Strike 2). Cooling {delay:.1f}s...", worker_id)
+                    time.sleep(delay)
                 elif attempt >= max_retries:
                     log_msg(f"💀 Key DEAD during refinement. Switching.", worker_id)
                     key_idx = _current_key_info['original_index']
@@ -690,12 +768,26 @@ def classify_with_gemini_multi(breadcrumb: str, category_data: dict, img_bytes_l
             # Continue with classification if check fails
     
     # --- MOSAIC STRATEGY START ---
-    # If we have 2+ images, combine them and send 1 Request.
+    # If we have 2+ distinct images, combine them and send 1 Request.
+    # Near-identical pairs (gallery thumbnails etc.) add no information, only tokens.
+    # Images 0 and 1 are decoded once; the duplicate check and the mosaic share them.
+    pair = (None, None)
     if len(img_bytes_list) >= 2 and OPENCV_AVAILABLE:
+        try:
+            pair = (_decode_color(img_bytes_list[0]), _decode_color(img_bytes_list[1]))
+        except Exception:
+            pass
+    if len(img_bytes_list) >= 2 and OPENCV_AVAILABLE and _is_near_duplicate(*pair):
+        log_msg(f"🪞 Images 1 & 2 are near-duplicates - skipping mosaic.", worker_id)
+        res, t_in, t_out = classify_with_gemini(breadcrumb, category_data, img_bytes_list[0], yoda_instance, key_queue, worker_id, status_queue, ad_id, skip_promo_check=True)
+        total_in += t_in
+        total_out += t_out
+        all_results.extend(res)
+    elif len(img_bytes_list) >= 2 and OPENCV_AVAILABLE:
         try:
             log_msg(f"🧩 Stitching 2 Images into Mosaic (Cost Saving)...", worker_id)
             # Use Index 0 and 1 (Usually sorted by Vision V2 as best)
-            mosaic_bytes = create_image_mosaic(img_bytes_list[0], img_bytes_list[1])
+            mosaic_bytes = create_image_mosaic(img_bytes_list[0], img_bytes_list[1], *pair)
             
             res, t_in, t_out = classify_with_gemini(breadcrumb, category_data, mosaic_bytes, yoda_instance, key_queue, worker_id, status_queue, ad_id, skip_promo_check=True)
             total_in += t_in
@@ -733,25 +825,8 @@ def get_token_usage_stats(): return _token_usage_stats
 
 # ==================== DUALLY LLM VERIFICATION ====================
 
-def verify_dually_with_llm(ad_img_bytes: bytes, yoda_instance, key_queue: Queue, 
-                           worker_id: int = 0, ad_id: str = "", status_queue: Queue = None) -> tuple:
-    """
-    LLM-based verification for Dually detection to reduce false positives.
-    
-    This function serves as a double-check for listings that have been marked as Dually.
-    It asks the LLM to specifically verify if the vehicle has dual rear wheels.
-    
-    Returns: (is_dually: bool, confidence: float, input_tokens: int, output_tokens: int)
-    """
-    global _key_usage_stats, _token_usage_stats, _current_key_info
-    
-    # Ensure we have at least one key to start
-    if not _current_key_info:
-        if not get_new_key(key_queue):
-            raise AllKeysExhaustedError("No more API keys available.")
-    
-    # Detailed prompt for accurate Dually verification (ENHANCED - More Aggressive)
-    prompt_text = """You are an expert vehicle analyst specializing in wheel configuration detection.
+# Detailed prompt for accurate Dually verification (ENHANCED - More Aggressive)
+DUALLY_VERIFY_PROMPT = """You are an expert vehicle analyst specializing in wheel configuration detection.
 
 Your CRITICAL task is to determine if this vehicle has DUAL REAR WHEELS (Dually).
 
@@ -836,19 +911,31 @@ Examples:
 - "NO - I can clearly see a single thin rear tire on each side with no dual pattern"
 """
 
-    parts = [prompt_text]
-    if ad_img_bytes:
-        parts.append({
-            "inline_data": {
-                "mime_type": "image/jpeg", 
-                "data": base64.b64encode(ad_img_bytes).decode("utf-8")
-            }
-        })
-    else:
+def verify_dually_with_llm(ad_img_bytes: bytes, yoda_instance, key_queue: Queue, 
+                           worker_id: int = 0, ad_id: str = "", status_queue: Queue = None) -> tuple:
+    """
+    LLM-based verification for Dually detection to reduce false positives.
+    
+    This function serves as a double-check for listings that have been marked as Dually.
+    It asks the LLM to specifically verify if the vehicle has dual rear wheels.
+    
+    Returns: (is_dually: bool, confidence: float, input_tokens: int, output_tokens: int)
+    """
+    global _key_usage_stats, _token_usage_stats, _current_key_info
+    
+    # Ensure we have at least one key to start
+    if not _current_key_info:
+        if not get_new_key(key_queue):
+            raise AllKeysExhaustedError("No more API keys available.")
+    
+    if not ad_img_bytes:
         return False, 0.0, 0, 0
+
+    parts = (DUALLY_VERIFY_PROMPT, _image_part(ad_img_bytes))
     
     max_retries = 3
     attempt = 0
+    t_start0 = time.monotonic()
     
     while attempt < max_retries:
         try:
@@ -861,12 +948,13 @@ Examples:
             valid_key_idx, wait_time = yoda_instance.get_usable_key(current_idx)
             
             if valid_key_idx is None:
+                wait_time = _jittered_wait(wait_time)
                 log_msg(f"🧘 Yoda says: All keys busy. Meditating for {wait_time:.1f}s...", worker_id)
                 time.sleep(wait_time)
                 continue 
             
             if valid_key_idx != current_idx:
-                new_key_info = next((k for k in config.gemini_api_keys_info if k['original_index'] == valid_key_idx), None)
+                new_key_info = _key_info_for(valid_key_idx)
                 if new_key_info:
                     _current_key_info = new_key_info
                     log_msg(f"🔄 Yoda Swapped: Key #{current_idx} -> Key #{valid_key_idx}", worker_id)
@@ -882,8 +970,7 @@ Examples:
             model = setup_genai_client()
             
             t_start = time.time()
-            with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
-                response = model.generate_content(parts, request_options={'timeout': 45})  # OPTIMIZED: 90s -> 45s
+            response = model.generate_content(parts, request_options={'timeout': 45})  # OPTIMIZED: 90s -> 45s
             duration = time.time() - t_start
 
             key_idx = _current_key_info['original_index']
@@ -895,8 +982,7 @@ Examples:
             _token_usage_stats['api_calls'] += 1
             
             # Parse response
-            response_text = response.text.strip().upper()
-            is_dually = response_text.startswith("YES")
+            is_dually = _is_yes_answer(response.text)
             
             # Confidence based on response clarity
             confidence = 95.0 if is_dually else 5.0
@@ -919,10 +1005,15 @@ Examples:
             elif any(x in error_msg for x in ["quota", "resource", "429", "500", "502", "503", "504", "deadline", "timeout"]):
                 attempt += 1
                 
+                if time.monotonic() - t_start0 > RETRY_WALL_BUDGET:
+                    log_msg(f"⏱️ Dually verification over {RETRY_WALL_BUDGET:.0f}s budget. Giving up.", worker_id)
+                    return False, 0.0, 0, 0
+                
                 if attempt == 1:
                     if status_queue and "429" in error_msg: status_queue.put({"type": "rate_limit"})
-                    log_msg(f"⚠️ Dually Verification Hiccup (Strike 1). Waiting 3s. Error: {e}", worker_id)
-                    time.sleep(3)  # OPTIMIZED: 5s -> 3s
+                    delay = _backoff_delay(attempt, error_msg)
+                    log_msg(f"⚠️ Dually Verification Hiccup (Strike 1). Waiting {delay:.1f}s. Error: {e}", worker_id)
+                    time.sleep(delay)
                 
                 elif attempt == 2:
                     if status_queue and "429" in error_msg: status_queue.put({"type": "rate_limit"})
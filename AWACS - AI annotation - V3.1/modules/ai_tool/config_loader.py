@@ -35,13 +35,22 @@ def load_config():
         config.include_example_images = config_parser.getboolean('Settings', 'IncludeExampleImagesInPrompt')
         config.high_confidence_threshold = config_parser.getfloat('Settings', 'HighConfidenceThreshold', fallback=95.0)
         config.scraper_sanity_check = config_parser.getint('Settings', 'ScraperSanityCheck', fallback=50)
+        # Scraping browsers don't download images (their URLs are still in the DOM)
+        config.browser_block_images = config_parser.getboolean('Settings', 'BrowserBlockImages', fallback=True)
+        # Background HEAD requests for scraped image URLs, to warm the CDN for the AI step (off by default)
+        config.scraper_warm_images = config_parser.getboolean('Settings', 'ScraperWarmImageCache', fallback=False)
+        # Headless browsers the scraper runs side by side (keep it low to respect the site)
+        config.scraper_workers = config_parser.getint('Settings', 'ScraperWorkers', fallback=4)
         config.api_key_daily_limit = config_parser.getint('Settings', 'ApiKeyDailyLimit', fallback=250)
         config.rate_limit_rpm = config_parser.getint('Settings', 'RateLimitRPM', fallback=13)
+        # Disk cap for downloaded images, LRU-pruned at run start (0 = half of the free disk)
+        config.image_cache_max_mb = config_parser.getint('Settings', 'ImageCacheMaxMB', fallback=0)
         
         # Dually Detection Settings
         config.enable_darth_cv2_dually = config_parser.getboolean('Settings', 'EnableDarthCV2Dually', fallback=True)
         config.enable_dually_llm_verification = config_parser.getboolean('Settings', 'EnableDuallyLLMVerification', fallback=True)
         config.darth_cv2_dually_threshold = config_parser.getint('Settings', 'DarthCV2DuallyThreshold', fallback=2)
+        config.darth_cv2_use_opencl = config_parser.getboolean('Settings', 'DarthCV2UseOpenCL', fallback=False)
 
         # API Keys - Now stores a list of dictionaries for rich data
         config.gemini_api_keys_info = []
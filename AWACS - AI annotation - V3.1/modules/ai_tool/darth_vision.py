@@ -1,8 +1,161 @@
 import cv2
 import numpy as np
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from .config_loader import config
 
-def inspect_for_dually(img_bytes, debug=False):
+# OpenCV releases the GIL in Canny/findContours/etc., so the multi-angle variants can run side by side
+_variant_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="darth-variant")
+
+# Multi-angle stops early once a variant clears the dually threshold by this much
+MULTI_ANGLE_CONFIDENT_MARGIN = 15
+
+# Long-side cap for the CV pipeline; wheels are still tens of px at this size
+DARTH_MAX_SIDE = 800
+
+# Per-method score a detector must reach to count towards consensus
+# ENHANCED: Lowered thresholds to reduce false negatives
+METHOD_MINIMUMS = {
+    'ellipse_wheels': 8,    # Lowered from 10 (more sensitive to wheel detection)
+    'contour_bulge': 5,     # Lowered from 8 (more sensitive to fender bulge)
+    'width_profile': 5,     # Lowered from 8 (more sensitive to width differences)
+    'edge_density': 3,      # Lowered from 5 (more sensitive to edge patterns)
+    'silhouette': 2         # Lowered from 3 (more sensitive to aspect ratio)
+}
+
+# Results memoised by image digest - stock/placeholder photos recur across ads
+INSPECT_CACHE_SIZE = 4096
+_inspect_cache = OrderedDict()
+_inspect_cache_lock = threading.Lock()
+
+# OpenCV T-API: with DarthCV2UseOpenCL on (and a device present), the blur/Canny stages get a
+# cv2.UMat so OpenCV dispatches its OpenCL kernels. Resolved once, on first use (after load_config).
+_opencl_state = None
+
+def _use_opencl() -> bool:
+    global _opencl_state
+    if _opencl_state is None:
+        _opencl_state = False
+        if getattr(config, 'darth_cv2_use_opencl', False):
+            try:
+                if cv2.ocl.haveOpenCL():
+                    cv2.ocl.setUseOpenCL(True)
+                    _opencl_state = cv2.ocl.useOpenCL()
+            except Exception:
+                _opencl_state = False
+    return _opencl_state
+
+def _to_ndarray(mat):
+    """Downloads a UMat result back to numpy (no-op for ndarrays)."""
+    return mat.get() if isinstance(mat, cv2.UMat) else mat
+
+def _cached_by_digest(func):
+    """
+    LRU-caches func(img_bytes) on a 16-byte BLAKE2b digest of the bytes (not the bytes
+    themselves). Debug runs and pre-decoded `image=` calls go straight through.
+    """
+    @functools.wraps(func)
+    def wrapper(img_bytes=None, debug=False, **kwargs):
+        if debug or kwargs.get('image') is not None or not img_bytes:
+            return func(img_bytes, debug, **kwargs)
+        
+        key = (func.__name__, hashlib.blake2b(img_bytes, digest_size=16).digest())
+        with _inspect_cache_lock:
+            if key in _inspect_cache:
+                _inspect_cache.move_to_end(key)
+                return _inspect_cache[key]
+        
+        result = func(img_bytes, debug)
+        with _inspect_cache_lock:
+            _inspect_cache[key] = result
+            if len(_inspect_cache) > INSPECT_CACHE_SIZE:
+                _inspect_cache.popitem(last=False)
+        return result
+    return wrapper
+
+# Try loading libjpeg-turbo safely (SIMD JPEG -> gray decode). TurboJPEG() also raises
+# if the shared library is missing, so anything failing here just means "use OpenCV".
+try:
+    from turbojpeg import TurboJPEG, TJPF_GRAY
+    _tj = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+except Exception:
+    TURBOJPEG_AVAILABLE = False
+
+def _jpeg_orientation(img_bytes):
+    """
+    EXIF Orientation of JPEG bytes: 1 when upright or untagged, None if the header can't be read.
+    Only walks the segments ahead of the image data (SOS), so it costs nothing on the pixels.
+    """
+    try:
+        i, n = 2, len(img_bytes)
+        while i + 4 <= n and img_bytes[i] == 0xFF:
+            marker = img_bytes[i + 1]
+            if marker in (0xD9, 0xDA):  # End of image / start of scan: no metadata past here
+                break
+            seg_len = int.from_bytes(img_bytes[i + 2:i + 4], 'big')
+            if marker == 0xE1 and img_bytes[i + 4:i + 10] == b'Exif\x00\x00':
+                tiff = i + 10
+                order = 'little' if img_bytes[tiff:tiff + 2] == b'II' else 'big'
+                ifd = tiff + int.from_bytes(img_bytes[tiff + 4:tiff + 8], order)
+                for k in range(int.from_bytes(img_bytes[ifd:ifd + 2], order)):
+                    entry = ifd + 2 + 12 * k
+                    if int.from_bytes(img_bytes[entry:entry + 2], order) == 0x0112:
+                        return int.from_bytes(img_bytes[entry + 8:entry + 10], order)
+                return 1
+            i += 2 + seg_len
+        return 1
+    except Exception:
+        return None
+
+def _decode_gray(img_bytes):
+    """JPEG/PNG bytes -> single-channel uint8 array (None if undecodable). Every pipeline here runs on gray."""
+    # TurboJPEG ignores EXIF orientation while OpenCV's decode applies it - rotated photos go to
+    # OpenCV so the detectors see the same picture whichever decoder is installed
+    if TURBOJPEG_AVAILABLE and img_bytes[:2] == b'\xff\xd8' and _jpeg_orientation(img_bytes) == 1:
+        try:
+            return _tj.decode(img_bytes, pixel_format=TJPF_GRAY)[:, :, 0]
+        except Exception:
+            pass  # Corrupt/unusual JPEG - let OpenCV have a go
+    # OpenCV path keeps the colour decode + cvtColor the thresholds were tuned on
+    image = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+    return None if image is None else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+def _average_hash(gray):
+    """64-bit aHash (8x8 > mean) of a gray ndarray - identical hashes mean near-duplicate at 8x8 mean threshold."""
+    small = cv2.resize(gray, (8, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small > small.mean()).tobytes(), 'big')
+
+# Try importing Numba safely (optional JIT for the wheel-pair scan)
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _count_dual_pairs(xs, ys, max_dy, min_dx, max_dx):
+        """Counts neighbouring ellipse centres (sorted by x) that look like a dual wheel pair."""
+        pairs = 0
+        for i in range(xs.shape[0] - 1):
+            y_diff = abs(ys[i] - ys[i + 1])
+            x_diff = abs(xs[i] - xs[i + 1])
+            if y_diff < max_dy and min_dx < x_diff < max_dx:
+                pairs += 1
+        return pairs
+else:
+    def _count_dual_pairs(xs, ys, max_dy, min_dx, max_dx):
+        """Counts neighbouring ellipse centres (sorted by x) that look like a dual wheel pair."""
+        y_diff = np.abs(np.diff(ys))
+        x_diff = np.abs(np.diff(xs))
+        return int(np.count_nonzero((y_diff < max_dy) & (x_diff > min_dx) & (x_diff < max_dx)))
+
+@_cached_by_digest
+def inspect_for_dually(img_bytes=None, debug=False, image=None):
     """
     ADVANCED Dually Detection using multiple detection methods:
     
@@ -18,19 +171,30 @@ def inspect_for_dually(img_bytes, debug=False):
     - Method 4: Edge density in wheel well areas
     - Method 5: Aspect ratio analysis of vehicle silhouette
     
+    Pass either encoded img_bytes or an already decoded gray/BGR `image` (skips decoding).
+    
     Returns: (True/False, Confidence_Score 0-100)
     """
     try:
         threshold = getattr(config, 'darth_cv2_dually_threshold', 50)
         
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
         if image is None:
+            gray = _decode_gray(img_bytes)
+        elif image.ndim == 3:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = image
+        
+        if gray is None:
             return False, 0.0
 
-        h, w = image.shape[:2]
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # Big listing photos (2000-4000px) cost time, not detail: shrink the long side to
+        # DARTH_MAX_SIDE. Pixel thresholds below are multiplied by `scale` to match.
+        scale = min(1.0, DARTH_MAX_SIDE / max(gray.shape[:2]))
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        h, w = gray.shape[:2]
         
         # Initialize scores for each detection method
         scores = {
@@ -49,6 +213,7 @@ def inspect_for_dually(img_bytes, debug=False):
         left_density = 0
         right_density = 0
         aspect = 1.0
+        main_rect = None  # Bounding box of the largest Otsu contour (shared by Methods 2 and 5)
         
         # =================================================================
         # METHOD 1: ELLIPSE DETECTION FOR WHEELS
@@ -57,45 +222,36 @@ def inspect_for_dually(img_bytes, debug=False):
         wheel_region = gray[int(h*0.5):, :]  # Bottom half where wheels are
         
         # Apply adaptive thresholding for better edge detection
-        blurred = cv2.GaussianBlur(wheel_region, (5, 5), 0)
-        edges = cv2.Canny(blurred, 30, 100)
+        use_ocl = _use_opencl()
+        blurred = cv2.GaussianBlur(cv2.UMat(wheel_region) if use_ocl else wheel_region, (5, 5), 0)
+        edges = _to_ndarray(cv2.Canny(blurred, 30, 100))
         
         # Find contours that could be wheels
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
-        ellipses = []
-        for cnt in contours:
-            if len(cnt) >= 5:  # Minimum points needed to fit ellipse
-                try:
-                    ellipse = cv2.fitEllipse(cnt)
-                    (cx, cy), (ma, MA), angle = ellipse
-                    
-                    # Filter for wheel-like ellipses
-                    aspect = min(ma, MA) / (max(ma, MA) + 1e-5)
-                    area = np.pi * ma * MA / 4
-                    
-                    # Wheels are roughly circular (aspect 0.5-1.0) and reasonable size
-                    if 0.4 < aspect < 1.0 and 500 < area < 50000:
-                        ellipses.append((int(cx), int(cy), int(ma), int(MA)))
-                except:
-                    pass
+        ellipses = []  # (cx, cy) centres only; axes aren't needed past the filter
+        fit_candidates = [cnt for cnt in contours if len(cnt) >= 5]  # Minimum points needed to fit ellipse
+        for cnt in fit_candidates:
+            try:
+                (cx, cy), (ma, MA), angle = cv2.fitEllipse(cnt)
+            except cv2.error:
+                continue
+            
+            # Filter for wheel-like ellipses
+            aspect = min(ma, MA) / (max(ma, MA) + 1e-5)
+            area = np.pi * ma * MA / 4
+            
+            # Wheels are roughly circular (aspect 0.5-1.0) and reasonable size
+            if 0.4 < aspect < 1.0 and 500 * scale**2 < area < 50000 * scale**2:
+                ellipses.append((int(cx), int(cy)))
         
         # Look for PAIRS of ellipses close together (dual wheel pattern)
         if len(ellipses) >= 2:
-            ellipses.sort(key=lambda e: e[0])  # Sort by x-coordinate
+            centres = np.array(ellipses, dtype=np.int32)
+            centres = centres[np.argsort(centres[:, 0], kind='stable')]  # Sort by x-coordinate
             
-            dual_pairs = 0
-            for i in range(len(ellipses) - 1):
-                x1, y1, _, _ = ellipses[i]
-                x2, y2, _, _ = ellipses[i + 1]
-                
-                # Check if ellipses are at similar height and close together
-                y_diff = abs(y1 - y2)
-                x_diff = abs(x1 - x2)
-                
-                # Dual wheels are close together horizontally but aligned vertically
-                if y_diff < 50 and 20 < x_diff < 150:
-                    dual_pairs += 1
+            # Dual wheels are close together horizontally but aligned vertically
+            dual_pairs = int(_count_dual_pairs(centres[:, 0], centres[:, 1], 50 * scale, 20 * scale, 150 * scale))
             
             scores['ellipse_wheels'] = min(25, dual_pairs * 15)
             
@@ -116,9 +272,10 @@ def inspect_for_dually(img_bytes, debug=False):
             main_contour = max(contours, key=cv2.contourArea)
             
             # Analyze the contour width at different heights
-            x, y, cw, ch = cv2.boundingRect(main_contour)
+            main_rect = cv2.boundingRect(main_contour)
+            x, y, cw, ch = main_rect
             
-            if ch > 50:  # Ensure contour is large enough
+            if ch > 50 * scale:  # Ensure contour is large enough
                 # Measure width at different vertical positions
                 widths = []
                 for row_pct in [0.3, 0.5, 0.7, 0.9]:  # 30%, 50%, 70%, 90% from top
@@ -158,26 +315,30 @@ def inspect_for_dually(img_bytes, debug=False):
         # =================================================================
         
         # Use edge detection on full image
-        edges_full = cv2.Canny(gray, 50, 150)
+        edges_full = _to_ndarray(cv2.Canny(cv2.UMat(gray) if use_ocl else gray, 50, 150))
+        
+        # Pack the edge map to 1 bit per column once, so each band scan ORs
+        # 8 columns per byte instead of touching every pixel
+        edge_bits = np.packbits(edges_full > 0, axis=1)
         
         # Analyze width at different height bands
-        def get_row_width(edge_img, row_start_pct, row_end_pct):
-            r_start = int(edge_img.shape[0] * row_start_pct)
-            r_end = int(edge_img.shape[0] * row_end_pct)
-            region = edge_img[r_start:r_end, :]
+        def get_row_width(row_start_pct, row_end_pct):
+            r_start = int(h * row_start_pct)
+            r_end = int(h * row_end_pct)
+            band = np.bitwise_or.reduce(edge_bits[r_start:r_end], axis=0)
             
-            cols_with_edges = np.any(region > 0, axis=0)
-            if np.any(cols_with_edges):
+            cols_with_edges = np.unpackbits(band, count=w)
+            if cols_with_edges.any():
                 left = np.argmax(cols_with_edges)
-                right = len(cols_with_edges) - np.argmax(cols_with_edges[::-1]) - 1
+                right = w - np.argmax(cols_with_edges[::-1]) - 1
                 return right - left
             return 0
         
-        cab_width = get_row_width(edges_full, 0.1, 0.3)      # Top portion (cab)
-        mid_width = get_row_width(edges_full, 0.4, 0.6)      # Middle portion
-        rear_width = get_row_width(edges_full, 0.7, 0.95)    # Lower portion (rear fenders)
+        cab_width = get_row_width(0.1, 0.3)      # Top portion (cab)
+        mid_width = get_row_width(0.4, 0.6)      # Middle portion
+        rear_width = get_row_width(0.7, 0.95)    # Lower portion (rear fenders)
         
-        if cab_width > 50:  # Ensure we have valid measurements
+        if cab_width > 50 * scale:  # Ensure we have valid measurements
             rear_to_cab_ratio = rear_width / cab_width
             
             # Duallys typically have rear 15-30% wider than cab
@@ -200,8 +361,8 @@ def inspect_for_dually(img_bytes, debug=False):
         right_wheel_area = edges_full[h-ww_height:, w-ww_width:]
         
         # Calculate edge density
-        left_density = np.sum(left_wheel_area > 0) / (left_wheel_area.size + 1)
-        right_density = np.sum(right_wheel_area > 0) / (right_wheel_area.size + 1)
+        left_density = np.count_nonzero(left_wheel_area) / (left_wheel_area.size + 1)
+        right_density = np.count_nonzero(right_wheel_area) / (right_wheel_area.size + 1)
         avg_density = (left_density + right_density) / 2
         
         # Higher edge density in wheel areas suggests dual wheels
@@ -217,9 +378,9 @@ def inspect_for_dually(img_bytes, debug=False):
         # Duallys have a wider, more "squat" appearance
         # =================================================================
         
-        if contours:
-            main_contour = max(contours, key=cv2.contourArea)
-            x, y, cw, ch = cv2.boundingRect(main_contour)
+        if main_rect is not None:
+            # Same vehicle contour as Method 2 - reuse its box instead of re-scanning all contours
+            x, y, cw, ch = main_rect
             
             # Calculate aspect ratio (width/height)
             aspect = cw / (ch + 1e-5)
@@ -239,7 +400,7 @@ def inspect_for_dually(img_bytes, debug=False):
         fp_reasons = []
         
         # FP CHECK 1: Width ratio too extreme (>1.4 is suspicious - might be a trailer or wide body)
-        if cab_width > 50 and rear_width > 0:
+        if cab_width > 50 * scale and rear_width > 0:
             ratio = rear_width / cab_width
             if ratio > 1.4:
                 false_positive_penalty += 15
@@ -285,16 +446,7 @@ def inspect_for_dually(img_bytes, debug=False):
         # =================================================================
         
         # Count how many methods scored above minimum threshold
-        # ENHANCED: Lowered thresholds to reduce false negatives
-        method_minimums = {
-            'ellipse_wheels': 8,    # Lowered from 10 (more sensitive to wheel detection)
-            'contour_bulge': 5,     # Lowered from 8 (more sensitive to fender bulge)
-            'width_profile': 5,     # Lowered from 8 (more sensitive to width differences)
-            'edge_density': 3,      # Lowered from 5 (more sensitive to edge patterns)
-            'silhouette': 2         # Lowered from 3 (more sensitive to aspect ratio)
-        }
-        
-        methods_agreeing = sum(1 for k in scores if scores[k] >= method_minimums[k])
+        methods_agreeing = sum(1 for k, v in scores.items() if v >= METHOD_MINIMUMS[k])
         
         # ENHANCED: More lenient consensus to reduce false negatives
         # We prefer false positives over false negatives (LLM will verify later)
@@ -321,7 +473,7 @@ def inspect_for_dually(img_bytes, debug=False):
         # COMBINE SCORES WITH PENALTIES
         # =================================================================
         
-        raw_total = sum(scores[k] for k in scores)
+        raw_total = sum(scores.values())
         
         # Apply penalties and bonuses
         adjusted_total = raw_total - false_positive_penalty - consensus_penalty + consensus_bonus
@@ -345,6 +497,7 @@ def inspect_for_dually(img_bytes, debug=False):
         return False, 0.0
 
 
+@_cached_by_digest
 def inspect_for_dually_multi_angle(img_bytes, debug=False):
     """
     Try detection from multiple perspectives:
@@ -353,43 +506,52 @@ def inspect_for_dually_multi_angle(img_bytes, debug=False):
     3. Focus on left side only
     4. Focus on right side only
     
-    Returns the highest confidence score found.
+    Returns the highest confidence score found, or the first one that clears the
+    threshold by MULTI_ANGLE_CONFIDENT_MARGIN (remaining variants are skipped).
     """
     try:
         results = []
+        confident_score = getattr(config, 'darth_cv2_dually_threshold', 50) + MULTI_ANGLE_CONFIDENT_MARGIN
         
-        # 1. Original image
-        is_dually, score = inspect_for_dually(img_bytes, debug)
-        results.append(('original', is_dually, score))
-        
-        # Decode image for variations
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode once (straight to gray); every variation below works on the ndarray directly
+        image = _decode_gray(img_bytes)
         
         if image is None:
-            return is_dually, score
+            return False, 0.0
         
         h, w = image.shape[:2]
         
-        # 2. Horizontally flipped
-        flipped = cv2.flip(image, 1)
-        _, flipped_bytes = cv2.imencode('.jpg', flipped)
-        is_dually_f, score_f = inspect_for_dually(flipped_bytes.tobytes(), False)
-        results.append(('flipped', is_dually_f, score_f))
-        
-        # 3. Right half focus (if truck is on right side of image)
-        right_half = image[:, w//2:]
-        if right_half.size > 0:
-            _, right_bytes = cv2.imencode('.jpg', right_half)
-            is_dually_r, score_r = inspect_for_dually(right_bytes.tobytes(), False)
-            results.append(('right_half', is_dually_r, score_r))
-        
-        # 4. Left half focus
-        left_half = image[:, :w//2]
-        if left_half.size > 0:
-            _, left_bytes = cv2.imencode('.jpg', left_half)
-            is_dually_l, score_l = inspect_for_dually(left_bytes.tobytes(), False)
-            results.append(('left_half', is_dually_l, score_l))
+        # 2-4. Right half, left half (smaller, so cheapest first) and flipped (truck facing other direction).
+        # These run on the pool with debug off (no interleaved prints) while the original runs here.
+        # Symmetric photos / narrow crops give halves (or a flip) that are near-duplicates of a variant
+        # already queued, so anything whose aHash was already seen is skipped.
+        variants = [('right_half', image[:, w//2:]),
+                    ('left_half', image[:, :w//2]),
+                    ('flipped', cv2.flip(image, 1))]
+        seen = {_average_hash(image)}
+        futures = []
+        for label, img in variants:
+            if img.size == 0:
+                continue
+            digest = _average_hash(img)
+            if digest in seen:
+                if debug:
+                    print(f"  Skipping {label}: same aHash as an earlier variant")
+                continue
+            seen.add(digest)
+            futures.append((label, _variant_pool.submit(inspect_for_dually, image=img)))
+        
+        # 1. Original image
+        is_dually, score = inspect_for_dually(debug=debug, image=image)
+        results.append(('original', is_dually, score))
+        
+        for label, future in futures:
+            if results[-1][2] >= confident_score:
+                # Confident positive already - drop whatever hasn't started yet
+                for _, pending in futures:
+                    pending.cancel()
+                break
+            results.append((label, *future.result()))
         
         # Return the best result
         best = max(results, key=lambda x: x[2])
@@ -424,22 +586,25 @@ def inspect_for_dually_legacy(img_bytes, debug=False):
     try:
         threshold = getattr(config, 'darth_cv2_dually_threshold', 2)
         
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        gray = _decode_gray(img_bytes)
         
-        if image is None:
+        if gray is None:
             return False, 0.0
 
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         edges = cv2.Canny(gray, threshold1=50, threshold2=150)
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         tire_count = 0
-        for cnt in contours:
-            x, y, cw, ch = cv2.boundingRect(cnt)
+        if contours:
+            # Bounding boxes for all contours at once: per-contour min/max over the stacked points
+            # (same as cv2.boundingRect, without a Python call per contour)
+            pts = np.concatenate(contours).reshape(-1, 2)
+            starts = np.cumsum([0] + [len(cnt) for cnt in contours[:-1]])
+            cw = np.maximum.reduceat(pts[:, 0], starts) - np.minimum.reduceat(pts[:, 0], starts) + 1
+            ch = np.maximum.reduceat(pts[:, 1], starts) - np.minimum.reduceat(pts[:, 1], starts) + 1
             aspect_ratio = cw / (ch + 1e-5)
-            if 0.7 < aspect_ratio < 1.4 and 20 < cw < 150 and 20 < ch < 150:
-                tire_count += 1
+            is_tire = (aspect_ratio > 0.7) & (aspect_ratio < 1.4) & (cw > 20) & (cw < 150) & (ch > 20) & (ch < 150)
+            tire_count = int(np.count_nonzero(is_tire))
         
         is_dually = tire_count >= threshold
         return is_dually, float(tire_count)
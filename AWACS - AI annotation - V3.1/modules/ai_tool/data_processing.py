@@ -3,15 +3,33 @@ import re
 import json
 import base64
 import sys
+import functools
 from .utils import log_msg
 
+# Try importing pyahocorasick safely (single-pass fuzzy matching in normalize_text)
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Try importing orjson safely (faster parse of the large categories/rules files)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 def load_json_file(file_path, default_data):
     if not os.path.exists(file_path):
         return default_data
     try:
+        if ORJSON_AVAILABLE:
+            with open(file_path, "rb") as f:
+                return orjson.loads(f.read())
         with open(file_path, "r", encoding="utf-8") as f:
             return json.load(f)
-    except json.JSONDecodeError as e:
+    except json.JSONDecodeError as e:  # orjson.JSONDecodeError subclasses this
         print(f"\n❌ CRITICAL ERROR: Your '{os.path.basename(file_path)}' file is broken!")
         print(f"   Error details: {e}")
         sys.exit(1)
@@ -30,40 +48,122 @@ def load_category_data(json_path: str) -> dict:
         log_msg(f"❌ Error loading categories: {e}", -1)
     return categories
 
+def build_normalize_automaton(sorted_keys: list):
+    """
+    Aho-Corasick automaton over the (lowercased, original) keys from build_normalize_index.
+    Each key carries its rank in the longest-first order, so the lowest-ranked hit is the same
+    key the linear scan would pick. Returns None if pyahocorasick is missing or there are no keys.
+    """
+    if not AHOCORASICK_AVAILABLE or not sorted_keys:
+        return None
+    automaton = ahocorasick.Automaton()
+    for rank, (k_lower, k) in enumerate(sorted_keys):
+        if not k_lower:
+            return None  # "" matches every text; leave that edge case to the linear scan
+        if k_lower not in automaton:  # First key wins, as in the linear scan
+            automaton.add_word(k_lower, (rank, k))
+    automaton.make_automaton()
+    return automaton
+
+def build_normalize_index(normalize_map: dict, with_automaton: bool = True) -> dict:
+    """
+    Precomputes the lookups normalize_text needs (lowercased keys, longest-first order,
+    optional automaton). load_rules builds this once as rules['_normalize_index'].
+    """
+    lower = {}
+    for k in normalize_map:
+        lower.setdefault(k.lower(), k)  # First key wins, as in a top-to-bottom scan
+    sorted_keys = [(k.lower(), k) for k in sorted(normalize_map.keys(), key=len, reverse=True)]
+    return {
+        "lower": lower,
+        "sorted_keys": sorted_keys,
+        "automaton": build_normalize_automaton(sorted_keys) if with_automaton else None
+    }
+
+def build_exclusion_conflicts(exclusion_rules: list) -> dict:
+    """
+    Symmetric category -> {conflicting categories} map from the exclusion rules.
+    load_rules builds this once as rules['_exclusion_conflicts'].
+    """
+    conflicts = {}
+    for rule in exclusion_rules:
+        rule_cat = rule.get("category", "").strip()
+        for other in rule.get("not_with", []):
+            other = other.strip()
+            conflicts.setdefault(rule_cat, set()).add(other)
+            conflicts.setdefault(other, set()).add(rule_cat)
+    return conflicts
+
+def build_overlap_index(overlap_rules: list) -> dict:
+    """
+    frozenset(lowercased pair) -> rule, first rule wins (same as the linear scan).
+    load_rules builds this once as rules['_overlap_index'].
+    """
+    index = {}
+    for rule in overlap_rules:
+        index.setdefault(frozenset(p.lower() for p in rule.get("pair", [])), rule)
+    return index
+
 def load_rules(json_path: str) -> dict:
+    """
+    Loads Rules.json plus its prebuilt lookup indexes. The result is cached per
+    (path, mtime), so repeated runs in one process skip the parse and index builds
+    until the file is edited. Callers share the returned dict and must not modify it.
+    """
+    try:
+        mtime = os.path.getmtime(json_path)
+    except OSError:
+        mtime = None
+    return _load_rules_cached(json_path, mtime)
+
+@functools.lru_cache(maxsize=8)
+def _load_rules_cached(json_path: str, mtime) -> dict:
     default_rules = {"normalize_map": {}, "exclusion_rules": [], "truck_overlaps": []}
     data = load_json_file(json_path, default_rules)
+    normalize_map = data.get("normalize_map", {})
+    exclusion_rules = data.get("exclusion_rules", [])
+    truck_overlaps = data.get("truck_overlaps", [])
     return {
-        "normalize_map": data.get("normalize_map", {}),
-        "exclusion_rules": data.get("exclusion_rules", []),
-        "truck_overlaps": data.get("truck_overlaps", [])
+        "normalize_map": normalize_map,
+        "exclusion_rules": exclusion_rules,
+        "truck_overlaps": truck_overlaps,
+        "_normalize_index": build_normalize_index(normalize_map),
+        "_exclusion_conflicts": build_exclusion_conflicts(exclusion_rules),
+        "_overlap_index": build_overlap_index(truck_overlaps)
     }
 
-def normalize_text(text: str, normalize_map: dict, worker_id: int = -1) -> str:
+def normalize_text(text: str, normalize_map: dict, worker_id: int = -1, index: dict = None) -> str:
     """
     Cleans and standardizes a category name string using Fuzzy Matching.
     Logs when a rule triggers a change.
+    Pass rules['_normalize_index'] as `index` to skip rebuilding the lookups on every call.
     """
     if not text: return ""
     txt = str(text).strip()
     txt_lower = txt.lower()
+    if index is None:
+        index = build_normalize_index(normalize_map, with_automaton=False)
     
     # 1. Exact Match
-    for k, v in normalize_map.items():
-        if txt_lower == k.lower(): 
-            if txt != v and worker_id > 0:
-                log_msg(f"   📏 Rule Triggered: Exact Map '{txt}' -> '{v}'", worker_id)
-            return v
-
-    # 2. Fuzzy Match (Smart)
-    sorted_keys = sorted(normalize_map.keys(), key=len, reverse=True)
+    k = index["lower"].get(txt_lower)
+    if k is not None:
+        v = normalize_map[k]
+        if txt != v and worker_id > 0:
+            log_msg(f"   📏 Rule Triggered: Exact Map '{txt}' -> '{v}'", worker_id)
+        return v
+
+    # 2. Fuzzy Match (Smart) - longest key contained in the text wins
+    if index["automaton"] is not None:
+        hits = [value for _, value in index["automaton"].iter(txt_lower)]
+        k = min(hits)[1] if hits else None
+    else:
+        k = next((k for k_lower, k in index["sorted_keys"] if k_lower in txt_lower), None)
     
-    for k in sorted_keys:
-        if k.lower() in txt_lower:
-            # Check if we are actually changing something significant
-            if normalize_map[k] != txt and worker_id > 0:
-                 log_msg(f"   📏 Rule Triggered: Fuzzy Map '{txt}' -> '{normalize_map[k]}' (matched '{k}')", worker_id)
-            return normalize_map[k]
+    if k is not None:
+        # Check if we are actually changing something significant
+        if normalize_map[k] != txt and worker_id > 0:
+             log_msg(f"   📏 Rule Triggered: Fuzzy Map '{txt}' -> '{normalize_map[k]}' (matched '{k}')", worker_id)
+        return normalize_map[k]
 
     # 3. Hardcoded Cleanups
     if "cab chassis" in txt_lower or "chassis cab" in txt_lower: 
@@ -75,7 +175,8 @@ def normalize_text(text: str, normalize_map: dict, worker_id: int = -1) -> str:
     
     return txt
 
-def find_overlap_rule(classifications: list, overlap_rules: list, worker_id: int = -1) -> tuple | None:
+def find_overlap_rule(classifications: list, overlap_rules: list, worker_id: int = -1,
+                      overlap_index: dict = None) -> tuple | None:
     if not classifications: return None
     top_one_cat = classifications[0][0].lower()
     
@@ -83,9 +184,10 @@ def find_overlap_rule(classifications: list, overlap_rules: list, worker_id: int
     # If Dually is mentioned OR if it's a truck type that is ALMOST ALWAYS a dually
     # (Box Trucks, Cutaways, etc.), we force a visual wheel check.
     hd_trucks = ["box truck - straight truck", "cutaway-cube van", "stepvan", "cabover truck - coe"]
-    is_hd_without_dually = (top_one_cat in hd_trucks and not any("dually" in c[0].lower() for c in classifications))
+    has_dually = any("dually" in c[0].lower() for c in classifications)
+    is_hd_without_dually = (top_one_cat in hd_trucks and not has_dually)
     
-    if "dually" in str(classifications).lower() or is_hd_without_dually:
+    if has_dually or is_hd_without_dually:
         other_cat = classifications[0][0]
         if worker_id > 0:
              log_msg(f"   ⚔️ Rule Triggered: Dually/HD Wheel Verification for '{other_cat}'", worker_id)
@@ -122,21 +224,21 @@ def find_overlap_rule(classifications: list, overlap_rules: list, worker_id: int
     # --- 2. STANDARD JSON OVERLAP RULES ---
     if len(classifications) < 2: return None
     top_two_cat = classifications[1][0]
-    top_pair_set = {top_one_cat, top_two_cat.lower()}
+    if overlap_index is None:
+        overlap_index = build_overlap_index(overlap_rules)
     
-    for rule in overlap_rules:
-        if {p.lower() for p in rule.get("pair", [])} == top_pair_set:
-            if worker_id > 0:
-                log_msg(f"   ⚔️ Rule Triggered: Overlap Conflict {rule.get('pair')}", worker_id)
-            return rule, [classifications[0][0], classifications[1][0]]
+    rule = overlap_index.get(frozenset((top_one_cat, top_two_cat.lower())))
+    if rule is not None:
+        if worker_id > 0:
+            log_msg(f"   ⚔️ Rule Triggered: Overlap Conflict {rule.get('pair')}", worker_id)
+        return rule, [classifications[0][0], classifications[1][0]]
             
     return None
 
 def handle_dually_logic(classifications: list, worker_id: int = 0) -> list:
     if len(classifications) < 2: return classifications
-    dually_index = next((i for i, (cat, _) in enumerate(classifications) if cat.lower() == 'dually'), -1)
-    
-    if dually_index == 0:
+    # Only a Rank-1 Dually is demoted, so the top label is the only one worth lowering
+    if classifications[0][0].lower() == 'dually':
         log_msg(f"   📏 Rule Triggered: Dually Demotion (Rank 1 -> Rank 2)", worker_id)
         classifications[0], classifications[1] = classifications[1], classifications[0]
         
@@ -163,29 +265,22 @@ def apply_refinement_fix(annotated_norm: list, refined_cat_norm: str, ambiguous_
         new_results.sort(key=lambda x: x[1], reverse=True)
         return new_results[:3]
 
-def filter_by_exclusion_rules(annotated_norm: list, exclusion_rules: list, worker_id: int = 0) -> list:
-    filtered = list(annotated_norm)
-    i = 0
-    while i < len(filtered):
-        cat1 = filtered[i][0]
-        j = i + 1
-        while j < len(filtered):
-            cat2 = filtered[j][0]
-            conflict = False
-            for rule in exclusion_rules:
-                rule_cat = rule.get("category", "").strip()
-                not_with = [x.strip() for x in rule.get("not_with", [])]
-                
-                if (cat1 == rule_cat and cat2 in not_with) or (cat2 == rule_cat and cat1 in not_with):
-                    conflict = True
-                    break 
-            
-            if conflict:
-                log_msg(f"   🚫 Rule Triggered: EXCLUSION. Removing '{cat2}' because '{cat1}' is present.", worker_id)
-                filtered.pop(j)
-            else:
-                j += 1
-        i += 1
+def filter_by_exclusion_rules(annotated_norm: list, exclusion_rules: list, worker_id: int = 0,
+                              conflicts: dict = None) -> list:
+    """
+    Keeps results in rank order, dropping any that conflict with a higher-ranked kept one.
+    Pass rules['_exclusion_conflicts'] as `conflicts` to skip rebuilding the map per call.
+    """
+    if conflicts is None:
+        conflicts = build_exclusion_conflicts(exclusion_rules)
+    filtered = []
+    for cat, score in annotated_norm:
+        blocked_by = conflicts.get(cat)
+        winner = next((kept for kept, _ in filtered if kept in blocked_by), None) if blocked_by else None
+        if winner is not None:
+            log_msg(f"   🚫 Rule Triggered: EXCLUSION. Removing '{cat}' because '{winner}' is present.", worker_id)
+            continue
+        filtered.append((cat, score))
     return filtered
 
 def determine_status(breadcrumb_list, filtered_annotated, original_annotated, has_images: bool = True):
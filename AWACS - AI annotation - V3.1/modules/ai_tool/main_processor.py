@@ -1,10 +1,12 @@
 # ai_tool/main_processor.py — FINAL FULL & COMPLETE VERSION
 import os
+import re
 import glob
 import time
 import pandas as pd
 from datetime import datetime
 from multiprocessing import Queue, Manager
+from concurrent.futures import ThreadPoolExecutor
 import queue
 
 from .config_loader import config
@@ -12,13 +14,48 @@ from .config_loader import config
 from . import classification, web_utils, data_processing, utils, darth_vision
 from ai_tool.rate_limiter import Yoda 
 
+# One side thread per worker process for Darth (CV2): it runs while Gemini calls are in flight
+_cv_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="darth-cv")
+
+# Vision V2: a quick guess at/above this is kept when image selection still leads with the
+# image it was made from (a second call would just re-read the same picture)
+VISION_V2_ACCEPT_SCORE = 90.0
+
+# Vehicle types that are very commonly duallys - verified with the LLM if not yet detected.
+# Exact label hits are a set lookup; the regex catches them as substrings of longer labels.
+HIGH_DUALLY_PROBABILITY_TYPES = (
+    "box truck - straight truck", 
+    "cutaway-cube van", 
+    "stepvan",
+    "cabover truck - coe",
+    "cab-chassis",
+    "pickup truck"  # Heavy-duty pickups (F-350, RAM 3500, etc.) are commonly Duallys
+)
+_HIGH_DUALLY_EXACT = frozenset(HIGH_DUALLY_PROBABILITY_TYPES)
+_HIGH_DUALLY_RE = re.compile("|".join(re.escape(t) for t in HIGH_DUALLY_PROBABILITY_TYPES))
+
+# Producers put one None per worker after the last job; the timeout only guards a producer
+# that forgot them (all jobs are queued before the workers start). Rows a worker hands back
+# when it runs out of keys go on a separate retry queue, since on the job queue they would
+# land behind the sentinels and never be picked up.
+JOB_QUEUE_IDLE_TIMEOUT = 30
+
+# Try importing pyarrow safely (pandas' Parquet engine for fast intermediate checkpoints)
+try:
+    import pyarrow
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 
 def merge_all_session_reports(run_ts):
     """Merge all per-worker reports into one final session report."""
     try:
         pattern = os.path.join(config.key_report_dir, f"*_{run_ts}.xlsx")
         worker_files = [f for f in glob.glob(pattern) if "worker" in os.path.basename(f)]
-        if not worker_files:
+        # Workers with pyarrow write their report as <base>_keys.parquet / <base>_tokens.parquet
+        parquet_files = glob.glob(os.path.join(config.key_report_dir, f"Session_Report_worker_*_{run_ts}_keys.parquet"))
+        if not worker_files and not parquet_files:
             return
 
         key_dfs = []
@@ -34,6 +71,16 @@ def merge_all_session_reports(run_ts):
                     pass
             except:
                 pass
+        for f in parquet_files:
+            try:
+                key_df = pd.read_parquet(f)
+                key_df['Worker ID'] = os.path.basename(f).split('_worker_')[1].split('_')[0]
+                key_dfs.append(key_df)
+                tokens_path = f.replace('_keys.parquet', '_tokens.parquet')
+                if os.path.exists(tokens_path):
+                    token_dfs.append(pd.read_parquet(tokens_path))
+            except:
+                pass
 
         if key_dfs:
             final_key_df = pd.concat(key_dfs, ignore_index=True)
@@ -43,21 +90,32 @@ def merge_all_session_reports(run_ts):
                 if token_dfs:
                     pd.concat(token_dfs, ignore_index=True).to_excel(writer, sheet_name='Token Usage Summary', index=False)
             utils.log_msg(f"FINAL MERGED Session Report created: {os.path.basename(final_path)}")
+            
+            # The per-worker Parquet files were only intermediates for this Excel
+            for f in parquet_files:
+                for path in (f, f.replace('_keys.parquet', '_tokens.parquet')):
+                    try: os.remove(path)
+                    except OSError: pass
     except Exception as e:
         utils.log_msg(f"Could not merge session reports: {e}")
 
 
-def save_checkpoint(run_ts: str, results_so_far: list, input_df: pd.DataFrame):
-    """Saves progress to the UNIQUE file for this specific run."""
+def save_checkpoint(run_ts: str, results_so_far: list, input_df: pd.DataFrame, final: bool = True):
+    """
+    Saves progress to the UNIQUE file for this specific run.
+    Intermediate saves (final=False) go to a .parquet checkpoint when pyarrow is installed -
+    openpyxl is far too slow to run every minute on big runs. The final save streams the
+    .xlsx that every downstream tool reads (write-only workbook) and drops the checkpoint.
+    """
     if not results_so_far:
         return
 
     try:
         result_df = pd.DataFrame(results_so_far)
-        result_df["Ad ID"] = result_df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+        result_df["Ad ID"] = result_df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
         
         clean_input_df = input_df[["Ad ID"]].copy()
-        clean_input_df["Ad ID"] = clean_input_df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+        clean_input_df["Ad ID"] = clean_input_df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
 
         merged = pd.merge(clean_input_df, result_df, on="Ad ID", how="inner")
 
@@ -71,10 +129,23 @@ def save_checkpoint(run_ts: str, results_so_far: list, input_df: pd.DataFrame):
             if col not in merged.columns: merged[col] = ""
         merged = merged.reindex(columns=final_columns)
 
-        filename = f"output_annotated_{run_ts}.xlsx"
-        file_path = os.path.join(config.output_dir, filename)
-
-        merged.to_excel(file_path, index=False)
+        parquet_path = os.path.join(config.output_dir, f"output_annotated_{run_ts}.parquet")
+        saved_parquet = False
+        if not final and PYARROW_AVAILABLE:
+            filename = os.path.basename(parquet_path)
+            try:
+                merged.to_parquet(parquet_path, engine='pyarrow', compression='zstd', index=False)
+                saved_parquet = True
+            except PermissionError:
+                raise
+            except Exception as e:
+                # e.g. a column pyarrow can't type - a slow .xlsx checkpoint beats none at all
+                utils.log_msg(f"⚠️ Parquet checkpoint failed ({e}), saving .xlsx instead")
+        if not saved_parquet:
+            filename = f"output_annotated_{run_ts}.xlsx"
+            utils.write_xlsx_fast(os.path.join(config.output_dir, filename), {"Sheet1": [merged]})
+            if final and os.path.exists(parquet_path):
+                os.remove(parquet_path)  # Superseded by the final .xlsx
         utils.log_msg(f"💾 Saved progress to '{filename}' ({len(merged)} ads)")
 
     except PermissionError:
@@ -83,6 +154,30 @@ def save_checkpoint(run_ts: str, results_so_far: list, input_df: pd.DataFrame):
         utils.log_msg(f"⚠️ Save Failed: {e}")
 
 
+def _result_row(ad_id: str, breadcrumb: list, filtered: list, image_urls: list, status: str, cost_cents) -> dict:
+    """Output row for one ad; breadcrumb/annotation slots are padded out to 3."""
+    bt = list(breadcrumb[:3])
+    bt += [""] * (3 - len(bt))
+    ft = list(filtered[:3])
+    ft += [("", 0)] * (3 - len(ft))
+    return {
+        "Ad ID": ad_id,
+        "Breadcrumb_Top1": bt[0],
+        "Breadcrumb_Top2": bt[1],
+        "Breadcrumb_Top3": bt[2],
+        "Annotated_Top1": ft[0][0],
+        "Annotated_Top2": ft[1][0],
+        "Annotated_Top3": ft[2][0],
+        "Annotated_Top1_Score": round(ft[0][1], 1),
+        "Annotated_Top2_Score": round(ft[1][1], 1),
+        "Annotated_Top3_Score": round(ft[2][1], 1),
+        "Image_Count": len(image_urls),
+        "Image_URLs": ", ".join(image_urls),
+        "Status": status,
+        "Cost_Cents": cost_cents
+    }
+
+
 def _process_single_ad(ad_row: dict, category_data: dict, rules: dict, 
                        high_accuracy: bool, worker_id: int, key_queue: Queue,
                        status_queue: Queue, results_queue: Queue, 
@@ -102,7 +197,7 @@ def _process_single_ad(ad_row: dict, category_data: dict, rules: dict,
         results_queue.put(final_row)
         return final_row
 
-    breadcrumb = [data_processing.normalize_text(str(x), rules['normalize_map'])
+    breadcrumb = [data_processing.normalize_text(str(x), rules['normalize_map'], index=rules.get('_normalize_index'))
                   for x in breadcrumb_raw if pd.notna(x) and str(x).strip()]
 
     raw_urls = str(ad_row.get("Image_URLs", "")).strip()
@@ -114,25 +209,17 @@ def _process_single_ad(ad_row: dict, category_data: dict, rules: dict,
     
     # Early return if no images available - set appropriate status
     if not has_valid_images:
-        final_row = {
-            "Ad ID": ad_id,
-            "Breadcrumb_Top1": breadcrumb[0] if len(breadcrumb) > 0 else "",
-            "Breadcrumb_Top2": breadcrumb[1] if len(breadcrumb) > 1 else "",
-            "Breadcrumb_Top3": breadcrumb[2] if len(breadcrumb) > 2 else "",
-            "Annotated_Top1": "",
-            "Annotated_Top2": "",
-            "Annotated_Top3": "",
-            "Annotated_Top1_Score": 0,
-            "Annotated_Top2_Score": 0,
-            "Annotated_Top3_Score": 0,
-            "Image_Count": len(image_urls),
-            "Image_URLs": ", ".join(image_urls) if image_urls else "",
-            "Status": "No Images Present",
-            "Cost_Cents": 0
-        }
+        final_row = _result_row(ad_id, breadcrumb, [], image_urls, "No Images Present", 0)
         results_queue.put(final_row)
         return final_row
 
+    # Start Darth (CV2) now on image 0 so the CPU work hides behind the Vision V2, promo
+    # check + classification network calls. Result is read in STAGE 1 below.
+    cv_future = None
+    cv_image = img_bytes_list[0]
+    if config.enable_darth_cv2_dually:
+        cv_future = _cv_pool.submit(darth_vision.inspect_for_dually, cv_image)
+
     # === VISION V2 (OPTIMIZED) ===
     vision_result = None
     
@@ -153,12 +240,22 @@ def _process_single_ad(ad_row: dict, category_data: dict, rules: dict,
                 vision_result = quick_guess
             else:
                 predicted = quick_guess[0][0] if quick_guess else ""
+                guessed_img = img_bytes_list[0]
                 img_bytes_list = select_best_images(img_bytes_list, predicted)
                 utils.log_msg(f" [W-{worker_id}] Vision v2 sorting for: {predicted}", worker_id)
+                
+                if quick_guess and quick_guess[0][1] >= VISION_V2_ACCEPT_SCORE and img_bytes_list[0] is guessed_img:
+                    utils.log_msg(f" [W-{worker_id}] ⚡ Vision V2 guess ({quick_guess[0][1]}) holds after sorting. Skipping 2nd call.", worker_id)
+                    vision_result = quick_guess
             
         except Exception as e:
             utils.log_msg(f" [W-{worker_id}] Vision v2 failed: {e}", worker_id)
 
+    # Vision V2 re-sorted the images: if image 0 changed, Darth must look at the new lead
+    if cv_future is not None and img_bytes_list[0] is not cv_image:
+        cv_future.cancel()
+        cv_future = _cv_pool.submit(darth_vision.inspect_for_dually, img_bytes_list[0])
+
     # === CLASSIFICATION ===
     if vision_result:
         result = vision_result
@@ -181,39 +278,26 @@ def _process_single_ad(ad_row: dict, category_data: dict, rules: dict,
         total_out_tokens += t_out
 
     if not result:
+        if cv_future: cv_future.cancel()
         final_row = {"Ad ID": ad_id, "Status": "AI Error", "Cost_Cents": 0}
         results_queue.put(final_row)
         return final_row
 
-    annotated = [(data_processing.normalize_text(c, rules['normalize_map'], worker_id), s) for c, s in result]
+    annotated = [(data_processing.normalize_text(c, rules['normalize_map'], worker_id, rules.get('_normalize_index')), s) for c, s in result]
     
     # 🛡️ PLACEHOLDER/COMING SOON SAFEGUARD 🛡️
     # If AI detected "Image Not Clear" (which includes placeholder/coming soon images), 
     # skip all further processing and set status appropriately
     if annotated and annotated[0][0] == "Image Not Clear":
         utils.log_msg(f" [W-{worker_id}] 🚫 Placeholder/Coming Soon detected - skipping classification", worker_id)
+        if cv_future: cv_future.cancel()
         filtered = annotated  # Keep as-is, no filtering needed
         status = data_processing.determine_status(breadcrumb, filtered, annotated, has_images=has_valid_images)
         
         # Calculate cost before returning
         cost_cents = utils.calculate_cost_cents(total_in_tokens, total_out_tokens, config.gemini_model)
         
-        final_row = {
-            "Ad ID": ad_id,
-            "Breadcrumb_Top1": breadcrumb[0] if len(breadcrumb) > 0 else "",
-            "Breadcrumb_Top2": breadcrumb[1] if len(breadcrumb) > 1 else "",
-            "Breadcrumb_Top3": breadcrumb[2] if len(breadcrumb) > 2 else "",
-            "Annotated_Top1": filtered[0][0] if len(filtered) >= 1 else "",
-            "Annotated_Top2": filtered[1][0] if len(filtered) >= 2 else "",
-            "Annotated_Top3": filtered[2][0] if len(filtered) >= 3 else "",
-            "Annotated_Top1_Score": round(filtered[0][1], 1) if len(filtered) >= 1 else 0,
-            "Annotated_Top2_Score": round(filtered[1][1], 1) if len(filtered) >= 2 else 0,
-            "Annotated_Top3_Score": round(filtered[2][1], 1) if len(filtered) >= 3 else 0,
-            "Image_Count": len(image_urls),
-            "Image_URLs": ", ".join(image_urls) if image_urls else "",
-            "Status": status,
-            "Cost_Cents": cost_cents
-        }
+        final_row = _result_row(ad_id, breadcrumb, filtered, image_urls, status, cost_cents)
         results_queue.put(final_row)
         return final_row
     
@@ -243,7 +327,7 @@ def _process_single_ad(ad_row: dict, category_data: dict, rules: dict,
         total_out_tokens += t_out
         
         if found_body:
-            norm_body = data_processing.normalize_text(found_body, rules['normalize_map'], worker_id)
+            norm_body = data_processing.normalize_text(found_body, rules['normalize_map'], worker_id, rules.get('_normalize_index'))
             utils.log_msg(f" [W-{worker_id}] -> AI Found Body: {norm_body}", worker_id)
             annotated = [(norm_body, 95.0), annotated[0]]
         else:
@@ -253,7 +337,8 @@ def _process_single_ad(ad_row: dict, category_data: dict, rules: dict,
 
     # REFINEMENT (Overlap Rules)
     if img_bytes_list and len(annotated) > 1 and annotated[0][1] < 95.0:
-        if overlap_result := data_processing.find_overlap_rule(annotated, rules.get('truck_overlaps', []), worker_id):
+        if overlap_result := data_processing.find_overlap_rule(annotated, rules.get('truck_overlaps', []), worker_id,
+                                                                 rules.get('_overlap_index')):
             rule_dict, pair = overlap_result
             
             refined, t_in, t_out = classification.classify_with_refinement(
@@ -264,23 +349,26 @@ def _process_single_ad(ad_row: dict, category_data: dict, rules: dict,
             total_out_tokens += t_out
             
             if refined:
-                refined_norm = data_processing.normalize_text(refined, rules['normalize_map'], worker_id)
+                refined_norm = data_processing.normalize_text(refined, rules['normalize_map'], worker_id, rules.get('_normalize_index'))
                 annotated = data_processing.apply_refinement_fix(annotated, refined_norm, pair, worker_id)
 
-    filtered = data_processing.filter_by_exclusion_rules(annotated, rules['exclusion_rules'], worker_id)
+    filtered = data_processing.filter_by_exclusion_rules(annotated, rules['exclusion_rules'], worker_id,
+                                                          rules.get('_exclusion_conflicts'))
     
     # =================================================================================
     # 🚀 ENHANCED DUALLY DETECTION - TWO-STAGE VERIFICATION 🚀
     # Stage 1: CV2 local detection (Darth Vader)
     # Stage 2: LLM verification for high-probability dually types
     # =================================================================================
-    has_dually_before = any("dually" in c[0].lower() for c in filtered)
+    # Lowered once; Stage 2 only runs when Stage 1 left `filtered` untouched, so these stay valid
+    names_lower = [c[0].lower() for c in filtered]
+    has_dually_before = any("dually" in n for n in names_lower)
     
     # STAGE 1: CV2 Detection (if enabled)
-    if config.enable_darth_cv2_dually and img_bytes_list and not has_dually_before:
+    if cv_future is not None and not has_dually_before:
         try:
-            # Check Image 0
-            is_dually_cv2, score = darth_vision.inspect_for_dually(img_bytes_list[0])
+            # Check Image 0 (started before classification)
+            is_dually_cv2, score = cv_future.result()
             if is_dually_cv2:
                 utils.log_msg(f" [W-{worker_id}] 🌑 Darth (CV2) found Dually! (Score: {score})", worker_id)
                 filtered.append(("Dually", 90.0))
@@ -293,18 +381,8 @@ def _process_single_ad(ad_row: dict, category_data: dict, rules: dict,
     # STAGE 2: LLM Verification for high-probability dually types (if still no dually found)
     # This catches duallys that CV2 missed
     if img_bytes_list and not has_dually_before and len(filtered) >= 1:
-        top_category = filtered[0][0].lower()
-        # These vehicle types are very commonly duallys - verify with LLM if not yet detected
-        high_dually_probability_types = [
-            "box truck - straight truck", 
-            "cutaway-cube van", 
-            "stepvan",
-            "cabover truck - coe",
-            "cab-chassis",
-            "pickup truck"  # Heavy-duty pickups (F-350, RAM 3500, etc.) are commonly Duallys
-        ]
-        
-        if any(hd_type in top_category for hd_type in high_dually_probability_types):
+        top_category = names_lower[0]
+        if top_category in _HIGH_DUALLY_EXACT or _HIGH_DUALLY_RE.search(top_category):
             try:
                 utils.log_msg(f" [W-{worker_id}] 🔍 LLM Dually Verification for '{filtered[0][0]}' (high-probability type)", worker_id)
                 is_dually_llm, confidence, t_in, t_out = classification.verify_dually_with_llm(
@@ -330,22 +408,7 @@ def _process_single_ad(ad_row: dict, category_data: dict, rules: dict,
     # --- CALCULATE COST ---
     cost_cents = utils.calculate_cost_cents(total_in_tokens, total_out_tokens, config.gemini_model)
 
-    final_row = {
-        "Ad ID": ad_id,
-        "Breadcrumb_Top1": breadcrumb[0] if len(breadcrumb) > 0 else "",
-        "Breadcrumb_Top2": breadcrumb[1] if len(breadcrumb) > 1 else "",
-        "Breadcrumb_Top3": breadcrumb[2] if len(breadcrumb) > 2 else "",
-        "Annotated_Top1": filtered[0][0] if len(filtered) >= 1 else "",
-        "Annotated_Top2": filtered[1][0] if len(filtered) >= 2 else "",
-        "Annotated_Top3": filtered[2][0] if len(filtered) >= 3 else "",
-        "Annotated_Top1_Score": round(filtered[0][1], 1) if len(filtered) >= 1 else 0,
-        "Annotated_Top2_Score": round(filtered[1][1], 1) if len(filtered) >= 2 else 0,
-        "Annotated_Top3_Score": round(filtered[2][1], 1) if len(filtered) >= 3 else 0,
-        "Image_Count": len(image_urls),
-        "Image_URLs": ", ".join(image_urls) if image_urls else "",
-        "Status": status,
-        "Cost_Cents": cost_cents
-    }
+    final_row = _result_row(ad_id, breadcrumb, filtered, image_urls, status, cost_cents)
 
     results_queue.put(final_row)
     return final_row
@@ -353,15 +416,20 @@ def _process_single_ad(ad_row: dict, category_data: dict, rules: dict,
 
 def run_worker_process(worker_id, run_ts, job_queue: Queue, results_queue: Queue,
                        status_queue: Queue, key_queue: Queue,
-                       high_accuracy: bool = False, use_vision_v2: bool = False, yoda_instance=None):
+                       high_accuracy: bool = False, use_vision_v2: bool = False, yoda_instance=None,
+                       category_data: dict = None, rules: dict = None, retry_queue: Queue = None):
     from . import config_loader
     config_loader.load_config()   
     utils.initialize_logging(run_ts, worker_id)
     classification.initialize_all_trackers()
 
-    category_data = data_processing.load_category_data(config.category_json)
-    rules = data_processing.load_rules(config.rules_json)
+    # Launchers load these once and hand them over (fork: shared copy-on-write, spawn: one unpickle)
+    if category_data is None:
+        category_data = data_processing.load_category_data(config.category_json)
+    if rules is None:
+        rules = data_processing.load_rules(config.rules_json)
     processed = 0
+    jobs_done = False
 
     try:
         status_queue.put({"worker_id": worker_id, "state": "WAITING", "ad_id": None, "progress": 0})
@@ -369,7 +437,19 @@ def run_worker_process(worker_id, run_ts, job_queue: Queue, results_queue: Queue
         while True:
             ad_row = None
             try:
-                ad_row = job_queue.get(timeout=2)
+                try:
+                    # Rows handed back by a worker that ran out of keys go first
+                    if retry_queue is None:
+                        raise queue.Empty
+                    ad_row = retry_queue.get_nowait()
+                except queue.Empty:
+                    if jobs_done:
+                        raise
+                    ad_row = job_queue.get(timeout=JOB_QUEUE_IDLE_TIMEOUT)
+                if ad_row is None:
+                    # End-of-jobs sentinel: finish once the retry queue is empty too
+                    jobs_done = True
+                    continue
                 ad_id = str(ad_row.get("Ad ID", "")).strip()
 
                 status_queue.put({
@@ -403,7 +483,7 @@ def run_worker_process(worker_id, run_ts, job_queue: Queue, results_queue: Queue
                 break
             except classification.AllKeysExhaustedError:
                 if ad_row and ad_row.get("Ad ID"):
-                    job_queue.put(ad_row)
+                    (job_queue if retry_queue is None else retry_queue).put(ad_row)
                     results_queue.put({"Ad ID": ad_row.get("Ad ID"), "Status": "Re-queued (key exhausted)"})
                 status_queue.put({"worker_id": worker_id, "state": "ERROR", "progress": processed})
                 break
@@ -421,6 +501,7 @@ def run_worker_process(worker_id, run_ts, job_queue: Queue, results_queue: Queue
             run_ts,
             worker_id
         )
+        utils.close_logging()
 
 
 def run_single_process(input_file, fast_mode=False):
@@ -434,7 +515,7 @@ def run_single_process(input_file, fast_mode=False):
     print(f"Starting Single Process Mode on: {os.path.basename(input_file)}")
     
     df = pd.read_excel(input_file, dtype={"Ad ID": str})
-    df["Ad ID"] = df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+    df["Ad ID"] = df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
     
     category_data = data_processing.load_category_data(config.category_json)
     rules = data_processing.load_rules(config.rules_json)
@@ -474,4 +555,5 @@ def run_single_process(input_file, fast_mode=False):
             print(f"Error on {ad_id}: {e}")
             
     save_checkpoint(run_ts, results, df)
+    utils.close_logging()
     print("\nSingle Process Run Completed.")
\ No newline at end of file
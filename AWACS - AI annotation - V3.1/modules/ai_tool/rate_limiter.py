@@ -1,31 +1,28 @@
 import time
 import random
-from multiprocessing import Manager
+import multiprocessing
 
 class Yoda:
-    def __init__(self, key_list, rpm_limit, manager):
+    def __init__(self, key_list, rpm_limit, manager=None):
         """
         Yoda: The Master of Rate Limits.
         
         Args:
             key_list: List of API keys.
             rpm_limit: Requests per minute limit.
-            manager: The multiprocessing.Manager object from the main process.
+            manager: Kept for call compatibility; the ledger no longer lives in a Manager.
         """
-        # We use the passed manager to create shared objects
-        # BUT we do NOT store 'self.manager = manager' because the Manager object 
-        # itself cannot be pickled/sent to workers.
-        
-        # Shared Dictionary: Stores { key_index: {'count': 0, 'window_start': time.time()} }
-        self.ledger = manager.dict()
-        self.lock = manager.Lock()
+        # The ledger is plain shared memory (no Manager proxy, so no IPC round-trip per field).
+        # Yoda must reach workers as a Process argument, which is how every caller passes it.
         
+        # Shared ledger: slot i holds the request count / window start of self.all_keys[i]
         self.rpm_limit = rpm_limit
-        self.all_keys = [k['original_index'] for k in key_list]
+        self.all_keys = tuple(k['original_index'] for k in key_list)
+        self.slots = {k: i for i, k in enumerate(self.all_keys)}
         
-        # Initialize ledger for all keys
-        for k in self.all_keys:
-            self.ledger[k] = {'count': 0, 'window_start': time.time()}
+        self.counts = multiprocessing.RawArray('i', len(self.all_keys))
+        self.windows = multiprocessing.RawArray('d', [time.time()] * len(self.all_keys))
+        self.lock = multiprocessing.Lock()
 
     def get_usable_key(self, current_key_idx):
         """
@@ -43,10 +40,9 @@ class Yoda:
                 return current_key_idx, 0
             
             # --- 2. Smart Swap: Find ANY free key ---
-            # Shuffle list to prevent all workers fighting for Key #1
+            # Shuffled so all workers don't fight for Key #1 (only built when a swap is needed)
             shuffled_keys = list(self.all_keys)
             random.shuffle(shuffled_keys)
-            
             for k_idx in shuffled_keys:
                 if k_idx == current_key_idx: continue # Already checked
                 
@@ -58,9 +54,8 @@ class Yoda:
             # If we are here, ALL keys are maxed out.
             # Find the key that resets soonest.
             min_wait = 60.0
-            for k_idx in self.all_keys:
-                data = self.ledger[k_idx]
-                time_passed = now - data['window_start']
+            for window_start in self.windows:
+                time_passed = now - window_start
                 wait = max(0, 60 - time_passed)
                 if wait < min_wait:
                     min_wait = wait
@@ -69,21 +64,20 @@ class Yoda:
 
     def _check_key_status(self, key_idx, now):
         """Internal: Returns True if key has capacity."""
-        data = self.ledger[key_idx]
+        slot = self.slots[key_idx]
         
         # Reset Window if 60s passed
-        if now - data['window_start'] >= 60:
-            self.ledger[key_idx] = {'count': 0, 'window_start': now}
+        if now - self.windows[slot] >= 60:
+            self.counts[slot] = 0
+            self.windows[slot] = now
             return True
             
         # Check Capacity
-        if data['count'] < self.rpm_limit:
+        if self.counts[slot] < self.rpm_limit:
             return True
             
         return False
 
     def _increment_key(self, key_idx):
         """Internal: Increments usage count."""
-        data = self.ledger[key_idx]
-        data['count'] += 1
-        self.ledger[key_idx] = data # Write back to shared dict
\ No newline at end of file
+        self.counts[self.slots[key_idx]] += 1
@@ -1,7 +1,13 @@
 # ai_tool/smart_image_selector.py
+import os
+import json
+import hashlib
+import heapq
 from typing import List
 import numpy as np
 
+from .config_loader import config
+
 # Try importing OpenCV safely
 try:
     import cv2
@@ -9,18 +15,121 @@ try:
 except ImportError:
     OPENCV_AVAILABLE = False
 
-def _clarity_score(img_bytes: bytes) -> float:
-    """Fast blur detection – higher = sharper"""
+# Try importing orjson safely (feature cache files are read/written once per image)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Try importing Numba safely (optional JIT for the clarity Laplacian)
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _laplacian_var_u8(gray):
+        """Variance of the 3x3 Laplacian (cv2 ksize=1, reflect-101 border) straight off the uint8 pixels."""
+        h, w = gray.shape
+        total = 0
+        total_sq = 0
+        for y in range(h):
+            up = y - 1 if y > 0 else 1
+            down = y + 1 if y < h - 1 else h - 2
+            for x in range(w):
+                left = x - 1 if x > 0 else 1
+                right = x + 1 if x < w - 1 else w - 2
+                lap = (np.int64(gray[up, x]) + gray[down, x] + gray[y, left] + gray[y, right]
+                       - 4 * np.int64(gray[y, x]))
+                total += lap
+                total_sq += lap * lap
+        n = h * w
+        mean = total / n
+        return total_sq / n - mean * mean
+
+def _clarity_score(img_bytes: bytes = None, gray=None) -> float:
+    """Fast blur detection – higher = sharper. Pass an already decoded `gray` image to skip imdecode."""
     if not OPENCV_AVAILABLE:
         return 0.0
     try:
-        arr = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(arr, cv2.IMREAD_GRAYSCALE)
-        if img is None: return 0.0
-        return cv2.Laplacian(img, cv2.CV_64F).var()
+        if gray is None:
+            arr = np.frombuffer(img_bytes, np.uint8)
+            gray = cv2.imdecode(arr, cv2.IMREAD_GRAYSCALE)
+        if gray is None: return 0.0
+        if NUMBA_AVAILABLE and gray.shape[0] > 1 and gray.shape[1] > 1:
+            return float(_laplacian_var_u8(gray))
+        return cv2.Laplacian(gray, cv2.CV_64F).var()
     except:
         return 0.0
 
+# Per-image CV features persisted by content hash (reruns/retries revisit the same photos)
+FEATURE_CACHE_SUBDIR = "_features"
+
+def _feature_cache_path(img_bytes: bytes):
+    cache_dir = getattr(config, 'image_cache_dir', None)
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, FEATURE_CACHE_SUBDIR, f"{hashlib.sha1(img_bytes).hexdigest()}.json")
+
+def _image_features(img_bytes: bytes, wanted: List[str]) -> dict:
+    """
+    Returns the guess-independent scalars select_best_images scores on, computing (and caching)
+    only the ones in `wanted` that aren't on disk yet. Undecodable images give {}.
+    """
+    path = _feature_cache_path(img_bytes)
+    feats = {}
+    if path and os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                feats = orjson.loads(f.read()) if ORJSON_AVAILABLE else json.loads(f.read())
+            # Mark as recently used for the run-start LRU prune (utils.prune_image_cache)
+            try: os.utime(path)
+            except OSError: pass
+        except Exception:
+            feats = {}
+    missing = [name for name in wanted if name not in feats]
+    if not missing and 'width' in feats:
+        return feats
+
+    # Decode once (colour) and convert to gray once; every feature below reuses the pair
+    arr = np.frombuffer(img_bytes, np.uint8)
+    img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+    if img is None:
+        return feats
+
+    try:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        h, w = img.shape[:2]
+        feats['width'], feats['height'] = w, h
+        if 'clarity' in missing:
+            feats['clarity'] = float(_clarity_score(gray=gray))
+        if 'lower_edge_mean' in missing:
+            feats['lower_edge_mean'] = float(np.mean(cv2.Canny(gray[int(h*0.6):, :], 50, 150)))
+        if 'long_lines' in missing:
+            edges = cv2.Canny(gray, 50, 100)
+            # Probabilistic Hough Line Transform
+            lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=100, minLineLength=int(w*0.35), maxLineGap=20)
+            feats['long_lines'] = 0 if lines is None else len(lines)
+        if 'upper_mean' in missing:
+            feats['upper_mean'] = float(np.mean(img[:h//3, :]))
+            feats['lower_mean'] = float(np.mean(img[2*h//3:, :]))
+    except Exception:
+        pass # Keep whatever was computed if CV analysis fails
+
+    if path:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(feats) if ORJSON_AVAILABLE else json.dumps(feats).encode())
+            os.replace(tmp_path, path)  # Atomic, so parallel workers never read half a file
+        except Exception:
+            pass
+    return feats
+
 def select_best_images(img_bytes_list: List[bytes], quick_guess: str = "") -> List[bytes]:
     """
     Vision v2 – picks the 1–3 most useful images.
@@ -30,59 +139,42 @@ def select_best_images(img_bytes_list: List[bytes], quick_guess: str = "") -> Li
         return img_bytes_list
 
     guess = quick_guess.lower()
+    wants_dually = any(k in guess for k in ["dually", "drw", "dual"])
+    wants_crane = "crane" in guess or "boom" in guess
+    wants_dump = "dump" in guess
+    wants_side = "flatbed" in guess or "stake" in guess
+    wanted = ['clarity'] + [name for name, on in (('lower_edge_mean', wants_dually),
+                                                   ('long_lines', wants_crane),
+                                                   ('upper_mean', wants_dump)) if on]
     scores = []
 
     for i, img_bytes in enumerate(img_bytes_list):
+        feats = _image_features(img_bytes, wanted)
+
         # Base score on clarity
-        base_score = _clarity_score(img_bytes)
         # Normalize roughly to 0-10 range for clarity
-        score = base_score / 1000.0 
+        score = feats.get('clarity', 0.0) / 1000.0
 
-        try:
-            arr = np.frombuffer(img_bytes, np.uint8)
-            img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-            if img is None:
-                scores.append((i, score))
-                continue
-            
-            h, w = img.shape[:2]
-
-            # 1. Dually / Dual Rear Wheel detection (Cluster of edges in lower half)
-            if any(k in guess for k in ["dually", "drw", "dual"]):
-                lower_half = img[int(h*0.6):, :]
-                gray = cv2.cvtColor(lower_half, cv2.COLOR_BGR2GRAY)
-                edges = cv2.Canny(gray, 50, 150)
-                if np.mean(edges) > 28:
-                    score += 6.0
-
-            # 2. Crane / Boom (Long straight lines)
-            if "crane" in guess or "boom" in guess:
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                edges = cv2.Canny(gray, 50, 100)
-                # Probabilistic Hough Line Transform
-                lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=100, minLineLength=int(w*0.35), maxLineGap=20)
-                if lines is not None and len(lines) >= 2:
-                    score += 7.0
-
-            # 3. Dump bed (Raised bed often implies high contrast between top and bottom)
-            if "dump" in guess:
-                upper = img[:h//3, :]
-                lower = img[2*h//3:, :]
-                if np.mean(upper) > np.mean(lower) + 25:
-                    score += 4.0
-
-            # 4. Side Profile (Landscape aspect ratio preferred for Flatbeds)
-            if "flatbed" in guess or "stake" in guess:
-                if w > h * 1.2:  # Distinctly landscape
-                    score += 3.0
+        # 1. Dually / Dual Rear Wheel detection (Cluster of edges in lower half)
+        if wants_dually and feats.get('lower_edge_mean', 0.0) > 28:
+            score += 6.0
 
-        except Exception:
-            pass # Keep base score if CV analysis fails
+        # 2. Crane / Boom (Long straight lines)
+        if wants_crane and feats.get('long_lines', 0) >= 2:
+            score += 7.0
+
+        # 3. Dump bed (Raised bed often implies high contrast between top and bottom)
+        if wants_dump and 'upper_mean' in feats and feats['upper_mean'] > feats['lower_mean'] + 25:
+            score += 4.0
+
+        # 4. Side Profile (Landscape aspect ratio preferred for Flatbeds)
+        if wants_side and 'width' in feats and feats['width'] > feats['height'] * 1.2:  # Distinctly landscape
+            score += 3.0
 
-        scores.append((i, score))
+        scores.append(score)
 
-    # Sort by score descending and pick top 3
-    best_indices = [i for i, s in sorted(scores, key=lambda x: x[1], reverse=True)[:3]]
+    # Top 3 by score (ties keep list order, same as a stable descending sort)
+    best_indices = heapq.nlargest(3, range(len(scores)), key=scores.__getitem__)
     
     # Return the bytes in the order of their "best-ness"
     return [img_bytes_list[i] for i in best_indices]
\ No newline at end of file
@@ -1,18 +1,30 @@
 import os
 import glob
+import time
 import shutil
+import functools
+import openpyxl
 import pandas as pd
 from datetime import datetime, timedelta
 from .config_loader import config
 
+# Try importing pyarrow safely (per-worker session reports go to Parquet when available)
+try:
+    import pyarrow
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 LOG_FILE = ""
+LOG_FH = None  # Kept open for the worker's lifetime (line-buffered) instead of re-opening per line
 
 def initialize_logging(run_ts: str, worker_id: int = 0):
     """
     Sets up the log file path for a specific worker.
-    Creates the file and writes the header.
+    Creates the file, writes the header and keeps it open for log_msg.
     """
-    global LOG_FILE
+    global LOG_FILE, LOG_FH
+    close_logging()
     
     # Define filename: log_2025-11-26_10-00-00_worker_01.txt
     log_filename = f"log_{run_ts}_worker_{worker_id:02d}.txt"
@@ -23,12 +35,14 @@ def initialize_logging(run_ts: str, worker_id: int = 0):
         
         LOG_FILE = os.path.join(config.log_dir, log_filename)
         
-        with open(LOG_FILE, 'w', encoding='utf-8') as f:
-            f.write(f"================================================================\n")
-            f.write(f"LOG STARTED: Worker {worker_id}\n")
-            f.write(f"Run ID: {run_ts}\n")
-            f.write(f"Start Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"================================================================\n\n")
+        # Line-buffered: one write per line, nothing lost if the worker dies
+        f = open(LOG_FILE, 'w', encoding='utf-8', buffering=1)
+        f.write(f"================================================================\n")
+        f.write(f"LOG STARTED: Worker {worker_id}\n")
+        f.write(f"Run ID: {run_ts}\n")
+        f.write(f"Start Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"================================================================\n\n")
+        LOG_FH = f
             
     except Exception as e:
         print(f"CRITICAL: Failed to initialize log file at {LOG_FILE}. Error: {e}")
@@ -37,7 +51,7 @@ def log_msg(msg: str, worker_id: int = -1):
     """
     Logs a message to the worker's specific text file with a timestamp.
     """
-    if LOG_FILE:
+    if LOG_FH:
         try:
             timestamp = datetime.now().strftime("%H:%M:%S")
             prefix = f"[{timestamp}] [W-{worker_id:02d}] "
@@ -45,11 +59,20 @@ def log_msg(msg: str, worker_id: int = -1):
             # Indent multiline messages so they look clean
             clean_msg = str(msg).replace("\n", f"\n{' ' * len(prefix)}")
             
-            with open(LOG_FILE, "a", encoding="utf-8") as f:
-                f.write(prefix + clean_msg + "\n")
+            LOG_FH.write(prefix + clean_msg + "\n")
         except Exception:
             pass # Fail silently to avoid crashing the worker
 
+def close_logging():
+    """Closes the worker's log file handle (log_msg becomes a no-op until re-initialized)."""
+    global LOG_FH
+    if LOG_FH:
+        try:
+            LOG_FH.close()
+        except Exception:
+            pass
+        LOG_FH = None
+
 def fmt_secs(seconds: float) -> str:
     """Formats seconds into a readable HH:MM:SS string."""
     return str(timedelta(seconds=int(seconds)))
@@ -70,11 +93,18 @@ def merge_worker_logs(run_ts):
     print(f"\n📝 Merging {len(worker_files)} worker logs into Master Log...")
     
     try:
-        with open(master_log_path, 'w', encoding='utf-8') as master:
-            master.write(f"================================================================\n")
-            master.write(f"MASTER SESSION LOG - RUN ID: {run_ts}\n")
-            master.write(f"Merged at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            master.write(f"================================================================\n\n")
+        # Binary + streamed: worker logs are already UTF-8, so they are copied in 1MB blocks
+        # without decoding or holding a whole log in memory. Our own lines keep the platform
+        # newline, matching what text-mode logging wrote into the worker files.
+        def as_bytes(text):
+            return text.replace("\n", os.linesep).encode('utf-8')
+        
+        with open(master_log_path, 'wb') as master:
+            header = (f"================================================================\n"
+                      f"MASTER SESSION LOG - RUN ID: {run_ts}\n"
+                      f"Merged at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                      f"================================================================\n\n")
+            master.write(as_bytes(header))
             
             # Sort files so Worker 01 comes before Worker 02, etc.
             worker_files.sort()
@@ -84,15 +114,14 @@ def merge_worker_logs(run_ts):
                     # Extract worker ID from filename for the header
                     w_name = os.path.basename(wf).replace(f"log_{run_ts}_", "").replace(".txt", "")
                     
-                    master.write(f"\n{'='*20} {w_name.upper()} {'='*20}\n")
+                    master.write(as_bytes(f"\n{'='*20} {w_name.upper()} {'='*20}\n"))
                     
-                    with open(wf, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        master.write(content)
+                    with open(wf, 'rb') as f:
+                        shutil.copyfileobj(f, master, 1024 * 1024)
                         
-                    master.write("\n") # Spacing between workers
+                    master.write(as_bytes("\n")) # Spacing between workers
                 except Exception as e:
-                    master.write(f"\n[ERROR READING LOG FILE: {wf} - {e}]\n")
+                    master.write(as_bytes(f"\n[ERROR READING LOG FILE: {wf} - {e}]\n"))
         
         # Cleanup: Delete individual files to keep folder clean
         for wf in worker_files:
@@ -104,24 +133,121 @@ def merge_worker_logs(run_ts):
     except Exception as e:
         print(f"❌ Error merging logs: {e}")
 
-def calculate_cost_cents(input_tokens, output_tokens, model_name):
+# Atomic cache writes go through "<name>.<pid>...tmp" files; one this old was left by a killed process
+STALE_TMP_AGE = 3600  # seconds
+
+def prune_image_cache():
     """
-    Calculates the cost of an API call in Cents based on the specific Gemini model.
+    Keeps the downloaded-image cache under config.image_cache_max_mb (0 = half of the
+    disk space free for it), deleting the least recently used images first.
+    The per-image feature files (smart_image_selector's _features/*.json) share the budget.
+    Leftover .tmp files from interrupted writes are deleted once older than STALE_TMP_AGE.
+    Cache hits refresh a file's mtime, so oldest mtime == least recently used.
+    Call once per run, before the workers start.
+    """
+    # Imported here: smart_image_selector pulls in OpenCV, which plain utils users don't need
+    from .smart_image_selector import FEATURE_CACHE_SUBDIR
+
+    cache_dir = config.image_cache_dir
+    if not os.path.isdir(cache_dir):
+        return
+
+    entries = []
+    total = 0
+    try:
+        stale_before = time.time() - STALE_TMP_AGE
+        for folder, suffix in ((cache_dir, '.jpg'), (os.path.join(cache_dir, FEATURE_CACHE_SUBDIR), '.json')):
+            if not os.path.isdir(folder):
+                continue
+            with os.scandir(folder) as it:
+                for e in it:
+                    if not e.is_file():
+                        continue
+                    if e.name.endswith(suffix):
+                        st = e.stat()
+                        entries.append((st.st_mtime, st.st_size, e.path))
+                        total += st.st_size
+                    elif e.name.endswith('.tmp') and e.stat().st_mtime < stale_before:
+                        try: os.remove(e.path)
+                        except OSError: pass
+
+        limit_mb = getattr(config, 'image_cache_max_mb', 0)
+        if limit_mb > 0:
+            limit = limit_mb * 1024 * 1024
+        else:
+            limit = (shutil.disk_usage(cache_dir).free + total) // 2
+        if total <= limit:
+            return
+
+        removed, freed = 0, 0
+        entries.sort()
+        for _, size, path in entries:
+            if total - freed <= limit:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+                freed += size
+            except OSError:
+                pass
+        print(f"🧹 Image cache: removed {removed} least recently used files ({freed / 1024**2:.0f} MB freed)")
+    except Exception as e:
+        print(f"⚠️ Image cache cleanup failed: {e}")
+
+def write_xlsx_fast(path, sheets):
     """
+    Writes {sheet name: [DataFrame, ...]} with an openpyxl write-only workbook, streaming
+    rows instead of building the workbook in memory. Frames sharing a sheet are stacked
+    with two blank rows between them.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    for name, frames in sheets.items():
+        ws = wb.create_sheet(title=name)
+        for i, df in enumerate(frames):
+            if i:
+                ws.append([])
+                ws.append([])
+            ws.append([str(c) for c in df.columns])
+            # Blank cells for NaN/NaT, as to_excel would write them
+            values = df.astype(object).where(df.notna(), None)
+            for row in values.itertuples(index=False, name=None):
+                ws.append(row)
+    wb.save(path)
+
+def write_records_xlsx(path, records):
+    """
+    Streams a list of row dicts straight into a write-only workbook - no DataFrame is built.
+    Columns are the union of the dicts' keys in first-seen order (short rows get blanks).
+    """
+    columns = list(dict.fromkeys(k for r in records for k in r))
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title="Sheet1")
+    ws.append(columns)
+    for r in records:
+        ws.append([r.get(c) for c in columns])
+    wb.save(path)
+
+@functools.lru_cache(maxsize=None)
+def _model_prices(model_name):
+    """(input, output) USD per 1M tokens for a Gemini model name."""
     model = model_name.lower()
     
     # --- PRICING TABLE (Per 1 Million Tokens) ---
     
-    # Default: Gemini 2.5 Flash (Standard)
-    # Input: $0.30 | Output: $2.50
-    price_input_per_m = 0.30
-    price_output_per_m = 2.50
-
     # Logic: Gemini 2.5 Flash-8B (Lite)
     # Input: $0.10 | Output: $0.40
     if "lite" in model or "8b" in model:
-        price_input_per_m = 0.10
-        price_output_per_m = 0.40
+        return 0.10, 0.40
+        
+    # Default: Gemini 2.5 Flash (Standard)
+    # Input: $0.30 | Output: $2.50
+    return 0.30, 2.50
+
+def calculate_cost_cents(input_tokens, output_tokens, model_name):
+    """
+    Calculates the cost of an API call in Cents based on the specific Gemini model.
+    """
+    price_input_per_m, price_output_per_m = _model_prices(model_name)
         
     # --- CALCULATION ---
     cost_usd = (input_tokens / 1_000_000 * price_input_per_m) + \
@@ -132,7 +258,8 @@ def calculate_cost_cents(input_tokens, output_tokens, model_name):
 
 def generate_session_reports(key_usage_stats_data, token_usage_stats, run_ts, worker_id=0):
     """
-    1. Generates the per-worker Excel report (Key/Token usage).
+    1. Generates the per-worker report (Key/Token usage): two Parquet files when pyarrow is
+       available (merge_all_session_reports folds them into the final Excel), else one Excel.
     2. Logs a text summary to the log file.
     """
     key_stats = key_usage_stats_data.get("stats", {})
@@ -188,16 +315,22 @@ def generate_session_reports(key_usage_stats_data, token_usage_stats, run_ts, wo
 
         # Save to File
         os.makedirs(config.key_report_dir, exist_ok=True)
-        report_filename = f"Session_Report_worker_{worker_id}_{run_ts}.xlsx"
-        report_path = os.path.join(config.key_report_dir, report_filename)
+        report_base = os.path.join(config.key_report_dir, f"Session_Report_worker_{worker_id}_{run_ts}")
         
-        with pd.ExcelWriter(report_path) as writer:
+        if PYARROW_AVAILABLE:
             if key_report_data:
-                pd.DataFrame(key_report_data).to_excel(writer, sheet_name='Key Usage', index=False)
+                pd.DataFrame(key_report_data).to_parquet(f"{report_base}_keys.parquet", index=False)
             if token_report_data:
-                pd.DataFrame(token_report_data).to_excel(writer, sheet_name='Token Usage', index=False)
-        
-        log_msg(f"✅ Excel Report saved: {os.path.basename(report_path)}", worker_id)
+                pd.DataFrame(token_report_data).to_parquet(f"{report_base}_tokens.parquet", index=False)
+            log_msg(f"✅ Session Report saved: {os.path.basename(report_base)}_*.parquet", worker_id)
+        else:
+            report_path = f"{report_base}.xlsx"
+            with pd.ExcelWriter(report_path) as writer:
+                if key_report_data:
+                    pd.DataFrame(key_report_data).to_excel(writer, sheet_name='Key Usage', index=False)
+                if token_report_data:
+                    pd.DataFrame(token_report_data).to_excel(writer, sheet_name='Token Usage', index=False)
+            log_msg(f"✅ Excel Report saved: {os.path.basename(report_path)}", worker_id)
 
     except Exception as e:
-        log_msg(f"⚠️ Could not save Excel session report. Error: {e}", worker_id)
\ No newline at end of file
+        log_msg(f"⚠️ Could not save session report. Error: {e}", worker_id)
\ No newline at end of file
@@ -2,12 +2,17 @@ import os
 import hashlib
 import requests
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
 from webdriver_manager.chrome import ChromeDriverManager
 
@@ -65,7 +70,13 @@ def setup_driver(headless=False, worker_id=None):
     
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
     chrome_options.add_experimental_option("useAutomationExtension", False)
-    chrome_options.add_experimental_option("prefs", {"profile.default_content_setting_values.notifications": 2})
+    prefs = {"profile.default_content_setting_values.notifications": 2}
+    # getattr: spawned scrape workers use setup_driver without loading config.ini
+    if getattr(config, 'browser_block_images', True):
+        # Only the DOM (breadcrumb text, img src attributes) is read - skip downloading the pixels.
+        # Stylesheets stay on: the gallery arrow has to be laid out to be clickable.
+        prefs["profile.managed_default_content_settings.images"] = 2
+    chrome_options.add_experimental_option("prefs", prefs)
     
     # Use webdriver-manager to automatically download and manage ChromeDriver
     # This eliminates the need for chromedriver.exe in the repository
@@ -79,50 +90,66 @@ def setup_driver(headless=False, worker_id=None):
     driver = webdriver.Chrome(service=service, options=chrome_options)
     return driver
 
+# One round-trip for the whole gallery instead of up to 3 get_attribute calls per <img>.
+# Tries the same attributes as before (lazy-loaded images) and drops placeholders.
+GALLERY_URLS_JS = """
+return Array.from(document.querySelectorAll('img.rsImg'))
+    .map(i => i.src || i.getAttribute('data-src') || i.getAttribute('data-lazy-src'))
+    .filter(s => s && !s.toLowerCase().includes('placeholder'));
+"""
+
+# After each gallery click, how long to wait for a 3rd image to appear (polled, not slept)
+GALLERY_CLICK_WAIT = 0.4
+GALLERY_POLL_INTERVAL = 0.05
+
+def _gallery_image_urls(driver):
+    """Current gallery image URLs, de-duplicated in page order."""
+    return list(dict.fromkeys(driver.execute_script(GALLERY_URLS_JS) or []))
+
 def get_all_image_urls(driver, ad_id, timeout=10):
-    """Fetches all high-quality image URLs for a given ad ID. Tries to get 3 images if available."""
+    """Fetches all high-quality image URLs for a given ad ID. Tries to get config.max_images images if available."""
     url = f"https://www.commercialtrucktrader.com/listing/{ad_id}"
     try:
         driver.get(url)
         # Wait for images to load
         WebDriverWait(driver, timeout).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "img.rsImg")))
-        time.sleep(0.3)  # OPTIMIZED: 1s -> 0.3s
+        # OPTIMIZED: up to 0.3s for lazy images, polled instead of a fixed sleep
+        try:
+            WebDriverWait(driver, 0.3, poll_frequency=GALLERY_POLL_INTERVAL).until(
+                lambda d: len(_gallery_image_urls(d)) >= config.max_images)
+        except TimeoutException:
+            pass
         
-        # Try to interact with gallery to load more images (aim for 3 images)
+        # Try to interact with gallery to load more images (aim for max_images).
+        # Most galleries already have enough slides in the DOM at load - no clicking needed then.
         try:
-            arrow = driver.find_element(By.CSS_SELECTOR, ".rsArrowRight .rsArrowIcn")
-            action = ActionChains(driver)
-            # OPTIMIZED: Reduced max clicks from 10 to 4
-            for click_count in range(4):
-                try:
-                    action.click(arrow).perform()
-                    time.sleep(0.15)  # OPTIMIZED: 0.4s -> 0.15s
-                    # Check how many images we have now
-                    current_imgs = driver.find_elements(By.CSS_SELECTOR, "img.rsImg")
-                    current_urls = []  
-                    for img in current_imgs:
-                        src = img.get_attribute("src") or img.get_attribute("data-src") or img.get_attribute("data-lazy-src")
-                        if src and "placeholder" not in src.lower() and src not in current_urls:
-                            current_urls.append(src)
-                    if len(current_urls) >= 3:
+            if len(_gallery_image_urls(driver)) < config.max_images:
+                arrow = driver.find_element(By.CSS_SELECTOR, ".rsArrowRight .rsArrowIcn")
+                action = ActionChains(driver)
+                # OPTIMIZED: Reduced max clicks from 10 to 4
+                for click_count in range(4):
+                    try:
+                        action.click(arrow).perform()
+                        # Wake as soon as max_images are present instead of sleeping a fixed interval
+                        WebDriverWait(driver, GALLERY_CLICK_WAIT, poll_frequency=GALLERY_POLL_INTERVAL).until(
+                            lambda d: len(_gallery_image_urls(d)) >= config.max_images)
+                        break
+                    except TimeoutException:
+                        continue  # Not there yet - click again
+                    except:
                         break
-                except:
-                    break
         except:
             pass  # No arrow found, continue anyway
         
-        # OPTIMIZED: Reduced final wait from 0.8s to 0.2s
-        time.sleep(0.2)
+        # OPTIMIZED: final settle of at most 0.2s, skipped once max_images are there
+        try:
+            WebDriverWait(driver, 0.2, poll_frequency=GALLERY_POLL_INTERVAL).until(
+                lambda d: len(_gallery_image_urls(d)) >= config.max_images)
+        except TimeoutException:
+            pass
         
-        imgs = driver.find_elements(By.CSS_SELECTOR, "img.rsImg")
-        urls = []
-        for im in imgs:
-            # Try multiple attributes for lazy-loaded images
-            src = im.get_attribute("src") or im.get_attribute("data-src") or im.get_attribute("data-lazy-src")
-            # Filter out placeholders and duplicates
-            if src and "placeholder" not in src.lower() and src not in urls:
-                if src.startswith("http") or src.startswith("//"):
-                    urls.append(src)
+        urls = [src for src in _gallery_image_urls(driver)
+                if src.startswith("http") or src.startswith("//")]
                 
         return urls[:config.max_images]
     except Exception:
@@ -134,37 +161,71 @@ def get_all_image_urls(driver, ad_id, timeout=10):
         except Exception:
             return []
 
+# One keep-alive session per process, shared by the download threads. Connection failures
+# and throttling/5xx answers are retried - a slow image still gives up after the 5s read timeout.
+# A 429's Retry-After is ignored (plain backoff instead), so a CDN can't park a download thread.
+_http = requests.Session()
+_http_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32,
+                            max_retries=Retry(total=2, read=0, backoff_factor=0.2,
+                                              status_forcelist=[429, 500, 502, 503, 504],
+                                              respect_retry_after_header=False,
+                                              raise_on_status=False))
+_http.mount("https://", _http_adapter)
+_http.mount("http://", _http_adapter)
+
+# Cache misses for an ad are fetched side by side (TLS handshakes overlap)
+IMAGE_DOWNLOAD_WORKERS = 8
+_download_pool = ThreadPoolExecutor(max_workers=IMAGE_DOWNLOAD_WORKERS, thread_name_prefix="img-dl")
+
+def _download_image(url, cache_path):
+    """Fetches one image and writes it through to the cache. Returns None on a non-200."""
+    r = _http.get(url, timeout=5)  # OPTIMIZED: 8s -> 5s
+    if r.status_code != 200:
+        return None
+    content = r.content
+    # Write aside and rename, so another worker never reads (or keeps) a half-written image
+    tmp_path = f"{cache_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, cache_path)
+    return content
+
 def get_images_with_caching(image_urls):
     """
     Downloads images from a list of URLs, utilizing a local cache.
+    Uncached URLs are downloaded in parallel; the result keeps the order of image_urls.
     """
-    img_bytes_list = []
+    results = [None] * len(image_urls)
+    pending = []
     
     # Ensure cache directory exists
     os.makedirs(config.image_cache_dir, exist_ok=True)
     
-    # Use a session for faster connection reuse (Keep-Alive)
-    with requests.Session() as session:
-        for url in image_urls:
+    for i, url in enumerate(image_urls):
+        try:
+            # Create a safe filename hash
+            file_hash = hashlib.md5(url.encode()).hexdigest()
+            cache_path = os.path.join(config.image_cache_dir, f"{file_hash}.jpg")
+            
+            # Open straight away - a miss costs the same single failed lookup as exists()
             try:
-                # Create a safe filename hash
-                file_hash = hashlib.md5(url.encode()).hexdigest()
-                cache_path = os.path.join(config.image_cache_dir, f"{file_hash}.jpg")
+                with open(cache_path, 'rb') as f:
+                    results[i] = f.read()
+                # Mark as recently used for the run-start LRU prune (utils.prune_image_cache)
+                try: os.utime(cache_path)
+                except OSError: pass
+            except FileNotFoundError:
+                pending.append((i, url, _download_pool.submit(_download_image, url, cache_path)))
                 
-                if os.path.exists(cache_path):
-                    with open(cache_path, 'rb') as f:
-                        img_bytes_list.append(f.read())
-                else:
-                    # Download with a short timeout using the session
-                    r = session.get(url, timeout=5)  # OPTIMIZED: 8s -> 5s
-                    if r.status_code == 200:
-                        content = r.content
-                        img_bytes_list.append(content)
-                        with open(cache_path, 'wb') as f:
-                            f.write(content)
-                            
-            except Exception as e:
-                # Log silently to file
-                log_msg(f"Error downloading {url}: {e}", -1)
+        except Exception as e:
+            # Log silently to file
+            log_msg(f"Error downloading {url}: {e}", -1)
+    
+    for i, url, future in pending:
+        try:
+            results[i] = future.result()
+        except Exception as e:
+            # Log silently to file
+            log_msg(f"Error downloading {url}: {e}", -1)
             
-    return img_bytes_list
\ No newline at end of file
+    return [img for img in results if img is not None]
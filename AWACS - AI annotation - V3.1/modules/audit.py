@@ -1,7 +1,9 @@
 import os
 import sys
 import glob
+import openpyxl
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # --- ROBUST PATH SETUP ---
@@ -24,22 +26,77 @@ else:
 try:
     from ai_tool.config_loader import config, load_config
     from ai_tool.data_processing import load_rules, normalize_text
+    from ai_tool.utils import write_xlsx_fast
 except ImportError as e:
     print(f"\n❌ CRITICAL IMPORT ERROR: {e}")
     print(f"   Current Path: {current_script_path}")
     input("Press Enter to exit...")
     sys.exit(1)
 
-def get_normalized_set(row, cols, norm_map):
-    """Helper to extract columns, normalize them, and return a set."""
-    res_set = set()
-    for c in cols:
-        val = row.get(c)
-        if pd.notna(val) and str(val).strip() != "":
-            norm_val = normalize_text(str(val), norm_map)
-            if norm_val:
-                res_set.add(norm_val.lower())
-    return res_set
+def get_normalized_sets(df, cols, norm_map, index=None):
+    """
+    Helper to normalize the given columns of every row at once.
+    Returns one set per row; each distinct cell value is normalized only once.
+    Pass rules['_normalize_index'] as `index` so normalize_text doesn't rebuild its lookups.
+    """
+    memo = {}
+
+    def norm(val):
+        if pd.isna(val):
+            return None
+        val = str(val)
+        if val not in memo:
+            norm_val = normalize_text(val, norm_map, index=index) if val.strip() != "" else None
+            memo[val] = norm_val.lower() if norm_val else None
+        return memo[val]
+
+    columns = [[norm(v) for v in df[c].tolist()] for c in cols if c in df.columns]
+    if not columns:
+        return [set() for _ in range(len(df))]
+    return [{v for v in vals if v} for vals in zip(*columns)]
+
+def read_ai_output(path):
+    """
+    Streams the first sheet of an AI output workbook with openpyxl in read-only mode.
+    The Ad ID column is renamed to "Ad ID"; returns None (before reading any data
+    row) when the header has no Ad ID column.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return None
+        header = [f"Unnamed: {i}" if h is None else str(h) for i, h in enumerate(header)]
+
+        # Check for Ad ID column variants
+        cols_lower = {c.lower(): c for c in header}
+        if 'ad id' in cols_lower:
+            col_name = cols_lower['ad id']
+        elif 'ad_id' in cols_lower:
+            col_name = cols_lower['ad_id']
+        else:
+            return None # Skip files without Ad ID (logs, etc.)
+        header[header.index(col_name)] = "Ad ID"
+
+        records = [r for r in rows if any(v is not None for v in r)]
+    finally:
+        wb.close()
+    return pd.DataFrame.from_records(records, columns=header)
+
+def safe_read_ai_file(path):
+    """read_ai_output + Ad ID cleanup; None for unreadable files or files without Ad IDs."""
+    try:
+        # Read file (None if it has no Ad ID column)
+        temp_df = read_ai_output(path)
+        if temp_df is None:
+            return None
+
+        # Standardize
+        temp_df["Ad ID"] = temp_df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
+        return temp_df
+    except:
+        return None
 
 def run_audit():
     load_config()
@@ -76,28 +133,11 @@ def run_audit():
         print(f"❌ No Excel files found in: {ai_dir}")
         return
 
-    ai_dfs = []
     print(f"   Scanning {len(ai_files)} files...")
     
-    for f in ai_files:
-        try:
-            # Read file
-            temp_df = pd.read_excel(f, dtype={"Ad ID": str})
-            
-            # Check for Ad ID column variants
-            cols_lower = {c.lower(): c for c in temp_df.columns}
-            if 'ad id' in cols_lower:
-                col_name = cols_lower['ad id']
-            elif 'ad_id' in cols_lower:
-                col_name = cols_lower['ad_id']
-            else:
-                continue # Skip files without Ad ID (logs, etc.)
-
-            # Standardize
-            temp_df.rename(columns={col_name: "Ad ID"}, inplace=True)
-            temp_df["Ad ID"] = temp_df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
-            ai_dfs.append(temp_df)
-        except: pass
+    # Files are read side by side; map() keeps glob order, which the keep='last' dedupe relies on
+    with ThreadPoolExecutor(max_workers=min(8, len(ai_files))) as ex:
+        ai_dfs = [df for df in ex.map(safe_read_ai_file, ai_files) if df is not None]
     
     if not ai_dfs:
         print("❌ Failed to read valid data from AI files.")
@@ -135,7 +175,7 @@ def run_audit():
             print("❌ Error: Manual Feedback file must have an 'Ad ID' column.")
             return
 
-        human_df["Ad ID"] = human_df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+        human_df["Ad ID"] = human_df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
     except Exception as e:
         print(f"❌ Error reading manual file: {e}")
         return
@@ -149,19 +189,23 @@ def run_audit():
         return
 
     # 6. COMPARISON LOGIC
-    audit_results = []
-    
     ai_cols = ["Annotated_Top1", "Annotated_Top2", "Annotated_Top3"]
     human_keys = ["Primary Category", "Add'l Category 1", "Add'l Category 2"]
     
     found_human_cols = [c for c in human_keys if c in human_df.columns]
 
-    for idx, row in merged.iterrows():
-        ai_set = get_normalized_set(row, ai_cols, norm_map)
-        ai_status = str(row.get("Status", "")).lower()
-        
-        human_set = get_normalized_set(row, found_human_cols, norm_map)
-        
+    # Normalize column-wise instead of walking rows with iterrows()
+    norm_index = rules['_normalize_index']
+    ai_sets = get_normalized_sets(merged, ai_cols, norm_map, norm_index)
+    human_sets = get_normalized_sets(merged, found_human_cols, norm_map, norm_index)
+    if "Status" in merged.columns:
+        # str() per value like the old row.get(): a blank cell becomes "nan", never a float NaN
+        ai_statuses = [str(s).lower() for s in merged["Status"].tolist()]
+    else:
+        ai_statuses = [""] * len(merged)
+
+    statuses = []
+    for ai_set, human_set, ai_status in zip(ai_sets, human_sets, ai_statuses):
         status = "Rejected" # Default
 
         if ai_set == human_set:
@@ -170,20 +214,21 @@ def run_audit():
         elif len(human_set) == 0:
             if "image not clear" in ai_set:
                 status = "Accepted"
-            elif "inactive ad" in ai_status or "inactive" in ai_status:
+            elif "inactive" in ai_status:
                 status = "Accepted"
             elif "inactive ad" in ai_set:
                 status = "Accepted"
 
-        audit_results.append({
-            "Ad ID": row["Ad ID"],
-            "Feedback Status": status,
-            "AI Categories": ", ".join(sorted(ai_set)),
-            "Manual Categories": ", ".join(sorted(human_set))
-        })
+        statuses.append(status)
 
-    audit_df = pd.DataFrame(audit_results)
-    final_output = pd.merge(merged, audit_df[["Ad ID", "Feedback Status"]], on="Ad ID", how="left")
+    audit_df = pd.DataFrame({
+        "Ad ID": merged["Ad ID"].tolist(),
+        "Feedback Status": statuses,
+        "AI Categories": [", ".join(sorted(s)) for s in ai_sets],
+        "Manual Categories": [", ".join(sorted(s)) for s in human_sets]
+    })
+    # audit_df is row-aligned with merged, so the status is attached positionally (no re-join)
+    final_output = merged.assign(**{"Feedback Status": statuses})
 
     # 7. GENERATE SUMMARY (UPDATED)
     total = len(final_output)
@@ -197,10 +242,10 @@ def run_audit():
     accepted_mask = (final_output["Feedback Status"] == "Accepted")
     rejected_mask = (final_output["Feedback Status"] == "Rejected")
     
-    total_accepted = len(final_output[accepted_mask])
-    total_rejected = len(final_output[rejected_mask])
+    total_accepted = int(accepted_mask.sum())
+    total_rejected = int(rejected_mask.sum())
     
-    active_accepted = len(final_output[accepted_mask & (~is_inactive)])
+    active_accepted = int((accepted_mask & ~is_inactive).sum())
 
     global_acc_pct = (total_accepted / total) * 100 if total > 0 else 0
     active_acc_pct = (active_accepted / active_total) * 100 if active_total > 0 else 0
@@ -232,10 +277,10 @@ def run_audit():
     report_path = os.path.join(audit_dir, f"Audit_Report_{timestamp}.xlsx")
     
     try:
-        with pd.ExcelWriter(report_path) as writer:
-            final_output.to_excel(writer, sheet_name="Detailed Audit", index=False)
-            summary_df.to_excel(writer, sheet_name="Summary", index=False, startrow=0, startcol=0)
-            hall_of_shame.to_excel(writer, sheet_name="Summary", index=False, startrow=len(summary_df)+3, startcol=0)
+        write_xlsx_fast(report_path, {
+            "Detailed Audit": [final_output],
+            "Summary": [summary_df, hall_of_shame]
+        })
             
         print(f"\n✅ Audit Complete!")
         print(f"   Global Accuracy: {global_acc_pct:.2f}%")
@@ -39,14 +39,18 @@ def select_file(file_list, prompt_message):
         except ValueError:
             print("❗️Invalid input. Please enter a number.")
 
-def get_categories_from_row(row, columns):
-    """Extracts, cleans, and sorts a set of categories from a DataFrame row."""
-    categories = set()
-    for col in columns:
-        if col in row and pd.notna(row[col]):
-            categories.add(str(row[col]).strip())
-    # Return a sorted, comma-separated string for consistent grouping
-    return ", ".join(sorted(list(categories))) if categories else "None"
+def get_categories_by_row(df, columns):
+    """
+    Extracts, cleans, and sorts the set of categories of every DataFrame row.
+    Returns a Series of sorted, comma-separated strings (aligned with df).
+    """
+    present = [df[col].tolist() for col in columns if col in df.columns]
+    keys = []
+    for values in zip(*present) if present else [()] * len(df):
+        categories = {str(v).strip() for v in values if pd.notna(v)}
+        # Sorted, comma-separated string for consistent grouping
+        keys.append(", ".join(sorted(categories)) if categories else "None")
+    return pd.Series(keys, index=df.index, dtype=object)
 
 def analyze_corrections():
     """Main function to run the comparison and generate an Excel report."""
@@ -85,20 +89,15 @@ def analyze_corrections():
         print("\n❌ No matching Ad IDs found between the two files. Cannot perform analysis."); return
 
     # 5. Analyze the differences
-    mistake_rows = []
-    perfect_matches = 0
-
-    for _, row in merged_df.iterrows():
-        ai_cats_str = get_categories_from_row(row, [f"{col}_ai" for col in AI_CATEGORY_COLUMNS])
-        human_cats_str = get_categories_from_row(row, [f"{col}_human" for col in HUMAN_CATEGORY_COLUMNS])
-
-        if ai_cats_str == human_cats_str:
-            perfect_matches += 1
-        else:
-            mistake_rows.append({
-                "AI Categories": ai_cats_str,
-                "Human Corrected Categories": human_cats_str
-            })
+    ai_cats = get_categories_by_row(merged_df, [f"{col}_ai" for col in AI_CATEGORY_COLUMNS])
+    human_cats = get_categories_by_row(merged_df, [f"{col}_human" for col in HUMAN_CATEGORY_COLUMNS])
+
+    is_match = (ai_cats == human_cats)
+    perfect_matches = int(is_match.sum())
+    mistakes_df = pd.DataFrame({
+        "AI Categories": ai_cats[~is_match],
+        "Human Corrected Categories": human_cats[~is_match]
+    })
     
     # 6. Generate the report DataFrames
     total_compared = len(merged_df)
@@ -113,8 +112,7 @@ def analyze_corrections():
     summary_df = pd.DataFrame(summary_data)
 
     # Create Mistakes DataFrame
-    if mistake_rows:
-        mistakes_df = pd.DataFrame(mistake_rows)
+    if not mistakes_df.empty:
         # Group and count the occurrences of each unique mistake
         mistake_counts_df = mistakes_df.groupby(['AI Categories', 'Human Corrected Categories']).size().reset_index(name='Count')
         mistake_counts_df = mistake_counts_df.sort_values(by='Count', ascending=False).reset_index(drop=True)
@@ -6,7 +6,7 @@ import glob
 import pandas as pd
 import threading
 import queue
-from multiprocessing import Process, freeze_support, Manager
+from multiprocessing import Process, Queue, freeze_support, Manager
 from datetime import datetime
 
 # --- PATH SETUP ---
@@ -17,8 +17,9 @@ if current_dir not in sys.path: sys.path.append(current_dir)
 # Import Custom Modules
 from ai_tool import config_loader
 from ai_tool.config_loader import config
-from ai_tool.main_processor import merge_all_session_reports, save_checkpoint
+from ai_tool.main_processor import merge_all_session_reports, save_checkpoint, PYARROW_AVAILABLE
 from ai_tool.rate_limiter import Yoda
+from ai_tool import data_processing
 
 import scraper_module
 import ai_module
@@ -31,6 +32,11 @@ import audit       # Option 10
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
+# ANSI "cursor home + clear screen" - the dashboard redraws without spawning a shell
+ANSI_CLEAR = "\x1b[H\x1b[2J"
+DASHBOARD_REFRESH_ACTIVE = 0.3  # seconds between frames while status updates are arriving
+DASHBOARD_REFRESH_IDLE = 1.5
+
 # --- DASHBOARD RENDERER ---
 def dashboard_renderer(status_queue, total_ads, start_time, num_workers, total_keys):
     worker_status = {i: {"state": "STARTING"} for i in range(1, num_workers + 1)}
@@ -47,10 +53,16 @@ def dashboard_renderer(status_queue, total_ads, start_time, num_workers, total_k
         "Alexa", "Auto", "EVE", "RoboCop", "Iron Giant"
     ]
 
+    if os.name == 'nt':
+        os.system('')  # Switches the Windows console into ANSI (VT) mode for ANSI_CLEAR
+    prev_frame_key = None
+
     while not shutdown:
+        got_updates = False
         try:
             while True:
                 msg = status_queue.get_nowait()
+                got_updates = True
                 if msg == "STOP":
                     shutdown = True
                     break
@@ -71,7 +83,16 @@ def dashboard_renderer(status_queue, total_ads, start_time, num_workers, total_k
         except queue.Empty:
             pass
 
-        clear_screen()
+        # Nothing on screen would change (same counters, same second) -> skip the redraw
+        elapsed = int(time.time() - start_time)
+        frame_key = (completed, exhausted_keys, rate_limit_hits, elapsed,
+                     tuple((i, s.get("state"), s.get("ad_id"), s.get("progress", 0))
+                           for i, s in sorted(worker_status.items())))
+        if frame_key == prev_frame_key and not shutdown:
+            time.sleep(DASHBOARD_REFRESH_ACTIVE if got_updates else DASHBOARD_REFRESH_IDLE)
+            continue
+        prev_frame_key = frame_key
+
         # Calculate Percentage & Bar
         percent = (completed / total_ads) * 100 if total_ads else 0
         bar_len = 50
@@ -79,7 +100,6 @@ def dashboard_renderer(status_queue, total_ads, start_time, num_workers, total_k
         bar = "█" * filled_len + "░" * (bar_len - filled_len)
         
         # Calculate Time
-        elapsed = int(time.time() - start_time)
         eta = "??:??"
         if completed > 5:
             avg_time = elapsed / completed
@@ -89,15 +109,17 @@ def dashboard_renderer(status_queue, total_ads, start_time, num_workers, total_k
 
         disp_exhausted = min(exhausted_keys, total_keys)
 
-        print("═" * 80)
-        print("   AUTOMATED WORKFLOW TOOL v3.1 - PARALLEL CLASSIFICATION")
-        print("═" * 80)
-        print(f"\n  PROGRESS: [{bar}] {completed}/{total_ads} ({percent:.1f}%)")
-        print(f"  Elapsed: {elapsed//60:02d}:{elapsed%60:02d} | ETA ≈ {eta}")
-        print(f"  KEYS: {total_keys} Total | {disp_exhausted} Dead | {rate_limit_hits} Damn you moron slow down\n")
-        
-        print(f"  {'WORKER':<12}  {'STATUS':<10}  {'CURRENT AD':<17}  {'DONE'}")
-        print(f"  {'-'*12}  {'-'*10}  {'-'*17}  {'----'}")
+        # The whole frame is built first and written in one go (no flicker between lines)
+        lines = [
+            "═" * 80,
+            "   AUTOMATED WORKFLOW TOOL v3.1 - PARALLEL CLASSIFICATION",
+            "═" * 80,
+            f"\n  PROGRESS: [{bar}] {completed}/{total_ads} ({percent:.1f}%)",
+            f"  Elapsed: {elapsed//60:02d}:{elapsed%60:02d} | ETA ≈ {eta}",
+            f"  KEYS: {total_keys} Total | {disp_exhausted} Dead | {rate_limit_hits} Damn you moron slow down\n",
+            f"  {'WORKER':<12}  {'STATUS':<10}  {'CURRENT AD':<17}  {'DONE'}",
+            f"  {'-'*12}  {'-'*10}  {'-'*17}  {'----'}",
+        ]
         
         for i in range(1, num_workers + 1):
             s = worker_status.get(i, {})
@@ -117,10 +139,12 @@ def dashboard_renderer(status_queue, total_ads, start_time, num_workers, total_k
             prog = s.get("progress", 0)
             
             name = WORKER_NAMES[(i - 1) % len(WORKER_NAMES)]
-            print(f"  {name:<12}  {icon:<10}  {ad:<17}  {prog:4d}")
+            lines.append(f"  {name:<12}  {icon:<10}  {ad:<17}  {prog:4d}")
             
-        print("═" * 80)
-        time.sleep(0.8)
+        lines.append("═" * 80)
+        sys.stdout.write(ANSI_CLEAR + "\n".join(lines) + "\n")
+        sys.stdout.flush()
+        time.sleep(DASHBOARD_REFRESH_ACTIVE if got_updates else DASHBOARD_REFRESH_IDLE)
 
 # --- PARALLEL RUNNER ---
 def run_parallel_ai(workers=10, high_accuracy=False, use_vision_v2=False):
@@ -129,19 +153,27 @@ def run_parallel_ai(workers=10, high_accuracy=False, use_vision_v2=False):
     latest = max(files, key=os.path.getmtime)
 
     df = pd.read_excel(latest, dtype={"Ad ID": str})
-    df["Ad ID"] = df["Ad ID"].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+    df["Ad ID"] = df["Ad ID"].astype(str).str.removesuffix('.0').str.strip()
 
     # Resume Logic
     done_set = set()
     for f in glob.glob(os.path.join(config.output_dir, "output_annotated_*.xlsx")):
         try: done_set.update(pd.read_excel(f, usecols=["Ad ID"])["Ad ID"].astype(str).str.strip())
         except: pass
+    # Checkpoints left behind by an interrupted run (no final .xlsx yet)
+    for f in glob.glob(os.path.join(config.output_dir, "output_annotated_*.parquet")):
+        try: done_set.update(pd.read_parquet(f, columns=["Ad ID"])["Ad ID"].astype(str).str.strip())
+        except: pass
 
     print(f"Resume: Skipping {len(done_set)} already processed ads")
 
     run_ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     m = Manager()
-    job_q, res_q, stat_q, key_q = m.Queue(), m.Queue(), m.Queue(), m.Queue()
+    # Results and status updates (several per ad) use plain pipe-backed queues - no round trip
+    # through the Manager process. Both are drained until the last worker exits. Jobs and keys
+    # stay on the Manager: workers re-queue jobs (on retry_q) on exit and grab keys with get_nowait().
+    job_q, key_q, retry_q = m.Queue(), m.Queue(), m.Queue()
+    res_q, stat_q = Queue(), Queue()
     
     # Load Keys
     for k in config.gemini_api_keys_info: key_q.put(k)
@@ -154,6 +186,7 @@ def run_parallel_ai(workers=10, high_accuracy=False, use_vision_v2=False):
             job_q.put(r.to_dict())
             new += 1
     if new == 0: print("All done!"); input(); return
+    for _ in range(workers): job_q.put(None)  # One end-of-jobs sentinel per worker
 
     print(f"\nStarting {workers} workers on {new} new ads...")
     print(f"Mode: {'HIGH ACCURACY (2 images)' if high_accuracy else 'FAST (1 or 2)'} | Vision v2: {'ON' if use_vision_v2 else 'OFF'}")
@@ -163,6 +196,14 @@ def run_parallel_ai(workers=10, high_accuracy=False, use_vision_v2=False):
     yoda = Yoda(config.gemini_api_keys_info, config.rate_limit_rpm, m)
     # -----------------------
 
+    # Parse categories/rules once here instead of once per worker
+    category_data = data_processing.load_category_data(config.category_json)
+    rules = data_processing.load_rules(config.rules_json)
+
+    # Keep the image cache within its disk budget before the workers start filling it
+    from ai_tool import utils
+    utils.prune_image_cache()
+
     start = time.time()
     # Start Dashboard
     threading.Thread(target=dashboard_renderer, args=(stat_q, new, start, workers, total_keys), daemon=True).start()
@@ -172,33 +213,38 @@ def run_parallel_ai(workers=10, high_accuracy=False, use_vision_v2=False):
     for i in range(1, workers+1):
         p = Process(target=ai_module.start_worker,
                      # PASS YODA HERE
-                     args=(i, run_ts, job_q, res_q, stat_q, key_q, high_accuracy, use_vision_v2, yoda))
+                     args=(i, run_ts, job_q, res_q, stat_q, key_q, high_accuracy, use_vision_v2, yoda,
+                           category_data, rules, retry_q))
         p.start()
         procs.append(p)
         time.sleep(0.5) # Minimal stagger needed now
 
     results = []
-    last_save = time.time()
+    new_results = threading.Event()  # Set by the collector, cleared by each checkpoint
+    stop_checkpoints = threading.Event()  # Set before the final save, so no interim save can race it
 
-    # Saver Thread
+    # Saver Thread - at most one checkpoint a minute, and only if results arrived since the last
     def checkpoint_timer():
-        nonlocal last_save
-        while any(p.is_alive() for p in procs):
-            if time.time() - last_save >= 60 and results:
-                save_checkpoint(run_ts, results.copy(), df)
-                last_save = time.time()
-            time.sleep(10)
+        while not stop_checkpoints.wait(60):
+            if not any(p.is_alive() for p in procs):
+                break
+            if new_results.is_set():
+                new_results.clear()
+                save_checkpoint(run_ts, results.copy(), df, final=False)
 
-    threading.Thread(target=checkpoint_timer, daemon=True).start()
+    saver = threading.Thread(target=checkpoint_timer, daemon=True)
+    saver.start()
 
-    # Result Collector
-    while any(p.is_alive() for p in procs) or not res_q.empty():
+    # Result Collector - worker liveness is only polled once the queue goes quiet, not per result
+    while True:
         try:
             r = res_q.get(timeout=1)
             if r and r.get("Ad ID"):
                 results.append(r)
+                new_results.set()
                 stat_q.put({"type": "progress", "completed": len(results)})
-        except queue.Empty: continue
+        except queue.Empty:
+            if not any(p.is_alive() for p in procs): break
 
     for p in procs: p.join(timeout=10) or p.terminate()
     
@@ -211,6 +257,9 @@ def run_parallel_ai(workers=10, high_accuracy=False, use_vision_v2=False):
         except: break
     
     stat_q.put("STOP")
+    # Let an interim save that is already running finish before the final one
+    stop_checkpoints.set()
+    saver.join()
     
     # Final Save
     if results:
@@ -221,16 +270,26 @@ def run_parallel_ai(workers=10, high_accuracy=False, use_vision_v2=False):
             print(f"✅ File saved successfully.")
         except Exception as e:
             print(f"\n❌ ERROR SAVING FILE: {e}")
-            print(f"Dumping raw results to 'EMERGENCY_DUMP_{run_ts}.xlsx'...")
+            # Parquet when possible: fast and cheap to write even on a huge, struggling run
+            dump_name = f"EMERGENCY_DUMP_{run_ts}.{'parquet' if PYARROW_AVAILABLE else 'xlsx'}"
+            print(f"Dumping raw results to '{dump_name}'...")
             try:
-                pd.DataFrame(results).to_excel(f"EMERGENCY_DUMP_{run_ts}.xlsx", index=False)
+                if PYARROW_AVAILABLE:
+                    try:
+                        pd.DataFrame(results).to_parquet(dump_name, engine='pyarrow', compression='zstd', index=False)
+                    except Exception:
+                        # Mixed object types in the raw dicts can trip the parquet schema - xlsx takes anything
+                        dump_name = dump_name.replace('.parquet', '.xlsx')
+                        print(f"Parquet dump failed, dumping to '{dump_name}' instead...")
+                        utils.write_records_xlsx(dump_name, results)
+                else:
+                    utils.write_records_xlsx(dump_name, results)
             except:
                 print("Critical failure: Could not even dump raw results.")
             
     merge_all_session_reports(run_ts)
     
     # Merge Logs
-    from ai_tool import utils
     utils.merge_worker_logs(run_ts)
     
     print("\nRUN COMPLETED!")
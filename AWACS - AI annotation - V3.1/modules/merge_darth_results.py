@@ -19,6 +19,11 @@ except ImportError:
     config.output_dir = os.path.join(parent_dir, "AI output")
     config.project_root = parent_dir
 
+try:
+    from ai_tool.utils import write_xlsx_fast
+except ImportError:
+    write_xlsx_fast = None # Falls back to DataFrame.to_excel
+
 def select_file(directory, pattern, prompt_name):
     files = glob.glob(os.path.join(directory, pattern))
     # Filter out temp files
@@ -77,46 +82,49 @@ def apply_darth_merge():
     try:
         # Load Dataframes
         main_df = pd.read_excel(ai_file, dtype={"Ad ID": str})
-        darth_df = pd.read_excel(darth_file, dtype={"Ad ID": str})
+        darth_df = pd.read_excel(darth_file, dtype={"Ad ID": str}, usecols=["Ad ID"])  # Only the IDs are used
         
         # Clean IDs
         main_df["Ad ID"] = main_df["Ad ID"].str.strip()
         darth_df["Ad ID"] = darth_df["Ad ID"].str.strip()
         
-        # Identify IDs to update
-        darth_ids = set(darth_df["Ad ID"])
-        count = 0
-        
-        for idx, row in main_df.iterrows():
-            if row["Ad ID"] in darth_ids:
-                # Update Logic: Insert "Dually" into Top 2
-                
-                # Get current values
-                top1 = row.get("Annotated_Top1", "")
-                top2 = row.get("Annotated_Top2", "")
-                # top3 will be overwritten by old top2 if needed
-                
-                # Logic: Keep Top1, Insert Dually, Push Top2 to Top3
-                main_df.at[idx, "Annotated_Top2"] = "Dually"
-                main_df.at[idx, "Annotated_Top2_Score"] = 90.0 # Assign high confidence
-                
-                if pd.notna(top2) and str(top2).strip() != "":
-                    main_df.at[idx, "Annotated_Top3"] = top2
-                    main_df.at[idx, "Annotated_Top3_Score"] = row.get("Annotated_Top2_Score", 0)
-                
-                # Mark status updated so user knows
-                current_status = str(row.get("Status", ""))
-                if "Darth" not in current_status:
-                    main_df.at[idx, "Status"] = f"{current_status} (Dually Added)"
-                
-                count += 1
+        # Identify IDs to update (isin hashes the Darth IDs in C - no Python-side set)
+        mask = main_df["Ad ID"].isin(darth_df["Ad ID"])
+        count = int(mask.sum())
+
+        if count:
+            # Update Logic: Insert "Dually" into Top 2 (whole column slices, no per-row writes)
+            def current(col, default):
+                if col in main_df.columns:
+                    return main_df.loc[mask, col]
+                return pd.Series(default, index=main_df.index[mask], dtype=object)
+
+            # Get current values (before the overwrite); top3 is replaced by old top2 where there is one
+            top2 = current("Annotated_Top2", "")
+            top2_score = current("Annotated_Top2_Score", 0)
+            pushed = top2.index[top2.notna() & (top2.astype(str).str.strip() != "")]
+
+            # Logic: Keep Top1, Insert Dually, Push Top2 to Top3
+            main_df.loc[mask, "Annotated_Top2"] = "Dually"
+            main_df.loc[mask, "Annotated_Top2_Score"] = 90.0 # Assign high confidence
+            if len(pushed):
+                main_df.loc[pushed, "Annotated_Top3"] = top2[pushed]
+                main_df.loc[pushed, "Annotated_Top3_Score"] = top2_score[pushed]
+
+            # Mark status updated so user knows
+            current_status = current("Status", "").map(str)
+            unmarked = current_status[~current_status.str.contains("Darth", regex=False)]
+            main_df.loc[unmarked.index, "Status"] = unmarked + " (Dually Added)"
         
         # Save Copy
         base_name = os.path.splitext(os.path.basename(ai_file))[0]
         new_filename = f"{base_name}_with_Darth.xlsx"
         save_path = os.path.join(config.output_dir, new_filename)
         
-        main_df.to_excel(save_path, index=False)
+        if write_xlsx_fast:
+            write_xlsx_fast(save_path, {"Sheet1": [main_df]})
+        else:
+            main_df.to_excel(save_path, index=False)
         
         print("\n✅ Success!")
         print(f"   Updated {count} ads with 'Dually'.")
@@ -4,6 +4,16 @@ import pandas as pd
 from datetime import datetime
 
 from ai_tool.config_loader import config
+from ai_tool.utils import write_xlsx_fast
+
+# --- UPDATED COLUMN LIST INCLUDING 'Cost_Cents' ---
+# Columns of the merged file; anything else in the AI outputs is never parsed
+MERGED_COLUMNS = [
+    "Ad ID", "Breadcrumb_Top1", "Breadcrumb_Top2", "Breadcrumb_Top3",
+    "Annotated_Top1", "Annotated_Top2", "Annotated_Top3",
+    "Annotated_Top1_Score", "Annotated_Top2_Score", "Annotated_Top3_Score",
+    "Image_Count", "Image_URLs", "Status", "Cost_Cents"
+]
 
 def merge_excel_files():
     """
@@ -44,9 +54,10 @@ def merge_excel_files():
     df_list = []
     for file in files_to_merge:
         try:
-            # Ensure Ad IDs are read as strings to prevent data type issues
-            df = pd.read_excel(file, dtype={ad_id_column: str})
-            df[ad_id_column] = df[ad_id_column].str.replace(r'\.0$', '', regex=True).str.strip()
+            # Ensure Ad IDs are read as strings to prevent data type issues.
+            # The callable usecols keeps only MERGED_COLUMNS, whichever of them the file has.
+            df = pd.read_excel(file, dtype={ad_id_column: str}, usecols=lambda c: c in MERGED_COLUMNS)
+            df[ad_id_column] = df[ad_id_column].str.removesuffix('.0').str.strip()
             df_list.append(df)
         except Exception as e:
             print(f"⚠️ Warning: Could not read file '{os.path.basename(file)}'. Skipping. Error: {e}")
@@ -65,18 +76,20 @@ def merge_excel_files():
     # Step 2: Get the MASTER sort order from the original Scrapper.xlsx file.
     try:
         scraper_input_path = os.path.join(config.project_root, "Scrapper.xlsx")
-        scraper_df = pd.read_excel(scraper_input_path, dtype={ad_id_column: str})
+        # Only the Ad ID order is needed - skip building the other (breadcrumb/URL) columns
+        scraper_df = pd.read_excel(scraper_input_path, dtype={ad_id_column: str}, usecols=[ad_id_column])
         # Create a clean DataFrame that only contains the master sort order.
         master_order_df = scraper_df[[ad_id_column]].copy()
-        master_order_df[ad_id_column] = master_order_df[ad_id_column].str.replace(r'\.0$', '', regex=True).str.strip()
+        master_order_df[ad_id_column] = master_order_df[ad_id_column].str.removesuffix('.0').str.strip()
         master_order_df.dropna(inplace=True)
     except Exception as e:
         print(f"❌ CRITICAL ERROR: Could not read the master order from 'Scrapper.xlsx'. Error: {e}")
         input("\nPress Enter to exit.")
         return
         
-    # Step 3: Use a LEFT MERGE to sort the data.
-    final_df = pd.merge(master_order_df, correct_data_df, on=ad_id_column, how='left')
+    # Step 3: Sort the data into master order. Ad IDs are unique after Step 1, so this is a
+    # plain index lookup (same rows as a left merge, without building a join).
+    final_df = correct_data_df.set_index(ad_id_column).reindex(master_order_df[ad_id_column]).reset_index()
 
     print(f"\nTotal unique ads after merging and sorting: {len(final_df)}")
     
@@ -85,14 +98,8 @@ def merge_excel_files():
     output_path = os.path.join(merged_dir, output_filename)
     
     try:
-        # --- UPDATED COLUMN LIST INCLUDING 'Cost_Cents' ---
-        final_columns = [
-            "Ad ID", "Breadcrumb_Top1", "Breadcrumb_Top2", "Breadcrumb_Top3",
-            "Annotated_Top1", "Annotated_Top2", "Annotated_Top3",
-            "Annotated_Top1_Score", "Annotated_Top2_Score", "Annotated_Top3_Score",
-            "Image_Count", "Image_URLs", "Status", "Cost_Cents"
-        ]
-        
+        final_columns = MERGED_COLUMNS
+
         # Add missing columns with empty string to avoid KeyError
         for col in final_columns:
             if col not in final_df.columns:
@@ -101,7 +108,7 @@ def merge_excel_files():
         # Reindex to ensure consistent order
         final_df = final_df.reindex(columns=final_columns)
         
-        final_df.to_excel(output_path, index=False)
+        write_xlsx_fast(output_path, {"Sheet1": [final_df]})
         print(f"\n✅ Merge complete! File saved to: {output_path}")
     except Exception as e:
         print(f"\n❌ An error occurred while saving the file: {e}")
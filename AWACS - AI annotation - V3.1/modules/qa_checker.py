@@ -1,5 +1,6 @@
 import os
 import sys
+import csv
 import glob
 import time
 import pandas as pd
@@ -16,7 +17,7 @@ try:
     from ai_tool.config_loader import config, load_config
     from ai_tool.web_utils import setup_driver
     from ai_tool.data_processing import load_rules, normalize_text
-    from ai_tool.utils import fmt_secs
+    from ai_tool.utils import fmt_secs, write_xlsx_fast
     
     # LINKING TO SCRAPER MODULE DIRECTLY
     import scraper_module 
@@ -69,32 +70,85 @@ def run_qa_check():
     total = len(df)
     print(f"📊 Validating {total} ads... (Press Ctrl+C to stop)")
     
-    # 4. Output Path
-    run_ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    output_filename = f"QA {run_ts}.xlsx"
-    output_path = os.path.join(output_dir, output_filename)
-
-    # 5. Initialize Driver
-    driver = setup_driver(headless=True)
+    # 4. Output Path - a run that crashed before its final save left only its checkpoint;
+    # that run's output file is continued instead of starting a new one
+    CHECKPOINT_SUFFIX = scraper_module.CHECKPOINT_SUFFIX
+    pending = glob.glob(os.path.join(output_dir, "QA *.xlsx" + CHECKPOINT_SUFFIX))
+    if pending:
+        output_path = max(pending, key=os.path.getmtime).removesuffix(CHECKPOINT_SUFFIX)
+        print(f"🔄 Resuming interrupted QA run: {os.path.basename(output_path)}")
+    else:
+        run_ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        output_path = os.path.join(output_dir, f"QA {run_ts}.xlsx")
+
+    # Rows are read and written through plain column lists (no per-row Series or df.at writes);
+    # the output columns are pushed back into df for the final save
+    def column(name):
+        return df[name].tolist() if name in df.columns else [None] * total
+
+    # Breadcrumb labels repeat across thousands of ads (file and live side alike) -
+    # each distinct one is normalized once per run
+    norm_cache = {}
+
+    def norm_lower(text):
+        text = str(text)
+        if text not in norm_cache:
+            norm_cache[text] = normalize_text(text, norm_map, index=rules['_normalize_index']).lower()
+        return norm_cache[text]
+
+    ad_ids = column("Ad ID")
+    file_bc_rows = list(zip(column("Breadcrumb_Top1"), column("Breadcrumb_Top2"), column("Breadcrumb_Top3")))
+    out = {col: column(col) for col in new_cols}
+
+    def flush_to_df():
+        for col, values in out.items():
+            df[col] = values
+
+    # Crash checkpoint: one CSV line appended per checked ad, instead of rewriting the whole
+    # workbook every 50 ads. Removed once the final workbook is saved.
+    ckpt_path = output_path + CHECKPOINT_SUFFIX
+    if os.path.exists(ckpt_path):
+        # Replay ads the interrupted run already checked (later lines win); they are skipped below
+        with open(ckpt_path, 'r', newline='', encoding='utf-8-sig') as fh:
+            saved = {row["Ad ID"]: row for row in csv.DictReader(fh)}
+        for idx, ad_id in enumerate(ad_ids):
+            if ad_id in saved:
+                for col in new_cols:
+                    out[col][idx] = saved[ad_id][col]
+        print(f"   ↩️ Restored {len(saved)} ads from checkpoint")
+        ckpt_file = open(ckpt_path, 'a', newline='', encoding='utf-8-sig')
+        ckpt = csv.writer(ckpt_file)
+    else:
+        ckpt_file = open(ckpt_path, 'w', newline='', encoding='utf-8-sig')
+        ckpt = csv.writer(ckpt_file)
+        ckpt.writerow(["Ad ID"] + new_cols)
+
+    # 5. Driver is only started for the first ad the plain-HTTP breadcrumb fetch can't settle
+    driver = None
     t0 = time.time()
 
     try:
-        for idx, row in df.iterrows():
-            if pd.notna(row.get("QA Status")) and str(row.get("QA Status")).strip() != "":
+        for idx in range(total):
+            qa_status = out["QA Status"][idx]
+            if pd.notna(qa_status) and str(qa_status).strip() != "":
                 continue
 
-            ad_id = row.get("Ad ID")
+            ad_id = ad_ids[idx]
             if not ad_id or str(ad_id).lower() == "nan": continue
             
             # --- FILE DATA ---
-            file_bcs = [row.get("Breadcrumb_Top1"), row.get("Breadcrumb_Top2"), row.get("Breadcrumb_Top3")]
+            file_bcs = file_bc_rows[idx]
             # Normalize file data for comparison (Set for order independence)
-            file_set = {normalize_text(str(b), norm_map).lower() for b in file_bcs if pd.notna(b) and str(b).strip()}
+            file_set = {norm_lower(b) for b in file_bcs if pd.notna(b) and str(b).strip()}
             file_set.discard("inactive ad")
             
             # --- LIVE DATA (USING SCRAPER MODULE) ---
-            # using the exact same function the scraper uses
-            scrape_result = scraper_module.scrape_ad_data(driver, ad_id)
+            # QA only needs breadcrumbs: plain HTTP first, the scraper's browser path as fallback
+            scrape_result = scraper_module.scrape_breadcrumbs_fast(ad_id)
+            if scrape_result is None:
+                if driver is None:
+                    driver = setup_driver(headless=True)
+                scrape_result = scraper_module.scrape_ad_data(driver, ad_id)
             
             status = "UNKNOWN"
             l1, l2, l3 = "", "", ""
@@ -111,7 +165,7 @@ def run_qa_check():
                 l3 = live_raw[2] if len(live_raw) > 2 else ""
 
                 # Normalize for Logic Check
-                live_set = {normalize_text(str(b), norm_map).lower() for b in live_raw}
+                live_set = {norm_lower(b) for b in live_raw}
 
                 # Comparison Logic (Subset)
                 if not file_set:
@@ -121,11 +175,13 @@ def run_qa_check():
                 else:
                     status = "❌ QA FAIL"
 
-            # --- UPDATE DATAFRAME ---
-            df.at[idx, "live breadcrum 1"] = l1
-            df.at[idx, "live breadcrum 2"] = l2
-            df.at[idx, "live breadcrum 3"] = l3
-            df.at[idx, "QA Status"] = status
+            # --- UPDATE OUTPUT COLUMNS ---
+            out["live breadcrum 1"][idx] = l1
+            out["live breadcrum 2"][idx] = l2
+            out["live breadcrum 3"][idx] = l3
+            out["QA Status"][idx] = status
+            ckpt.writerow([ad_id, l1, l2, l3, status])
+            ckpt_file.flush()
 
             # --- ETA ---
             processed = idx + 1
@@ -135,20 +191,19 @@ def run_qa_check():
             eta_str = fmt_secs(remaining)
 
             print(f"[{processed}/{total}] {ad_id}: {status} | ETA: {eta_str}")
-            
-            if processed % 50 == 0:
-                try: df.to_excel(output_path, index=False)
-                except: pass
 
     except KeyboardInterrupt:
         print("\n🛑 Stopping...")
     except Exception as e:
         print(f"\n❌ Unexpected Crash: {e}")
     finally:
-        if 'driver' in locals(): driver.quit()
+        if driver is not None: driver.quit()
+        ckpt_file.close()
 
     try:
-        df.to_excel(output_path, index=False)
+        flush_to_df()
+        write_xlsx_fast(output_path, {"Sheet1": [df]})
+        os.remove(ckpt_path)
         print(f"\n✅ QA Complete! Output saved to:\n   {output_path}")
     except Exception as e:
         print(f"❌ Error saving final file: {e}")
@@ -1,17 +1,60 @@
 import os
-import time
 import sys
 import glob
+import json
+import subprocess
 import pandas as pd
-import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# This must be set before the import to silence warnings
+# Inherited by the key tester subprocesses to silence gRPC warnings
 os.environ['GRPC_VERBOSITY'] = 'ERROR'
-import google.generativeai as genai
 
 from ai_tool.config_loader import config
 
+# genai.configure() is process-global, so each key is probed in its own _key_tester process
+KEY_TESTER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_key_tester.py")
+KEY_TESTER_TIMEOUT = 30  # seconds; the API call inside is capped at 10s, the rest is interpreter/import start-up
+# The key reaches the tester through its environment, never its command line (visible in the process list)
+KEY_TESTER_KEY_ENV = "AWACS_PROBE_KEY"
+# Each probe is a full interpreter importing google.generativeai; cap how many run at once
+KEY_TESTER_MAX_PARALLEL = 8
+
+# _key_tester's single-word verdicts -> report status
+KEY_TESTER_STATUS = {
+    "Active": "✅ Active",
+    "Exhausted": "❌ Quota Exhausted",
+    "Invalid": "❗️ Invalid Key",
+}
+
+# Per-report usage remembered between checks, keyed by path + mtime (lives in the Key Reports folder)
+USAGE_CACHE_FILE = ".quota_usage_cache.json"
+REPORT_USAGE_COLUMNS = ('Original Key Name', 'Key Name', 'Successful Calls')
+
+def read_report_usage(path):
+    """Successful Calls per key name in one Session Report; only the key/calls columns are parsed."""
+    # Check for both single-process and parallel report formats
+    sheet_name = 'Key Usage' if 'worker' not in path else 'Key Usage Summary'
+    df_report = pd.read_excel(path, sheet_name=sheet_name, usecols=lambda c: c in REPORT_USAGE_COLUMNS)
+
+    # Determine the correct column name for the key identifier
+    key_name_col = 'Original Key Name' if 'Original Key Name' in df_report.columns else 'Key Name'
+    totals = df_report.groupby(key_name_col)['Successful Calls'].sum()
+    return {str(k): int(v) for k, v in totals.items()}
+
+def probe_key(key, model_name):
+    """Runs _key_tester for one key and maps its verdict to a report status."""
+    try:
+        proc = subprocess.run(
+            [sys.executable, KEY_TESTER_SCRIPT, model_name],
+            env={**os.environ, KEY_TESTER_KEY_ENV: key},
+            capture_output=True, text=True, timeout=KEY_TESTER_TIMEOUT
+        )
+        verdict = proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else ""
+    except Exception:
+        verdict = ""
+    return KEY_TESTER_STATUS.get(verdict, "⚠️ Unknown Error")
+
 def run_quota_check():
     """
     Tests each API key for real-time status and estimates remaining calls
@@ -38,50 +81,50 @@ def run_quota_check():
     usage_today = {f"Key {i+1}": 0 for i in range(len(api_keys_info))}
     today_str = datetime.now().strftime("%Y-%m-%d")
     
-    report_files = glob.glob(os.path.join(key_report_dir, "Session_Report_*.xlsx"))
-    
+    # Only today's reports are listed; older days are never stat-ed or opened
+    report_files = glob.glob(os.path.join(key_report_dir, f"Session_Report_*{today_str}*.xlsx"))
+
+    # Only reports that are new or changed since the last check are opened again
+    cache_path = os.path.join(key_report_dir, USAGE_CACHE_FILE)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as fh:
+            usage_cache = json.load(fh)
+    except (OSError, ValueError):
+        usage_cache = {}
+    fresh_cache = {}
+
     for f in report_files:
-        if today_str in os.path.basename(f):
-            try:
-                # Check for both single-process and parallel report formats
-                sheet_name = 'Key Usage' if 'worker' not in f else 'Key Usage Summary'
-                df_report = pd.read_excel(f, sheet_name=sheet_name)
-                
-                # Determine the correct column name for the key identifier
-                key_name_col = 'Original Key Name' if 'Original Key Name' in df_report.columns else 'Key Name'
-
-                for _, row in df_report.iterrows():
-                    key_name = row[key_name_col]
-                    if key_name in usage_today:
-                        usage_today[key_name] += row['Successful Calls']
-            except Exception:
-                pass
+        try:
+            mtime = os.path.getmtime(f)
+            entry = usage_cache.get(f)
+            if not entry or entry.get('mtime') != mtime:
+                entry = {'mtime': mtime, 'usage': read_report_usage(f)}
+            fresh_cache[f] = entry
+
+            for key_name, calls in entry['usage'].items():
+                if key_name in usage_today:
+                    usage_today[key_name] += calls
+        except Exception:
+            pass
+
+    # Older days' entries drop out here, so the cache never outgrows today's reports
+    if fresh_cache != usage_cache:
+        try:
+            with open(cache_path, 'w', encoding='utf-8') as fh:
+                json.dump(fresh_cache, fh)
+        except OSError:
+            pass
 
     print("Historical scan complete. Now performing live status checks...\n")
     
+    print(f"Testing {len(api_keys_info)} keys in parallel...", end='\r', flush=True)
+    # Probes run side by side (a few at a time): total wait ~ the slowest batch, not the sum
+    with ThreadPoolExecutor(max_workers=min(KEY_TESTER_MAX_PARALLEL, len(api_keys_info))) as executor:
+        statuses = list(executor.map(lambda info: probe_key(info['key'], gemini_model_name), api_keys_info))
+
     report_data = []
-    for key_info in api_keys_info:
-        key = key_info['key']
+    for key_info, status in zip(api_keys_info, statuses):
         original_name = f"Key {key_info['original_index']}"
-        status = ""
-        
-        print(f"Testing {original_name}...", end='\r', flush=True)
-        
-        try:
-            genai.configure(api_key=key)
-            model = genai.GenerativeModel(gemini_model_name)
-            with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
-                model.generate_content("test", request_options={'timeout': 10})
-            status = "✅ Active"
-            
-        except Exception as e:
-            error_message = str(e).lower()
-            if "quota" in error_message or "resource has been exhausted" in error_message:
-                status = "❌ Quota Exhausted"
-            elif "api key not valid" in error_message:
-                status = "❗️ Invalid Key"
-            else:
-                status = f"⚠️ Unknown Error"
 
         historical_usage = usage_today.get(original_name, 0)
         
@@ -100,7 +143,6 @@ def run_quota_check():
         })
         
         print(f"{original_name}: {status}, Estimated Remaining: {estimated_remaining}{' ' * 20}")
-        time.sleep(0.2)
 
     print("\n--------------------------------------------")
     print("            Check complete.                 ")
@@ -1,8 +1,16 @@
 import os
+import csv
 import time
 import glob
 import re
+import queue
+import threading
+import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import timedelta, datetime
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from selenium.webdriver.common.by import By
@@ -13,10 +21,191 @@ import urllib3
 
 from ai_tool.config_loader import config
 from ai_tool.web_utils import setup_driver
+from ai_tool.utils import write_xlsx_fast
+
+# Crash checkpoint next to the target workbook: one CSV line per scraped ad. The workbook
+# itself is written once, at the end of the session; the checkpoint is removed after that.
+CHECKPOINT_SUFFIX = ".ckpt.csv"
+
+# Every gallery image's URL attributes in one browser round-trip (instead of a get_attribute call each)
+GALLERY_IMAGES_JS = """
+return Array.from(document.querySelectorAll('img.rsImg')).map(function (im) {
+    return [im.src || im.getAttribute('src'), im.getAttribute('data-src'),
+            im.getAttribute('data-lazy-src'), im.getAttribute('data-adid')];
+});
+"""
+
+# Text and href of every link in the breadcrumb nav (arguments[0]) in one round-trip
+BREADCRUMB_LINKS_JS = """
+return Array.from(arguments[0].querySelectorAll('a')).map(function (a) {
+    return [a.innerText || '', a.href || ''];
+});
+"""
+
+# Breadcrumb links that are navigation noise (by text) or Make/Model/location filters (by URL)
+BREADCRUMB_NOISE = ("home", "browse", "commercial trucks", "for sale")
+BREADCRUMB_URL_PARAMS = ("make=", "model=", "state=", "city=", "zip=", "year=")
 
 def fmt_secs(seconds: float) -> str:
     return str(timedelta(seconds=int(seconds)))
 
+def get_gallery_images(driver):
+    """(src, data-adid) for every img.rsImg; src falls back to data-src, then data-lazy-src."""
+    rows = driver.execute_script(GALLERY_IMAGES_JS) or []
+    return [(src or data_src or lazy_src, adid) for src, data_src, lazy_src, adid in rows]
+
+# Gallery waits poll the real condition at this interval instead of sleeping a fixed time
+GALLERY_POLL_INTERVAL = 0.05
+
+def wait_for_gallery(driver, timeout, min_urls=3):
+    """
+    Waits up to `timeout` seconds for the gallery to hold `min_urls` usable image URLs,
+    returning as soon as it does. True if enough images are present, False on timeout.
+    """
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=GALLERY_POLL_INTERVAL).until(
+            lambda d: count_gallery_urls(d) >= min_urls)
+        return True
+    except TimeoutException:
+        return False
+
+def count_gallery_urls(driver):
+    """Number of distinct, non-placeholder http(s) image URLs currently in the gallery."""
+    return len({
+        src for src, _ in get_gallery_images(driver)
+        if src and "placeholder" not in src.lower()
+        and (src.startswith("http") or src.startswith("//"))
+    })
+
+# Breadcrumbs are server-rendered, so a plain HTTP fetch is enough when images aren't needed.
+# One keep-alive session per process, with a desktop browser user-agent.
+_http = requests.Session()
+_http.headers.update({
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+})
+
+# Optional CDN warm-up (Settings/ScraperWarmImageCache): scraped image URLs get a background HEAD
+# request so the AI step's downloads are more likely to hit a warm edge cache. Results are ignored.
+IMAGE_WARM_WORKERS = 4
+IMAGE_WARM_TIMEOUT = 3
+
+def warm_image_urls(session, urls):
+    """Fire-and-forget HEAD requests for one ad's image URLs."""
+    for url in urls:
+        if url.startswith("//"):
+            url = "https:" + url
+        try:
+            session.head(url, timeout=IMAGE_WARM_TIMEOUT, allow_redirects=True)
+        except requests.RequestException:
+            pass
+
+class _BreadcrumbParser(HTMLParser):
+    """Collects the page <title> and (text, href) of every link in the first nav.breadcrumbs."""
+    def __init__(self):
+        super().__init__()
+        self.title = ""
+        self.links = []
+        self.found_nav = False
+        self._in_title = False
+        self._nav_depth = 0
+        self._link = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        elif tag == "nav":
+            if self._nav_depth:
+                self._nav_depth += 1
+            elif not self.found_nav and "breadcrumbs" in (dict(attrs).get("class") or "").split():
+                self.found_nav = True
+                self._nav_depth = 1
+        elif tag == "a" and self._nav_depth:
+            self._link = ([], dict(attrs).get("href") or "")
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag == "nav" and self._nav_depth:
+            self._nav_depth -= 1
+        elif tag == "a" and self._link is not None:
+            # Collapse whitespace the way Selenium's element.text does
+            self.links.append((" ".join("".join(self._link[0]).split()), self._link[1]))
+            self._link = None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        if self._link is not None:
+            self._link[0].append(data)
+
+def filter_breadcrumbs(links):
+    """Breadcrumb texts from (text, href) pairs, minus navigation noise and Make/Model/location links."""
+    clean_texts = []
+    for text, href in links:
+        # --- FIX: REMOVE TRAILING COMMAS ---
+        text = (text or "").strip().rstrip(',')
+        # -----------------------------------
+        if not text:
+            continue
+        t_lower = text.lower()
+        h_lower = (href or "").lower()
+
+        # A. Text Noise Filter / B. URL Logic Filter (one short-circuiting check)
+        if any(n in t_lower for n in BREADCRUMB_NOISE) or any(p in h_lower for p in BREADCRUMB_URL_PARAMS):
+            continue
+
+        clean_texts.append(text)
+    return clean_texts
+
+def scrape_breadcrumbs_fast(ad_id, timeout=8):
+    """
+    Breadcrumb-only variant of scrape_ad_data over plain HTTP (no browser, no images).
+    Returns the same result dict, or None when the page can't be judged this way
+    (network error, block/challenge page, breadcrumb nav missing) - use Selenium then.
+    """
+    target_ad_id = str(ad_id).strip()
+    result = {"status": "Active", "breadcrumbs": [], "images": []}
+    try:
+        r = _http.get(f"https://www.commercialtrucktrader.com/listing/{target_ad_id}", timeout=timeout)
+    except requests.RequestException:
+        return None
+    if r.status_code != 200:
+        return None
+
+    # 1. Validation (same checks as the browser path)
+    if f"/listing/{target_ad_id}" not in r.url:
+        result["status"] = "Inactive"
+        return result
+
+    parser = _BreadcrumbParser()
+    try:
+        parser.feed(r.text)
+    except Exception:
+        return None
+
+    lower_title = parser.title.strip().lower()
+    if "no longer available" in lower_title or "listing not found" in lower_title:
+        result["status"] = "Inactive"
+        return result
+    if "security" in lower_title or "challenge" in lower_title or "denied" in lower_title:
+        return None
+    if not parser.found_nav:
+        return None
+
+    # 2. Breadcrumbs
+    result["breadcrumbs"] = filter_breadcrumbs(parser.links)[:3]
+    if not result["breadcrumbs"]:
+        result["status"] = "Inactive"
+    return result
+
+def driver_alive(driver):
+    """Cheap liveness probe: True if the browser still answers a trivial script."""
+    try:
+        return driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
 def scrape_ad_data(driver, ad_id, group_index=3, timeout=5):
     """
     Navigates to the ad and extracts BOTH breadcrumbs AND image URLs.
@@ -43,13 +232,14 @@ def scrape_ad_data(driver, ad_id, group_index=3, timeout=5):
             driver.execute_script("window.stop();")
         
         current_url = driver.current_url
-        page_title = driver.title.strip()
 
         # 1. Validation
         if f"/listing/{target_ad_id}" not in current_url: 
             result["status"] = "Inactive"
             return result
         
+        # Only read the title once the URL says the listing is still there
+        page_title = driver.title.strip()
         lower_title = page_title.lower()
         if "no longer available" in lower_title or "listing not found" in lower_title: 
             result["status"] = "Inactive"
@@ -63,27 +253,8 @@ def scrape_ad_data(driver, ad_id, group_index=3, timeout=5):
         try:
             nav = WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, "nav.breadcrumbs")))
             
-            links = nav.find_elements(By.TAG_NAME, "a")
-            clean_texts = []
-            
-            for link in links:
-                # --- FIX: REMOVE TRAILING COMMAS ---
-                text = link.text.strip().rstrip(',')
-                # -----------------------------------
-                
-                href = link.get_attribute("href") or ""
-                t_lower = text.lower()
-                h_lower = href.lower()
-
-                # A. Text Noise Filter
-                if not text or any(n in t_lower for n in ["home", "browse", "commercial trucks", "for sale"]):
-                    continue
-                
-                # B. URL Logic Filter
-                if any(param in h_lower for param in ["make=", "model=", "state=", "city=", "zip=", "year="]):
-                    continue
-                
-                clean_texts.append(text)
+            links = driver.execute_script(BREADCRUMB_LINKS_JS, nav) or []
+            clean_texts = filter_breadcrumbs(links)
 
             result["breadcrumbs"] = clean_texts[:3]
             
@@ -96,70 +267,62 @@ def scrape_ad_data(driver, ad_id, group_index=3, timeout=5):
 
         # 3. Extract Image URLs (ULTRA-OPTIMIZED - Maximum speed with same accuracy)
         image_urls = []
+        seen_urls = set()  # O(1) duplicate check alongside the ordered list
         try:
             # ULTRA-OPTIMIZED: Reduced wait from 5s to 4s
             WebDriverWait(driver, 4).until(EC.presence_of_element_located((By.CSS_SELECTOR, "img.rsImg")))
-            time.sleep(0.2)  # ULTRA-OPTIMIZED: Reduced from 0.3s to 0.2s
+            # ULTRA-OPTIMIZED: up to 0.2s for lazy images, polled instead of a fixed sleep
+            has_enough = wait_for_gallery(driver, 0.2, min_urls=config.max_images)
             
-            # Try to interact with gallery to load more images (aim for 3 images)
+            # Try to interact with gallery to load more images (aim for max_images).
+            # Most galleries already have enough slides in the DOM at load - no clicking needed then.
             try:
-                arrow = driver.find_element(By.CSS_SELECTOR, ".rsArrowRight .rsArrowIcn")
-                action = ActionChains(driver)
-                # ULTRA-OPTIMIZED: Reduced max clicks to 3
-                for click_count in range(3):
-                    try:
-                        action.click(arrow).perform()
-                        time.sleep(0.1)  # ULTRA-OPTIMIZED: Reduced from 0.15s to 0.1s
-                        # Check how many valid images we have now
-                        current_imgs = driver.find_elements(By.CSS_SELECTOR, "img.rsImg")
-                        current_urls = []
-                        for img in current_imgs:
-                            src = img.get_attribute("src") or img.get_attribute("data-src") or img.get_attribute("data-lazy-src")
-                            if src and "placeholder" not in src.lower() and src not in current_urls:
-                                if src.startswith("http") or src.startswith("//"):
-                                    current_urls.append(src)
-                        if len(current_urls) >= 3:
+                if not has_enough:
+                    arrow = driver.find_element(By.CSS_SELECTOR, ".rsArrowRight .rsArrowIcn")
+                    action = ActionChains(driver)
+                    # ULTRA-OPTIMIZED: Reduced max clicks to 3
+                    for click_count in range(3):
+                        try:
+                            action.click(arrow).perform()
+                            # Wake as soon as max_images are present (at most 0.1s per click)
+                            if wait_for_gallery(driver, 0.1, min_urls=config.max_images):
+                                break
+                        except:
                             break
-                    except:
-                        break
             except:
                 pass  # No arrow found, continue anyway
             
-            # ULTRA-OPTIMIZED: Reduced final wait from 0.2s to 0.1s
-            time.sleep(0.1)
-            
-            imgs = driver.find_elements(By.CSS_SELECTOR, "img.rsImg")
+            # ULTRA-OPTIMIZED: final settle of at most 0.1s, skipped once max_images are there
+            wait_for_gallery(driver, 0.1, min_urls=config.max_images)
             
-            for im in imgs:
-                # Try multiple attributes for lazy-loaded images
-                src = im.get_attribute("src") or im.get_attribute("data-src") or im.get_attribute("data-lazy-src")
+            # src already falls back to the lazy-load attributes
+            for src, elem_adid in get_gallery_images(driver):
                 if not src:
                     continue
                 
                 # Check data-adid: only skip if it exists AND doesn't match
                 # If data-adid doesn't exist, include the image (less strict)
-                elem_adid = im.get_attribute("data-adid")
                 if elem_adid and str(elem_adid).strip() != target_ad_id:
                     continue
                 
                 # Filter placeholders and duplicates
-                if "placeholder" not in src.lower() and src not in image_urls:
+                if "placeholder" not in src.lower() and src not in seen_urls:
                     # Make sure it's a valid image URL
                     if src.startswith("http") or src.startswith("//"):
+                        seen_urls.add(src)
                         image_urls.append(src)
 
-            unique_urls = list(dict.fromkeys(image_urls))
-            result["images"] = unique_urls[:config.max_images]
+            result["images"] = image_urls[:config.max_images]
             
         except Exception as e:
             # Fallback: try to get at least one image
             try:
-                imgs = driver.find_elements(By.CSS_SELECTOR, "img.rsImg")
                 image_urls = []
-                for im in imgs[:10]:  # Check first 10 images
-                    src = im.get_attribute("src") or im.get_attribute("data-src") or im.get_attribute("data-lazy-src")
-                    if src and "placeholder" not in src.lower() and src not in image_urls:
+                seen_urls = set()
+                for src, _ in get_gallery_images(driver)[:10]:  # Check first 10 images
+                    if src and "placeholder" not in src.lower() and src not in seen_urls:
                         if src.startswith("http") or src.startswith("//"):
+                            seen_urls.add(src)
                             image_urls.append(src)
                             if len(image_urls) >= config.max_images:
                                 break
@@ -200,15 +363,24 @@ def run_scraper(resume=False):
             raise ValueError(f"Column '{ad_id_column}' not found in Scrapper.xlsx")
 
         target_file = ""
+        required_cols = ["Breadcrumb_Top1", "Breadcrumb_Top2", "Breadcrumb_Top3", "Image_URLs"]
         
         if resume:
+            # An interrupted session may only have left its checkpoint behind (no workbook yet)
             existing_files = glob.glob(os.path.join(OUTPUT_DIR, "Scrapper_*.xlsx"))
+            existing_files += glob.glob(os.path.join(OUTPUT_DIR, "Scrapper_*.xlsx" + CHECKPOINT_SUFFIX))
             if existing_files:
-                target_file = max(existing_files, key=os.path.getmtime)
+                target_file = max(existing_files, key=os.path.getmtime).removesuffix(CHECKPOINT_SUFFIX)
                 print(f"\n🔄 Resuming from latest file: {os.path.basename(target_file)}")
-                existing_df = pd.read_excel(target_file, dtype={ad_id_column: str})
-                existing_df[ad_id_column] = existing_df[ad_id_column].astype(str).str.strip()
-                df = pd.merge(source_df, existing_df, on=ad_id_column, how="left")
+                df = source_df
+                if os.path.exists(target_file):
+                    # Only the scraped columns are carried over, looked up by Ad ID (no merged copy of the sheet)
+                    existing_df = pd.read_excel(target_file, dtype={ad_id_column: str},
+                                                usecols=lambda c: c == ad_id_column or c in required_cols)
+                    existing_df[ad_id_column] = existing_df[ad_id_column].astype(str).str.strip()
+                    existing = existing_df.drop_duplicates(subset=[ad_id_column], keep="last").set_index(ad_id_column)
+                    for col in existing.columns:
+                        df[col] = df[ad_id_column].map(existing[col])
             else:
                 print("\n⚠️ No existing file to resume. Starting fresh.")
                 df = source_df.copy()
@@ -219,49 +391,147 @@ def run_scraper(resume=False):
             run_ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
             target_file = os.path.join(OUTPUT_DIR, f"Scrapper_{run_ts}.xlsx")
 
-        required_cols = ["Breadcrumb_Top1", "Breadcrumb_Top2", "Breadcrumb_Top3", "Image_URLs"]
         for col in required_cols:
             if col not in df.columns: df[col] = ""
 
+        # Replay ads an interrupted session already scraped into this file (later lines win)
+        ckpt_path = target_file + CHECKPOINT_SUFFIX
+        if os.path.exists(ckpt_path):
+            with open(ckpt_path, 'r', newline='', encoding='utf-8-sig') as fh:
+                saved = {row[ad_id_column]: row for row in csv.DictReader(fh)}
+            ids = df[ad_id_column].tolist()
+            for col in required_cols:
+                df[col] = [saved[a][col] if a in saved else v for a, v in zip(ids, df[col].tolist())]
+            print(f"   ↩️ Restored {len(saved)} ads from checkpoint")
+
         total = len(df)
         todo_mask = df["Breadcrumb_Top1"].isna() | (df["Breadcrumb_Top1"] == "")
-        todo_indices = df[todo_mask].index.tolist()
+        # Positions, not labels: the loop below works on plain column lists
+        todo_indices = [i for i, todo in enumerate(todo_mask.tolist()) if todo]
+
+        # Scraped values go into lists (no per-cell df.loc writes); they are pushed back
+        # into df as whole columns right before every save
+        ad_ids = df[ad_id_column].tolist()
+        scraped = {col: df[col].tolist() for col in required_cols}
+
+        def flush_to_df():
+            for col, values in scraped.items():
+                df[col] = values
         
         already_done = total - len(todo_indices)
         print(f"📊 Total Ads: {total} | Already Done: {already_done} | To Do: {len(todo_indices)}")
         
         if len(todo_indices) == 0:
             print("\n✅ All ads are already scraped! Nothing to do.")
+            if os.path.exists(ckpt_path):
+                # The interrupted session finished scraping but never wrote its workbook
+                write_xlsx_fast(target_file, {"Sheet1": [df]})
+                os.remove(ckpt_path)
+                print(f"   💾 Saved to: {os.path.basename(target_file)}")
             return
 
-        driver = setup_driver(headless=True)
+        todo_indices = [idx for idx in todo_indices if ad_ids[idx]]
+
+        new_ckpt = not os.path.exists(ckpt_path)
+        ckpt_file = open(ckpt_path, 'a', newline='', encoding='utf-8-sig')
+        ckpt = csv.writer(ckpt_file)
+        if new_ckpt:
+            ckpt.writerow([ad_id_column] + required_cols)
+
+        # Pool of headless browsers: each worker borrows one per ad and hands it back
+        num_workers = max(1, min(config.scraper_workers, len(todo_indices)))
+        drivers = queue.Queue()
+        for _ in range(num_workers):
+            drivers.put(setup_driver(headless=True))
+        stop_event = threading.Event()
+        pool_lock = threading.Lock()
+        pool_size = num_workers  # Drivers in circulation; shrinks when a dead one can't be relaunched
+
+        def checkout_driver():
+            """Borrows a pooled driver; None once every browser is gone."""
+            while True:
+                try:
+                    return drivers.get(timeout=1)
+                except queue.Empty:
+                    if pool_size == 0:
+                        return None
+
+        def return_driver(driver, healthy):
+            """Hands a driver back to the pool - relaunched if it died, dropped if that fails too."""
+            nonlocal pool_size
+            if not healthy and not driver_alive(driver):
+                try: driver.quit()
+                except: pass
+                try:
+                    driver = setup_driver(headless=True)
+                except Exception as e:
+                    with pool_lock:
+                        pool_size -= 1
+                        left = pool_size
+                    print(f"   ❌ Could not relaunch a browser ({e}). {left} left in the pool.")
+                    if left == 0:
+                        stop_event.set()
+                    return
+            drivers.put(driver)
+
+        def scrape_one(idx):
+            """Worker: scrapes one ad on a pooled driver, re-spawning the driver if it crashes."""
+            ad_id = ad_ids[idx]
+            if stop_event.is_set():
+                return idx, None, 0.0
+            driver = checkout_driver()
+            if driver is None:
+                return idx, None, 0.0
+            item_start = time.perf_counter()
+            healthy = False  # Set once the driver has just served a page, so it needs no liveness probe
+            try:
+                try:
+                    data = scrape_ad_data(driver, ad_id, group_index=3)
+                    healthy = True
+                except Exception as e:
+                    try:
+                        # A timeout or network blip leaves the browser usable - only a dead one is relaunched
+                        if driver_alive(driver):
+                            print(f"   ⚠️ Error on {ad_id} ({e}). Browser still alive, reusing it...")
+                        else:
+                            print(f"   🔥 Driver Crashed on {ad_id} ({e}). Restarting...")
+                            try: driver.quit()
+                            except: pass
+                            driver = setup_driver(headless=True)
+                        print(f"   🔄 Retrying Ad {ad_id}...")
+                        data = scrape_ad_data(driver, ad_id, group_index=3)
+                        healthy = True
+                    except Exception as e2:
+                        print(f"   ❌ Retry failed. Skipping {ad_id}. Error: {e2}")
+                        data = {"status": "Inactive", "breadcrumbs": [], "images": []}
+            finally:
+                # A failed retry may leave a quit or dead driver behind - never pool it as is
+                return_driver(driver, healthy)
+            return idx, data, time.perf_counter() - item_start
+
+        warm_pool = None
+        if config.scraper_warm_images:
+            warm_session = requests.Session()
+            warm_adapter = HTTPAdapter(pool_maxsize=IMAGE_WARM_WORKERS, max_retries=Retry(total=0))
+            warm_session.mount("https://", warm_adapter)
+            warm_session.mount("http://", warm_adapter)
+            warm_pool = ThreadPoolExecutor(max_workers=IMAGE_WARM_WORKERS, thread_name_prefix="img-warm")
+
         ads_processed_session = 0
         consecutive_inactive = 0
         sum_durations = 0.0
         
         print(f"\n{'='*80}")
-        print(f"🚀 SCRAPING SESSION STARTED (ULTRA-OPTIMIZED)")
+        print(f"🚀 SCRAPING SESSION STARTED (ULTRA-OPTIMIZED, {num_workers} browsers)")
         print(f"{'='*80}\n")
         
-        for idx in todo_indices:
-            ad_id = df.loc[idx, ad_id_column]
-            if not ad_id: continue
-
-            item_start = time.perf_counter()
-            
-            try:
-                data = scrape_ad_data(driver, ad_id, group_index=3)
-            except Exception as e:
-                print(f"   🔥 Driver Crashed/Timed Out ({e}). Restarting...")
-                try: driver.quit()
-                except: pass
-                driver = setup_driver(headless=True)
-                try:
-                    print(f"   🔄 Retrying Ad {ad_id}...")
-                    data = scrape_ad_data(driver, ad_id, group_index=3)
-                except Exception as e2:
-                    print(f"   ❌ Retry failed. Skipping {ad_id}. Error: {e2}")
-                    data = {"status": "Inactive", "breadcrumbs": [], "images": []}
+        loop_start = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=num_workers)
+        futures = [executor.submit(scrape_one, idx) for idx in todo_indices]
+        for future in as_completed(futures):
+            idx, data, item_dur = future.result()
+            if data is None: continue
+            ad_id = ad_ids[idx]
 
             if data["status"] == "Inactive":
                 bc1, bc2, bc3, imgs_str = "Inactive ad", "", "", ""
@@ -273,35 +543,41 @@ def run_scraper(resume=False):
                 bc2 = bcs[1] if len(bcs) > 1 else ""
                 bc3 = bcs[2] if len(bcs) > 2 else ""
                 imgs_str = ",".join(data["images"])
+                if warm_pool:
+                    warm_pool.submit(warm_image_urls, warm_session, data["images"])
                 
                 status_msg = f"'{bc1}', '{bc2}' | {len(data['images'])} imgs"
                 consecutive_inactive = 0
             
-            df.loc[idx, "Breadcrumb_Top1"] = bc1
-            df.loc[idx, "Breadcrumb_Top2"] = bc2
-            df.loc[idx, "Breadcrumb_Top3"] = bc3
-            df.loc[idx, "Image_URLs"] = imgs_str
+            scraped["Breadcrumb_Top1"][idx] = bc1
+            scraped["Breadcrumb_Top2"][idx] = bc2
+            scraped["Breadcrumb_Top3"][idx] = bc3
+            scraped["Image_URLs"][idx] = imgs_str
+            ckpt.writerow([ad_id, bc1, bc2, bc3, imgs_str])
             
             ads_processed_session += 1
-            item_dur = time.perf_counter() - item_start
             sum_durations += item_dur
             avg_dur = sum_durations / ads_processed_session
-            remaining_sec = avg_dur * (len(todo_indices) - ads_processed_session)
+            # ETA from wall-clock throughput, since several ads are in flight at once
+            wall_per_ad = (time.perf_counter() - loop_start) / ads_processed_session
+            remaining_sec = wall_per_ad * (len(todo_indices) - ads_processed_session)
             
             print(f"[{ads_processed_session}/{len(todo_indices)}] ID: {ad_id} -> {status_msg} | ⏱️ {item_dur:.2f}s | Avg: {avg_dur:.2f}s | ETA: {fmt_secs(remaining_sec)}", flush=True)
 
-            if consecutive_inactive >= SANITY_CHECK_LIMIT:
+            if consecutive_inactive >= SANITY_CHECK_LIMIT and not stop_event.is_set():
                 print(f"\n🛑 STOPPING: Detected {SANITY_CHECK_LIMIT} consecutive inactive ads.")
-                break
+                # No break: queued ads now return straight away, while the ones already in
+                # flight finish and are still recorded (and checkpointed) by this loop
+                stop_event.set()
             
             if ads_processed_session % CHECKPOINT_SAVE_INTERVAL == 0:
-                try:
-                    df.to_excel(target_file, index=False)
-                    print(f"   💾 Checkpoint saved.")
-                except Exception as e:
-                    print(f"   ⚠️ Checkpoint failed: {e}")
+                ckpt_file.flush()
 
-        df.to_excel(target_file, index=False)
+        executor.shutdown(wait=True, cancel_futures=True)
+        flush_to_df()
+        write_xlsx_fast(target_file, {"Sheet1": [df]})
+        ckpt_file.close()
+        os.remove(ckpt_path)
         
         total_elapsed = time.time() - total_start_time
         print(f"\n{'='*80}")
@@ -319,9 +595,17 @@ def run_scraper(resume=False):
     except Exception as e:
         print(f"❌ Critical Error: {e}")
     finally:
-        if 'driver' in locals():
-            try: driver.quit()
-            except: pass
+        if 'warm_pool' in locals() and warm_pool:
+            warm_pool.shutdown(wait=False, cancel_futures=True)
+        if 'ckpt_file' in locals():
+            ckpt_file.close()
+        if 'executor' in locals():
+            stop_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+        if 'drivers' in locals():
+            while not drivers.empty():
+                try: drivers.get_nowait().quit()
+                except: pass
 
 if __name__ == "__main__":
     from ai_tool.config_loader import load_config
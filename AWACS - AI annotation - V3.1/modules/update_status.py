@@ -9,6 +9,7 @@ try:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'modules'))
     from ai_tool.config_loader import config, load_config
     from ai_tool.data_processing import normalize_text, load_rules
+    from ai_tool.utils import write_xlsx_fast
 except ImportError:
     print("❌ Critical Error: Could not find the 'modules' folder or its contents.")
     input("\nPress Enter to exit.")
@@ -68,53 +69,60 @@ def run_status_updater():
     print(f"\nUpdating '{os.path.basename(ai_file_to_update)}' using breadcrumbs from '{os.path.basename(scraper_file_source)}'...")
 
     try:
-        ai_df = pd.read_excel(ai_file_to_update)
-        scraper_df = pd.read_excel(scraper_file_source)
-        rules = load_rules(config.rules_json)
         ad_id_column = "Ad ID"
+        # Ad IDs come in as text, so they are never parsed into floats and back
+        ai_df = pd.read_excel(ai_file_to_update, dtype={ad_id_column: str})
+        scraper_df = pd.read_excel(scraper_file_source, dtype={ad_id_column: str})
+        rules = load_rules(config.rules_json)
 
         # --- Data Preparation ---
         # Ensure Ad ID columns are clean strings for a reliable merge
-        ai_df[ad_id_column] = ai_df[ad_id_column].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
-        scraper_df[ad_id_column] = scraper_df[ad_id_column].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+        ai_df[ad_id_column] = ai_df[ad_id_column].astype(str).str.removesuffix('.0').str.strip()
+        scraper_df[ad_id_column] = scraper_df[ad_id_column].astype(str).str.removesuffix('.0').str.strip()
         
-        # --- Merge the two dataframes ---
-        # We merge the new breadcrumbs from the scraper file onto our AI file.
-        # We use a left merge to keep all rows from the AI file.
-        merged_df = pd.merge(
-            ai_df,
-            scraper_df[[ad_id_column, 'Breadcrumb_Top1', 'Breadcrumb_Top2', 'Breadcrumb_Top3']],
-            on=ad_id_column,
-            how='left',
-            suffixes=('_old', '_new') # Suffixes for the breadcrumb columns
-        )
+        # --- Look up the new breadcrumbs by Ad ID ---
+        # A small Ad ID -> breadcrumbs table mapped onto the AI file, instead of merging
+        # a full copy of the (wide) AI frame. Every AI row is kept; unknown Ad IDs get NaN.
+        bc_columns = ['Breadcrumb_Top1', 'Breadcrumb_Top2', 'Breadcrumb_Top3']
+        bc_map = scraper_df.drop_duplicates(subset=[ad_id_column], keep='last').set_index(ad_id_column)[bc_columns]
+        new_bc = {col: ai_df[ad_id_column].map(bc_map[col]) for col in bc_columns}
 
         updated_statuses = []
         rows_updated = 0
-        
-        for _, row in merged_df.iterrows():
-            current_status = row.get('Status', '')
+
+        # Plain column lists zipped row by row instead of iterrows()
+        def column(name):
+            return ai_df[name].tolist() if name in ai_df.columns else [''] * len(ai_df)
+
+        norm_map, norm_index = rules['normalize_map'], rules['_normalize_index']
+        # Breadcrumb/annotation vocabulary is small and repeats across rows: normalize each distinct value once
+        norm_cache = {}
+
+        def norm_lower(value):
+            if value not in norm_cache:
+                norm_cache[value] = normalize_text(value, norm_map, index=norm_index).lower()
+            return norm_cache[value]
+
+        def norm_set(values):
+            return {norm_lower(v) for v in values if pd.notna(v) and v}
+
+        new_bc_rows = zip(*(new_bc[col].tolist() for col in bc_columns))
+        annotated_rows = zip(column('Annotated_Top1'), column('Annotated_Top2'), column('Annotated_Top3'))
+
+        for current_status, new_breadcrumbs, annotated_list in zip(column('Status'), new_bc_rows, annotated_rows):
             # Don't change statuses that indicate a hard failure
             if "Error" in str(current_status) or current_status == "Inactive ad":
                 updated_statuses.append(current_status)
                 continue
 
-            # Use the NEW breadcrumbs for comparison
-            new_breadcrumbs = [
-                row.get('Breadcrumb_Top1_new', ''),
-                row.get('Breadcrumb_Top2_new', ''),
-                row.get('Breadcrumb_Top3_new', '')
-            ]
-            
+            # Use the NEW breadcrumbs for comparison.
             # If there are no new breadcrumbs for this Ad ID, keep the old status
             if all(pd.isna(b) or b == '' for b in new_breadcrumbs):
                 updated_statuses.append(current_status)
                 continue
 
-            annotated_list = [row.get('Annotated_Top1', ''), row.get('Annotated_Top2', ''), row.get('Annotated_Top3', '')]
-
-            bc_norm = {normalize_text(b, rules['normalize_map']).lower() for b in new_breadcrumbs if pd.notna(b) and b}
-            annotated_norm = {normalize_text(a, rules['normalize_map']).lower() for a in annotated_list if pd.notna(a) and a}
+            bc_norm = norm_set(new_breadcrumbs)
+            annotated_norm = norm_set(annotated_list)
             
             new_status = "No change" if bc_norm == annotated_norm else "Require Update"
             
@@ -125,16 +133,15 @@ def run_status_updater():
         
         # Update the original AI DataFrame with the new statuses and breadcrumbs
         ai_df['Status'] = updated_statuses
-        ai_df['Breadcrumb_Top1'] = merged_df['Breadcrumb_Top1_new']
-        ai_df['Breadcrumb_Top2'] = merged_df['Breadcrumb_Top2_new']
-        ai_df['Breadcrumb_Top3'] = merged_df['Breadcrumb_Top3_new']
+        for col in bc_columns:
+            ai_df[col] = new_bc[col]
 
         # Save the result to a new file
         original_name, ext = os.path.splitext(os.path.basename(ai_file_to_update))
         new_name = f"{original_name}_status_re-evaluated{ext}"
         output_path = os.path.join(config.output_dir, new_name)
         
-        ai_df.to_excel(output_path, index=False)
+        write_xlsx_fast(output_path, {"Sheet1": [ai_df]})
         
         print("\n✅ Processing complete!")
         print(f"   {rows_updated} rows had their status changed.")